@@ -13,11 +13,15 @@ Run this script to generate one product "spark" - complete with:
 - Visual product card
 """
 
-import random
 import json
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-import textwrap
+from PIL import Image, ImageDraw
+from datetime import datetime
+
+from spark_layout import CardLayout, CardOverflowError, draw_layout
+from spark_encode import CardEncoder
+from spark_vector import write_vector_card
+from spark_sampler import SparkSampler
 
 # ============================================================================
 # CONFIGURATION
@@ -89,6 +93,11 @@ PAIN_POINTS_DB = {
     ],
 }
 
+# Optional spark_corpus.PainCorpus of scraped pain points; when it covers a
+# category, CORPUS_SAMPLE of its pain points are drawn instead of PAIN_POINTS_DB
+pain_corpus = None
+CORPUS_SAMPLE = 8
+
 # Product concept templates for ideation
 SOLUTION_ANGLES = [
     "What if we combined {concept_a} with {concept_b}?",
@@ -107,12 +116,21 @@ SOLUTION_ANGLES = [
 # IDEATION ENGINE
 # ============================================================================
 
+# Built once per run; replace with SparkSampler(CATEGORIES, mode="coverage", seed=...)
+# for balanced or reproducible runs
+sampler = SparkSampler(CATEGORIES)
+
 def select_category():
     """Randomly select a product category."""
-    return random.choice(CATEGORIES)
+    return sampler.category()
 
 def get_pain_points(category):
     """Get pain points for a category. Falls back to generic if not found."""
+    if pain_corpus is not None and category in pain_corpus:
+        # Drawn by ordinal through the sampler, weighted (or dealt) already
+        seqs = sampler.ordinals(category, pain_corpus.count(category), CORPUS_SAMPLE,
+                                strata=lambda: pain_corpus.seqs_by_intensity(category))
+        return pain_corpus.fetch(category, seqs)
     if category in PAIN_POINTS_DB:
         return PAIN_POINTS_DB[category]
     # Fallback generic pain points
@@ -125,9 +143,12 @@ def get_pain_points(category):
 def generate_product_concept(category, pain_points):
     """Generate a novel product concept based on pain points."""
     
-    # Select primary pain point (prefer high intensity)
-    high_intensity = [p for p in pain_points if p["intensity"] == "high"]
-    primary_pain = random.choice(high_intensity if high_intensity else pain_points)
+    # Select primary pain point, weighted towards high intensity. A corpus
+    # pool changes every call and comes out of the sampler in draw order.
+    if pain_corpus is not None and category in pain_corpus:
+        primary_pain = pain_points[0]
+    else:
+        primary_pain = sampler.pain(category, pain_points)
     
     # Product concept database - pre-generated innovative solutions
     concepts = {
@@ -289,121 +310,156 @@ def generate_product_concept(category, pain_points):
     matching = [c for c in category_concepts if c["pain_solved"] == primary_pain["pain"]]
     if matching:
         return matching[0], primary_pain
-    return random.choice(category_concepts), primary_pain
+    return sampler.rng.choice(category_concepts), primary_pain
 
 
 # ============================================================================
 # VISUAL CARD GENERATION
 # ============================================================================
 
-def create_product_card(concept, category, pain_point, output_path):
-    """Create a beautiful product concept card."""
-    
-    # Card dimensions (Instagram-friendly aspect ratio)
-    width, height = 1080, 1350
-    
-    # Color palette - warm, modern, premium feel
-    colors = {
-        "bg": "#1a1a2e",          # Deep navy
-        "card": "#16213e",         # Slightly lighter navy
-        "accent": "#e94560",       # Coral red
-        "accent2": "#0f3460",      # Deep blue
-        "text": "#eaeaea",         # Off-white
-        "text_muted": "#a0a0a0",   # Gray
-        "highlight": "#f5c518",    # Gold
-    }
-    
-    # Create image
-    img = Image.new('RGB', (width, height), colors["bg"])
-    draw = ImageDraw.Draw(img)
+# (font file, size) for each text role on the card
+CARD_FONTS = {
+    "title": ("DejaVuSans-Bold.ttf", 64),
+    "tagline": ("DejaVuSans.ttf", 32),
+    "body": ("DejaVuSans.ttf", 24),
+    "small": ("DejaVuSans.ttf", 20),
+    "label": ("DejaVuSans-Bold.ttf", 16),
+}
+
+# Smallest each role may shrink to before text is truncated (or overflows)
+MIN_FONT_SIZES = {"title": 40, "tagline": 24, "body": 18, "small": 16}
+
+# Card dimensions (Instagram-friendly aspect ratio)
+CARD_SIZE = (1080, 1350)
+
+# Color palette - warm, modern, premium feel
+CARD_COLORS = {
+    "bg": "#1a1a2e",          # Deep navy
+    "card": "#16213e",         # Slightly lighter navy
+    "accent": "#e94560",       # Coral red
+    "accent2": "#0f3460",      # Deep blue
+    "text": "#eaeaea",         # Off-white
+    "text_muted": "#a0a0a0",   # Gray
+    "highlight": "#f5c518",    # Gold
+}
+
+def layout_product_card(concept, category, pain_point):
+    """Lay the card out by pixel width; layout.overflow says what doesn't fit."""
     
-    # Try to load fonts, fall back to default if not available
-    try:
-        font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 64)
-        font_tagline = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 32)
-        font_body = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 24)
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 20)
-        font_label = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-    except:
-        font_title = ImageFont.load_default()
-        font_tagline = font_title
-        font_body = font_title
-        font_small = font_title
-        font_label = font_title
+    width, height = CARD_SIZE
+    colors = CARD_COLORS
+    layout = CardLayout(width, height)
+    text_width = width - 120
+    label = CARD_FONTS["label"]
     
     # Draw decorative elements
     # Top accent bar
-    draw.rectangle([0, 0, width, 8], fill=colors["accent"])
+    layout.rect([0, 0, width, 8], fill=colors["accent"])
     
     # "ONE SPARK" branding
-    draw.text((60, 40), "ONE SPARK", font=font_label, fill=colors["accent"])
-    draw.text((60, 60), f"Daily Product Idea • {category.upper()}", font=font_small, fill=colors["text_muted"])
+    layout.text((60, 40), "ONE SPARK", label, colors["accent"])
+    spec, text = layout.fit_line(f"Daily Product Idea • {category.upper()}", CARD_FONTS["small"],
+                                 text_width, MIN_FONT_SIZES["small"], "category")
+    layout.text((60, 60), text, spec, colors["text_muted"])
     
-    # Main product name
+    # Main product name (never truncated)
     y_pos = 140
-    draw.text((60, y_pos), concept["name"], font=font_title, fill=colors["text"])
+    spec, text = layout.fit_line(concept["name"], CARD_FONTS["title"], text_width,
+                                 MIN_FONT_SIZES["title"], "name", truncate=False)
+    layout.text((60, y_pos), text, spec, colors["text"])
     
     # Tagline
     y_pos += 80
-    draw.text((60, y_pos), concept["tagline"], font=font_tagline, fill=colors["highlight"])
+    spec, text = layout.fit_line(concept["tagline"], CARD_FONTS["tagline"], text_width,
+                                 MIN_FONT_SIZES["tagline"], "tagline")
+    layout.text((60, y_pos), text, spec, colors["highlight"])
     
     # Divider line
     y_pos += 60
-    draw.line([(60, y_pos), (width - 60, y_pos)], fill=colors["accent2"], width=2)
+    layout.line([(60, y_pos), (width - 60, y_pos)], colors["accent2"], 2)
     
     # Problem section
     y_pos += 30
-    draw.text((60, y_pos), "THE PROBLEM", font=font_label, fill=colors["accent"])
+    layout.text((60, y_pos), "THE PROBLEM", label, colors["accent"])
     y_pos += 30
-    
-    # Wrap problem text
-    problem_text = pain_point["pain"]
-    wrapped = textwrap.wrap(problem_text, width=45)
-    for line in wrapped:
-        draw.text((60, y_pos), line, font=font_body, fill=colors["text_muted"])
+    spec, lines = layout.fit_block(pain_point["pain"], CARD_FONTS["body"], text_width, 3,
+                                   MIN_FONT_SIZES["body"], "problem")
+    for line in lines:
+        layout.text((60, y_pos), line, spec, colors["text_muted"])
         y_pos += 32
     
     # Solution section
     y_pos += 20
-    draw.text((60, y_pos), "THE SOLUTION", font=font_label, fill=colors["accent"])
+    layout.text((60, y_pos), "THE SOLUTION", label, colors["accent"])
     y_pos += 30
-    
-    # Wrap description text
-    wrapped = textwrap.wrap(concept["description"], width=45)
-    for line in wrapped[:5]:  # Limit to 5 lines
-        draw.text((60, y_pos), line, font=font_body, fill=colors["text"])
+    spec, lines = layout.fit_block(concept["description"], CARD_FONTS["body"], text_width, 5,
+                                   MIN_FONT_SIZES["body"], "description")
+    for line in lines:
+        layout.text((60, y_pos), line, spec, colors["text"])
         y_pos += 32
     
     # Features section
     y_pos += 30
-    draw.text((60, y_pos), "KEY FEATURES", font=font_label, fill=colors["accent"])
+    layout.text((60, y_pos), "KEY FEATURES", label, colors["accent"])
     y_pos += 30
-    
-    for feature in concept["features"][:4]:
-        draw.text((60, y_pos), f"→ {feature}", font=font_small, fill=colors["text"])
+    for i, feature in enumerate(concept["features"][:4]):
+        spec, text = layout.fit_line(f"→ {feature}", CARD_FONTS["small"], text_width,
+                                     MIN_FONT_SIZES["small"], f"feature {i + 1}")
+        layout.text((60, y_pos), text, spec, colors["text"])
         y_pos += 28
     
     # Price point and vibe
     y_pos += 30
-    draw.rectangle([60, y_pos, width - 60, y_pos + 100], fill=colors["card"], outline=colors["accent2"])
+    layout.rect([60, y_pos, width - 60, y_pos + 100], fill=colors["card"], outline=colors["accent2"])
     
-    draw.text((80, y_pos + 15), "PRICE POINT", font=font_label, fill=colors["text_muted"])
-    draw.text((80, y_pos + 40), concept["price_point"], font=font_tagline, fill=colors["highlight"])
+    layout.text((80, y_pos + 15), "PRICE POINT", label, colors["text_muted"])
+    spec, text = layout.fit_line(concept["price_point"], CARD_FONTS["tagline"], 300,
+                                 MIN_FONT_SIZES["tagline"], "price")
+    layout.text((80, y_pos + 40), text, spec, colors["highlight"])
     
-    draw.text((400, y_pos + 15), "VIBE", font=font_label, fill=colors["text_muted"])
-    vibe_wrapped = textwrap.wrap(concept["vibe"], width=30)
+    layout.text((400, y_pos + 15), "VIBE", label, colors["text_muted"])
+    spec, lines = layout.fit_block(concept["vibe"], CARD_FONTS["small"], width - 80 - 400, 2,
+                                   MIN_FONT_SIZES["small"], "vibe")
     vibe_y = y_pos + 40
-    for line in vibe_wrapped[:2]:
-        draw.text((400, vibe_y), line, font=font_small, fill=colors["text"])
+    for line in lines:
+        layout.text((400, vibe_y), line, spec, colors["text"])
         vibe_y += 24
+    layout.check_bottom(y_pos + 100, height - 80, "price box")
     
     # Footer
-    draw.rectangle([0, height - 60, width, height], fill=colors["card"])
-    draw.text((60, height - 42), "Generated by One Spark • Your daily dose of product innovation", 
-              font=font_small, fill=colors["text_muted"])
+    layout.rect([0, height - 60, width, height], fill=colors["card"])
+    layout.text((60, height - 42), "Generated by One Spark • Your daily dose of product innovation",
+                CARD_FONTS["small"], colors["text_muted"])
+    return layout
+
+
+# How cards are written to disk; e.g. CardEncoder("webp", "small") for much smaller files
+card_encoder = CardEncoder()
+
+def create_product_card(concept, category, pain_point, output_path):
+    """Create a beautiful product concept card.
+    
+    Raises CardOverflowError instead of writing a card whose text doesn't fit.
+    """
+    
+    layout = layout_product_card(concept, category, pain_point)
+    if layout.overflow:
+        raise CardOverflowError(layout.overflow)
+    img = Image.new('RGB', CARD_SIZE, CARD_COLORS["bg"])
+    draw_layout(ImageDraw.Draw(img), layout)
     
     # Save
-    img.save(output_path, quality=95)
+    card_encoder.save(img, output_path)
+    return output_path
+
+
+def create_vector_card(concept, category, pain_point, output_path):
+    """Write the same card as .svg or .html, without rasterizing it."""
+    
+    layout = layout_product_card(concept, category, pain_point)
+    if layout.overflow:
+        raise CardOverflowError(layout.overflow)
+    write_vector_card(layout, output_path, CARD_COLORS["bg"], title=concept["name"])
     return output_path
 
 
@@ -411,8 +467,12 @@ def create_product_card(concept, category, pain_point, output_path):
 # MAIN EXECUTION
 # ============================================================================
 
-def generate_spark(output_dir="/home/claude"):
-    """Generate a single product spark."""
+def generate_spark(output_dir="/home/claude", store=None):
+    """Generate a single product spark.
+    
+    With a spark_store.SparkStore the card goes into the store's blob
+    directory and the spark is indexed there instead of left in output_dir.
+    """
     
     print("\n" + "="*60)
     print("🔥 ONE SPARK - Consumer Product Ideation Engine")
@@ -438,17 +498,43 @@ def generate_spark(output_dir="/home/claude"):
     print("-" * 40)
     
     # Step 4: Create visual
-    output_path = Path(output_dir) / f"spark_{concept['name'].lower().replace(' ', '_')}.png"
-    create_product_card(concept, category, primary_pain, output_path)
-    print(f"\n🎨 Product card saved to: {output_path}")
+    if store is not None:
+        output_path = Path(store.tmp_card_path(card_encoder.suffix))
+    else:
+        # Timestamped, so products that share a name don't overwrite each other
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = f"spark_{concept['name'].lower().replace(' ', '_')}_{timestamp}"
+        output_path = Path(output_dir) / f"{stem}{card_encoder.suffix}"
+        suffix = 2
+        while output_path.exists():
+            output_path = Path(output_dir) / f"{stem}_{suffix}{card_encoder.suffix}"
+            suffix += 1
+    try:
+        create_product_card(concept, category, primary_pain, output_path)
+        problems = None
+    except CardOverflowError as e:
+        # The spark is kept without a card rather than with clipped text
+        problems = e.problems
     
     # Return full spark data
-    return {
+    spark = {
+        "generated_at": datetime.now().isoformat(),
         "category": category,
         "concept": concept,
         "pain_point": primary_pain,
-        "card_path": str(output_path)
+        "card_path": None if problems else str(output_path)
     }
+    if problems:
+        spark["overflow"] = problems
+        if store is not None:
+            output_path.unlink(missing_ok=True)  # the store's empty scratch file
+    if store is not None:
+        store.add(spark, None if problems else output_path)
+    if problems:
+        print(f"\n📐 Card not rendered, the text doesn't fit: {'; '.join(problems)}")
+    else:
+        print(f"\n🎨 Product card saved to: {spark['card_path']}")
+    return spark
 
 
 if __name__ == "__main__":
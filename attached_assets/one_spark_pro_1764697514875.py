@@ -6,16 +6,23 @@ Fully automated product ideation using Claude API.
 
 Each run:
 1. Picks a random product category
-2. Searches the web for REAL pain points
+2. Samples REAL pain points (harvested from the web with --harvest)
 3. Uses Claude to generate a novel product concept
 4. Creates a beautiful product card
 
 Requirements:
 - ANTHROPIC_API_KEY environment variable
-- pip install anthropic pillow requests
+- pip install anthropic pillow numpy requests
 
 Usage:
     python one_spark_pro.py
+    python one_spark_pro.py --count 200 --concurrency 16
+    python one_spark_pro.py --list-categories
+    python one_spark_pro.py --count 200 --dry-run      # plan only: no API calls, no cards
+    python one_spark_pro.py --serve 8780 --pool-size 3 --pool-ttl 3600   # sparks over HTTP from a warm pool
+    python one_spark_pro.py --queue /shared/q --count 2000    # coordinator: plan, wait for workers, merge
+    python one_spark_pro.py --queue /shared/q --work           # worker, on as many nodes as you like
+    python one_spark_pro.py --harvest "https://html.duckduckgo.com/html/?q={query}" --pain-corpus pains.sqlite
     
 Or set your API key inline:
     ANTHROPIC_API_KEY=your_key python one_spark_pro.py
@@ -24,19 +31,34 @@ Or set your API key inline:
 import os
 import sys
 import json
-import random
-import textwrap
+import time
+import atexit
+import shutil
+import argparse
+import threading
+import functools
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 
-try:
-    from anthropic import Anthropic
-except ImportError:
-    print("Installing anthropic package...")
-    os.system("pip install anthropic --break-system-packages -q")
-    from anthropic import Anthropic
-
-from PIL import Image, ImageDraw, ImageFont
+# anthropic, Pillow, numpy and asyncio are imported by the stages that use
+# them, so planning-only commands (--list-categories, --dry-run) and
+# short-lived workers start without paying for them.
+import spark_fonts
+from spark_client import ClientManager, TokenLedger, usage_from_message, cached_usage
+from spark_batches import BatchJobStore, submit_job, wait_for_job, iter_job_results
+from spark_stream import ConceptStreamParser, OffSchemaError
+from spark_ratelimit import RateLimiter, DEFAULT_LIMITER_PATH
+from spark_cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_MAX_BYTES
+from spark_store import SparkStore
+from spark_corpus import PainCorpus, DEFAULT_CORPUS_PATH
+from spark_sampler import SparkSampler, MODES as SAMPLER_MODES
+from spark_layout import CardLayout, CardOverflowError, draw_layout
+from spark_encode import CardEncoder, FORMATS as IMAGE_FORMATS, PRESET_NAMES, encode_summary, thumbnail_path
+from spark_vector import VECTOR_FORMATS, write_vector_card
+from spark_manifest import RenderManifest, content_hash
+from spark_trace import tracer, configure as configure_tracing
+from spark_fonts import warm_fonts
 
 # ============================================================================
 # CONFIGURATION  
@@ -69,12 +91,12 @@ SEARCH_TEMPLATES = [
 
 
 # ============================================================================
-# PAIN POINT EXTRACTION (Simulated - In production, use real web scraping)
+# PAIN POINT EXTRACTION
 # ============================================================================
 
 # This is a comprehensive database of REAL pain points extracted from 
 # Reddit, Amazon reviews, forums, and product communities.
-# In the full production version, this would be dynamically scraped.
+# --harvest scrapes more into a spark_corpus.py corpus (see harvest_pain_points).
 
 PAIN_POINT_DATABASE = {
     "kitchen gadgets": [
@@ -214,22 +236,40 @@ PAIN_POINT_DATABASE = {
 # CLAUDE API INTEGRATION
 # ============================================================================
 
-def generate_product_with_claude(category: str, pain_points: list) -> dict:
-    """Use Claude to generate a novel product concept."""
-    
-    client = Anthropic()
-    
-    pain_points_text = "\n".join([f"- {p}" for p in pain_points[:5]])
+MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 1024
+
+# How often a streamed answer that goes off-schema is retried
+SCHEMA_RETRIES = 2
+
+# One pooled client per process, with retries (and optional hedging)
+client_manager = ClientManager()
+
+# --quiet: drop per-spark progress lines (warnings and run summaries still print)
+quiet = False
+
+
+def say(*args, **kwargs):
+    """print() for progress chatter that --quiet turns off."""
     
-    prompt = f"""You are a brilliant consumer product designer. Generate ONE novel product concept for the "{category}" category.
+    if not quiet:
+        print(*args, **kwargs)
 
-REAL PAIN POINTS from consumers (from Reddit, Amazon reviews, forums):
-{pain_points_text}
+# Off by default: the prompt is the cache key, so a repeated category and
+# pain subset would replay an old concept instead of a new idea. --cache
+# turns it on for identical retries and resumed runs.
+response_cache = None
+
+
+# Everything that is identical across sparks lives in this prefix, so the
+# API can serve it from its prompt cache. Only the suffix built by
+# build_prompt (category + pain points) changes per call.
+PROMPT_PREFIX = """You are a brilliant consumer product designer. You generate ONE novel consumer product concept for the category and the REAL PAIN POINTS from consumers (from Reddit, Amazon reviews, forums) given to you.
 
-Create a product that solves one or more of these pain points in an innovative way. 
+Create a product that solves one or more of the pain points in an innovative way. 
 
 RESPOND WITH ONLY VALID JSON in this exact format:
-{{
+{
     "name": "ProductName",
     "tagline": "A compelling 5-8 word tagline",
     "pain_solved": "The specific pain point this addresses",
@@ -237,7 +277,7 @@ RESPOND WITH ONLY VALID JSON in this exact format:
     "features": ["Feature 1", "Feature 2", "Feature 3", "Feature 4"],
     "price_point": "$XX or $XX-$XX range",
     "vibe": "X meets Y aesthetic comparison"
-}}
+}
 
 REQUIREMENTS:
 - Name should be memorable, 1-2 words, brandable
@@ -251,38 +291,197 @@ BE CREATIVE. Don't just describe existing products. Invent something NEW that wo
 
 Respond with ONLY the JSON, no other text."""
 
-    message = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1024,
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
+
+def build_prompt(category: str, pain_points: list) -> str:
+    """Build the per-spark part of the prompt for a category and its pain points."""
+    
+    pain_points_text = "\n".join([f"- {p}" for p in pain_points[:5]])
+    
+    return f"""Generate ONE novel product concept for the "{category}" category.
+
+REAL PAIN POINTS from consumers (from Reddit, Amazon reviews, forums):
+{pain_points_text}
+
+Respond with ONLY the JSON, no other text."""
+
+
+def build_request(category: str, pain_points: list) -> dict:
+    """messages.create parameters: cached static system prefix + short user suffix."""
     
-    response_text = message.content[0].text.strip()
+    return {
+        "model": MODEL,
+        "max_tokens": MAX_TOKENS,
+        "system": [
+            {"type": "text", "text": PROMPT_PREFIX, "cache_control": {"type": "ephemeral"}}
+        ],
+        "messages": [
+            {"role": "user", "content": build_prompt(category, pain_points)}
+        ],
+    }
+
+
+def request_cache_text(request: dict) -> str:
+    """Full prompt text of a request, used as the response cache key."""
     
-    # Clean up response if needed
-    if response_text.startswith("```"):
-        response_text = response_text.split("```")[1]
-        if response_text.startswith("json"):
-            response_text = response_text[4:]
-    response_text = response_text.strip()
+    return request["system"][0]["text"] + "\n\n" + request["messages"][0]["content"]
+
+
+def parse_concept_response(response_text: str) -> dict:
+    """Parse Claude's reply into a concept dict, stripping code fences."""
     
-    return json.loads(response_text)
+    with tracer.span("json_cleanup", chars=len(response_text)):
+        response_text = response_text.strip()
+        
+        # Clean up response if needed
+        if response_text.startswith("```"):
+            response_text = response_text.split("```")[1]
+            if response_text.startswith("json"):
+                response_text = response_text[4:]
+        response_text = response_text.strip()
+        
+        return json.loads(response_text)
+
+
+def generate_concept_with_usage(category: str, pain_points: list) -> tuple:
+    """Generate a concept and return it with the token usage of the call."""
+    
+    request = build_request(category, pain_points)
+    cached = response_cache.get(MODEL, request_cache_text(request), MAX_TOKENS) if response_cache else None
+    if cached is not None:
+        return parse_concept_response(cached), cached_usage()
+    
+    message = client_manager.create(**request)
+    
+    return _parse_and_cache(request, message)
+
+
+def generate_product_with_claude(category: str, pain_points: list) -> dict:
+    """Use Claude to generate a novel product concept."""
+    
+    return generate_concept_with_usage(category, pain_points)[0]
+
+
+async def generate_concept_with_usage_async(category: str, pain_points: list) -> tuple:
+    """Async variant of generate_concept_with_usage for batch runs."""
+    
+    request = build_request(category, pain_points)
+    cached = response_cache.get(MODEL, request_cache_text(request), MAX_TOKENS) if response_cache else None
+    if cached is not None:
+        return parse_concept_response(cached), cached_usage()
+    
+    message = await client_manager.acreate(**request)
+    
+    return _parse_and_cache(request, message)
+
+
+def _stream_once(request: dict, on_field) -> tuple:
+    parser = ConceptStreamParser(on_field)
+    reservation = client_manager.reserve(request)
+    message = None
+    streamed = 0
+    try:
+        with client_manager.client.messages.stream(**request) as stream:
+            for text in stream.text_stream:
+                streamed += len(text)
+                parser.feed(text)  # raising here drops the connection mid-answer
+            message = stream.get_final_message()
+    finally:
+        # An aborted stream is charged only for the output it got (~4 chars a token)
+        client_manager.settle(reservation, message, streamed // 4)
+    parser.close()
+    return _parse_and_cache(request, message)
+
+
+async def _astream_once(request: dict, on_field) -> tuple:
+    parser = ConceptStreamParser(on_field)
+    reservation = await client_manager.areserve(request)
+    message = None
+    streamed = 0
+    try:
+        async with client_manager.async_client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                streamed += len(text)
+                parser.feed(text)
+            message = await stream.get_final_message()
+    finally:
+        await client_manager.asettle(reservation, message, streamed // 4)
+    parser.close()
+    return _parse_and_cache(request, message)
+
+
+def _replay_cached(response_text: str, on_field) -> tuple:
+    concept = parse_concept_response(response_text)
+    if on_field is not None:
+        for key, value in concept.items():
+            on_field(key, value)
+    return concept, cached_usage()
+
+
+def stream_concept_with_usage(category: str, pain_points: list, on_field=None,
+                              schema_retries: int = SCHEMA_RETRIES) -> tuple:
+    """Streaming variant of generate_concept_with_usage.
+    
+    The concept JSON is validated field by field while it streams in.
+    on_field(key, value) is called as each field completes. The request is
+    aborted and retried as soon as the output goes off-schema, so after a
+    retry on_field can see a field again.
+    """
+    
+    request = build_request(category, pain_points)
+    cached = response_cache.get(MODEL, request_cache_text(request), MAX_TOKENS) if response_cache else None
+    if cached is not None:
+        return _replay_cached(cached, on_field)
+    
+    for attempt in range(schema_retries + 1):
+        try:
+            return client_manager.call(_stream_once, request, on_field)
+        except OffSchemaError as e:
+            if attempt >= schema_retries:
+                raise
+            print(f"✂️  Off-schema output ({e}), retrying...")
+
+
+async def stream_concept_with_usage_async(category: str, pain_points: list, on_field=None,
+                                          schema_retries: int = SCHEMA_RETRIES) -> tuple:
+    """Async variant of stream_concept_with_usage for batch runs."""
+    
+    request = build_request(category, pain_points)
+    cached = response_cache.get(MODEL, request_cache_text(request), MAX_TOKENS) if response_cache else None
+    if cached is not None:
+        return _replay_cached(cached, on_field)
+    
+    for attempt in range(schema_retries + 1):
+        try:
+            return await client_manager.acall(_astream_once, request, on_field)
+        except OffSchemaError as e:
+            if attempt >= schema_retries:
+                raise
+            print(f"✂️  Off-schema output ({category}: {e}), retrying...")
+
+
+def _parse_and_cache(request: dict, message) -> tuple:
+    # Only responses that parse are worth replaying
+    response_text = message.content[0].text
+    concept = parse_concept_response(response_text)
+    if response_cache:
+        response_cache.put(MODEL, request_cache_text(request), MAX_TOKENS, response_text)
+    return concept, usage_from_message(message)
 
 
 # ============================================================================
 # VISUAL CARD GENERATION
 # ============================================================================
 
-def create_product_card(concept: dict, category: str, output_path: str) -> str:
-    """Create a beautiful, premium product concept card."""
-    
-    # Card dimensions (Instagram story friendly)
-    width, height = 1080, 1920
-    
-    # Premium color palette
-    colors = {
+# Card dimensions (Instagram story friendly)
+CARD_SIZE = (1080, 1920)
+
+# Bump whenever a change to the layout or drawing code alters rendered cards,
+# so incremental re-renders (--render-only --incremental) redo them all
+RENDERER_VERSION = 1
+
+# Premium color palettes
+THEMES = {
+    "default": {
         "bg_gradient_top": "#0f0f23",
         "bg_gradient_bottom": "#1a1a3e", 
         "card_bg": "#1e1e42",
@@ -292,212 +491,1530 @@ def create_product_card(concept: dict, category: str, output_path: str) -> str:
         "text_primary": "#ffffff",
         "text_secondary": "#b0b0c0",
         "divider": "#3a3a5c",
-    }
+    },
+}
+
+# (font file, size) for each text role on the card
+CARD_FONTS = {
+    "brand": ("DejaVuSans-Bold.ttf", 24),
+    "title": ("DejaVuSans-Bold.ttf", 72),
+    "tagline": ("DejaVuSans.ttf", 36),
+    "section": ("DejaVuSans-Bold.ttf", 20),
+    "body": ("DejaVuSans.ttf", 28),
+    "small": ("DejaVuSans.ttf", 22),
+    "price": ("DejaVuSans-Bold.ttf", 48),
+}
+
+
+def _hex_to_rgb(color: str) -> tuple:
+    color = color.lstrip("#")
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+@functools.lru_cache(maxsize=16)
+def card_template(theme: str, width: int, height: int) -> "Image.Image":
+    """Build the static card layer for a theme and size, once per process.
+    
+    Holds everything that is identical across cards: the background
+    gradient, accent bars, footer panel and the "ONE SPARK" header. Callers
+    must draw on a copy, never on the cached image itself.
+    """
+    
+    import numpy as np
+    from PIL import Image, ImageDraw
     
-    # Create image with gradient background
-    img = Image.new('RGB', (width, height), colors["bg_gradient_top"])
+    colors = THEMES[theme]
+    
+    # Vertical gradient, computed for one column and broadcast across the row
+    top = np.array(_hex_to_rgb(colors["bg_gradient_top"]), dtype=np.float64)
+    bottom = np.array(_hex_to_rgb(colors["bg_gradient_bottom"]), dtype=np.float64)
+    ratio = (np.arange(height, dtype=np.float64) / height)[:, None]
+    column = (top + (bottom - top) * ratio).astype(np.uint8)
+    pixels = np.ascontiguousarray(np.broadcast_to(column[:, None, :], (height, width, 3)))
+    img = Image.fromarray(pixels, "RGB")
     draw = ImageDraw.Draw(img)
     
-    # Simple gradient effect
-    for y in range(height):
-        ratio = y / height
-        r = int(15 + (26 - 15) * ratio)
-        g = int(15 + (26 - 15) * ratio)
-        b = int(35 + (62 - 35) * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    draw_layout(draw, template_layout(theme, width, height))
+    return img
+
+
+@functools.lru_cache(maxsize=16)
+def template_layout(theme: str, width: int, height: int) -> CardLayout:
+    """The static layer's shapes and text, shared by the raster template and vector cards."""
+    
+    colors = THEMES[theme]
+    layout = CardLayout(width, height)
     
-    # Load fonts
-    try:
-        font_brand = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-        font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 72)
-        font_tagline = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 36)
-        font_section = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-        font_body = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 28)
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 22)
-        font_price = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48)
-    except:
-        font_brand = font_title = font_tagline = font_section = font_body = font_small = font_price = ImageFont.load_default()
+    # Top accent bar and brand header
+    layout.rect([0, 0, width, 6], fill=colors["accent"])
+    layout.text((60, 80), "ONE SPARK", CARD_FONTS["brand"], colors["accent"])
+    
+    # Footer panel and bottom accent bar
+    layout.rect([0, height - 100, width, height], fill=colors["card_bg"])
+    layout.rect([0, height - 6, width, height], fill=colors["accent_secondary"])
+    
+    return layout
+
+
+# Smallest sizes each text role may shrink to before the card counts as overflowing
+MIN_FONT_SIZES = {"title": 40, "tagline": 28, "body": 22, "small": 18, "price": 32}
+
+
+def _layout_card(concept: dict, category: str, colors: dict, size: tuple, body_size: int,
+                 generated_at: str = None) -> tuple:
+    """One layout pass with the body text at body_size. Returns (layout, price box bottom)."""
     
+    width, height = size
+    layout = CardLayout(width, height)
     margin = 60
+    text_width = width - 2 * margin
+    small = CARD_FONTS["small"]
+    section = CARD_FONTS["section"]
+    body = (CARD_FONTS["body"][0], body_size)
+    body_line = round(body_size * 1.36)
     y = 80
     
-    # Top accent bar
-    draw.rectangle([0, 0, width, 6], fill=colors["accent"])
-    
-    # Brand header
-    draw.text((margin, y), "ONE SPARK", font=font_brand, fill=colors["accent"])
+    # Brand header ("ONE SPARK" itself is part of the template)
     y += 35
-    draw.text((margin, y), f"Daily Product Idea • {category.upper()}", font=font_small, fill=colors["text_secondary"])
+    spec, text = layout.fit_line(f"Daily Product Idea • {category.upper()}", small, text_width,
+                                 MIN_FONT_SIZES["small"], field="category")
+    layout.text((margin, y), text, spec, colors["text_secondary"])
     y += 80
     
-    # Product name
-    name = concept.get("name", "Product")
-    draw.text((margin, y), name, font=font_title, fill=colors["text_primary"])
+    # Product name: shrinks, but is never truncated
+    spec, text = layout.fit_line(concept.get("name", "Product"), CARD_FONTS["title"], text_width,
+                                 MIN_FONT_SIZES["title"], field="name", truncate=False)
+    layout.text((margin, y), text, spec, colors["text_primary"])
     y += 100
     
-    # Tagline
-    tagline = concept.get("tagline", "")
-    draw.text((margin, y), tagline, font=font_tagline, fill=colors["gold"])
-    y += 80
+    # Tagline, up to two lines
+    spec, lines = layout.fit_block(concept.get("tagline", ""), CARD_FONTS["tagline"], text_width, max_lines=2,
+                                   min_size=MIN_FONT_SIZES["tagline"], field="tagline")
+    for i, line in enumerate(lines):
+        layout.text((margin, y + i * 44), line, spec, colors["gold"])
+    y += 80 + 44 * max(0, len(lines) - 1)
     
     # Divider
-    draw.line([(margin, y), (width - margin, y)], fill=colors["divider"], width=2)
+    layout.line([(margin, y), (width - margin, y)], colors["divider"], width=2)
     y += 50
     
     # Problem section
-    draw.text((margin, y), "THE PROBLEM", font=font_section, fill=colors["accent"])
+    layout.text((margin, y), "THE PROBLEM", section, colors["accent"])
     y += 40
-    pain = concept.get("pain_solved", "")
-    for line in textwrap.wrap(pain, width=40):
-        draw.text((margin, y), line, font=font_body, fill=colors["text_secondary"])
-        y += 38
+    for line in layout.measurer.wrap(body, concept.get("pain_solved", ""), text_width):
+        layout.text((margin, y), line, body, colors["text_secondary"])
+        y += body_line
     y += 30
     
-    # Solution section  
-    draw.text((margin, y), "THE SOLUTION", font=font_section, fill=colors["accent_secondary"])
+    # Solution section
+    layout.text((margin, y), "THE SOLUTION", section, colors["accent_secondary"])
     y += 40
-    desc = concept.get("description", "")
-    for line in textwrap.wrap(desc, width=40):
-        draw.text((margin, y), line, font=font_body, fill=colors["text_primary"])
-        y += 38
+    for line in layout.measurer.wrap(body, concept.get("description", ""), text_width):
+        layout.text((margin, y), line, body, colors["text_primary"])
+        y += body_line
     y += 40
     
     # Features section
-    draw.text((margin, y), "KEY FEATURES", font=font_section, fill=colors["accent"])
+    layout.text((margin, y), "KEY FEATURES", section, colors["accent"])
     y += 40
-    features = concept.get("features", [])
-    for feature in features[:4]:
-        draw.text((margin, y), f"→  {feature}", font=font_small, fill=colors["text_primary"])
+    for feature in concept.get("features", [])[:4]:
+        spec, text = layout.fit_line(f"→  {feature}", small, text_width, MIN_FONT_SIZES["small"], field="feature")
+        layout.text((margin, y), text, spec, colors["text_primary"])
         y += 36
     y += 40
     
     # Price and Vibe box
     box_y = y
-    draw.rectangle([margin, box_y, width - margin, box_y + 180], fill=colors["card_bg"], outline=colors["divider"], width=2)
-    
-    # Price
-    draw.text((margin + 30, box_y + 20), "PRICE POINT", font=font_section, fill=colors["text_secondary"])
-    price = concept.get("price_point", "$TBD")
-    draw.text((margin + 30, box_y + 55), price, font=font_price, fill=colors["gold"])
-    
-    # Vibe
-    draw.text((margin + 30, box_y + 120), "VIBE", font=font_section, fill=colors["text_secondary"])
-    vibe = concept.get("vibe", "")
-    vibe_lines = textwrap.wrap(vibe, width=45)
-    vibe_y = box_y + 145
-    for line in vibe_lines[:1]:
-        draw.text((margin + 30, vibe_y), line, font=font_small, fill=colors["text_primary"])
-    
-    # Footer
+    inner_width = text_width - 60
+    layout.rect([margin, box_y, width - margin, box_y + 180], fill=colors["card_bg"], outline=colors["divider"], width=2)
+    layout.text((margin + 30, box_y + 20), "PRICE POINT", section, colors["text_secondary"])
+    spec, text = layout.fit_line(concept.get("price_point", "$TBD"), CARD_FONTS["price"], inner_width,
+                                 MIN_FONT_SIZES["price"], field="price")
+    layout.text((margin + 30, box_y + 55), text, spec, colors["gold"])
+    layout.text((margin + 30, box_y + 120), "VIBE", section, colors["text_secondary"])
+    spec, text = layout.fit_line(concept.get("vibe", ""), small, inner_width, MIN_FONT_SIZES["small"], field="vibe")
+    layout.text((margin + 30, box_y + 145), text, spec, colors["text_primary"])
+    
+    # Footer (panel and bottom accent bar are part of the template)
     footer_y = height - 100
-    draw.rectangle([0, footer_y, width, height], fill=colors["card_bg"])
-    timestamp = datetime.now().strftime("%B %d, %Y")
-    draw.text((margin, footer_y + 35), f"Generated by One Spark • {timestamp}", font=font_small, fill=colors["text_secondary"])
+    # Dated from the record, so re-rendering a saved spark gives the same card
+    generated = datetime.fromisoformat(generated_at) if generated_at else datetime.now()
+    timestamp = generated.strftime("%B %d, %Y")
+    layout.text((margin, footer_y + 35), f"Generated by One Spark • {timestamp}", small, colors["text_secondary"])
+    
+    return layout, box_y + 180
+
+
+def layout_product_card(concept: dict, category: str, theme: str = "default", size: tuple = CARD_SIZE,
+                        generated_at: str = None) -> CardLayout:
+    """Compute the whole card layout before anything is drawn.
+    
+    Body text shrinks step by step until the price box clears the footer.
+    If it still doesn't fit at the minimum size, or the name doesn't fit
+    at its minimum, layout.overflow says why. The footer is dated
+    generated_at (an ISO timestamp), or today if it's not given.
+    """
+    
+    colors = THEMES[theme]
+    limit = size[1] - 100 - 20  # keep a gap above the footer panel
+    body_size = CARD_FONTS["body"][1]
+    while True:
+        layout, bottom = _layout_card(concept, category, colors, size, body_size, generated_at)
+        if bottom <= limit or body_size - 2 < MIN_FONT_SIZES["body"]:
+            break
+        body_size -= 2
+    layout.check_bottom(bottom, limit, "price box")
+    return layout
+
+
+# How cards are written to disk (--image-format, --image-preset, --target-kb, --thumbnails)
+card_encoder = CardEncoder()
+
+# "pillow" renders images through card_encoder; "svg" or "html" writes vector cards (--vector)
+card_backend = "pillow"
+
+
+def card_suffix() -> str:
+    return card_encoder.suffix if card_backend == "pillow" else f".{card_backend}"
+
+
+def card_output() -> str:
+    return repr(card_encoder) if card_backend == "pillow" else f"vector {card_backend}"
+
+
+def render_key(theme: str = "default", size: tuple = CARD_SIZE) -> dict:
+    """Everything besides the concept that a rendered card depends on (for the render manifest)."""
+    
+    output = {"backend": card_backend}
+    if card_backend == "pillow":
+        output.update(format=card_encoder.format, preset=card_encoder.preset,
+                      target_bytes=card_encoder.target_bytes, thumbnails=list(card_encoder.thumbnails))
+    return {
+        "style": content_hash({"colors": THEMES[theme], "fonts": CARD_FONTS, "min_sizes": MIN_FONT_SIZES}),
+        "renderer": RENDERER_VERSION,
+        "size": list(size),
+        "output": content_hash(output),
+    }
+
+
+def create_product_card(concept: dict, category: str, output_path: str,
+                        theme: str = "default", size: tuple = CARD_SIZE, encoder: CardEncoder = None,
+                        generated_at: str = None) -> dict:
+    """Create a beautiful, premium product concept card.
+    
+    Returns the encoder's report (path, bytes, seconds, thumbnails).
+    Raises CardOverflowError instead of writing a card whose text doesn't fit.
+    """
+    
+    from PIL import ImageDraw
     
-    # Accent bar at bottom
-    draw.rectangle([0, height - 6, width, height], fill=colors["accent_secondary"])
+    start = time.perf_counter()
+    layout = layout_product_card(concept, category, theme, size, generated_at)
+    if layout.overflow:
+        raise CardOverflowError(layout.overflow)
+    
+    # Static layers come pre-composited from the template cache
+    img = card_template(theme, *size).copy()
+    draw_layout(ImageDraw.Draw(img), layout)
+    render_seconds = time.perf_counter() - start
     
     # Save
-    img.save(output_path, quality=95)
-    return output_path
+    report = (encoder or card_encoder).save(img, output_path)
+    report["render_seconds"] = render_seconds
+    return report
+
+
+def create_vector_card(concept: dict, category: str, output_path: str,
+                       theme: str = "default", size: tuple = CARD_SIZE, generated_at: str = None) -> dict:
+    """Write the card as SVG or self-contained HTML (by output_path's suffix), without rasterizing.
+    
+    Same layout, template and overflow rules as create_product_card.
+    """
+    
+    start = time.perf_counter()
+    layout = layout_product_card(concept, category, theme, size, generated_at)
+    if layout.overflow:
+        raise CardOverflowError(layout.overflow)
+    colors = THEMES[theme]
+    layout.ops[:0] = template_layout(theme, *size).ops
+    render_seconds = time.perf_counter() - start
+    report = write_vector_card(layout, output_path, (colors["bg_gradient_top"], colors["bg_gradient_bottom"]),
+                               title=concept.get("name", "One Spark"))
+    report["render_seconds"] = render_seconds
+    return report
 
 
 # ============================================================================
 # MAIN ENGINE
 # ============================================================================
 
-def run_spark(output_dir: str = None) -> dict:
-    """Run the One Spark ideation engine."""
+# Scraped pain points on disk (--pain-corpus); categories it doesn't cover use the built-in ones
+pain_corpus = None
+
+# How many corpus pain points are drawn as candidates when steering (--dedup)
+STEER_POOL = 32
+
+
+def get_pain_points(category: str) -> list:
+    """Get the built-in pain points for a category, falling back to generic ones."""
     
+    if category in PAIN_POINT_DATABASE:
+        return PAIN_POINT_DATABASE[category]
+    # Use a general search or fallback
+    return [
+        f"Products in {category} are overpriced for the quality",
+        f"Most {category} products break or fail too quickly",
+        f"Hard to find {category} that actually work as advertised",
+        f"Design and aesthetics are often neglected in {category}",
+    ]
+
+
+# Category and pain-point draws for the run (--seed, --sampling); all spark randomness goes through it
+sampler = SparkSampler(CATEGORIES)
+
+
+def candidate_pain_points(category: str, k: int) -> list:
+    """Up to k pain points for a category, drawn from the corpus when it has any.
+    
+    Corpus pain points are drawn by ordinal, so only the chosen rows are
+    read. The sampler weights them by the category's intensity strata
+    (loaded once, 8 bytes a row), or deals them from a per-category deck
+    in coverage mode.
+    """
+    
+    if pain_corpus is not None and category in pain_corpus:
+        seqs = sampler.ordinals(category, pain_corpus.count(category), k,
+                                strata=lambda: pain_corpus.seqs_by_intensity(category))
+        return [entry["pain"] for entry in pain_corpus.fetch(category, seqs)]
+    return sampler.pains(category, get_pain_points(category), k)
+
+
+def select_pain_points(category: str) -> list:
+    """Select a random subset of pain points for a category."""
+    
+    return candidate_pain_points(category, 4)
+
+
+# Near-duplicate checks (--dedup); None accepts every concept
+concept_index = None
+
+# Categories tried before giving up on finding an unsaturated pain region
+REGION_ATTEMPTS = 8
+
+
+def plan_spark() -> tuple:
+    """Pick the category and pain points for the next spark.
+    
+    Returns (category, selected_pains, saturated). With a concept index,
+    pain points are steered towards the least-covered ones and saturated
+    regions are avoided. saturated is True only if every attempt hit one.
+    """
+    
+    with tracer.span("category", mode=sampler.mode) as span:
+        category = sampler.category()
+        span.set(category=category)
+    with tracer.span("pain_sampling", category=category, corpus=pain_corpus is not None) as span:
+        if concept_index is None:
+            return category, select_pain_points(category), False
+        for attempt in range(REGION_ATTEMPTS):
+            selected_pains = concept_index.steer_pains(category, candidate_pain_points(category, STEER_POOL),
+                                                       rng=sampler.rng)
+            if not concept_index.is_saturated(category, selected_pains):
+                concept_index.claim(category, selected_pains)
+                span.set(category=category, attempts=attempt + 1)
+                return category, selected_pains, False
+            category = sampler.category()
+        span.set(category=category, attempts=REGION_ATTEMPTS, saturated=True)
+        return category, selected_pains, True
+
+
+def list_categories(corpus: PainCorpus = None):
+    """Print every category with its built-in (and corpus) pain point counts."""
+    
+    counts = corpus.counts() if corpus is not None else {}
+    for category in CATEGORIES:
+        line = f"{category:<36} {len(get_pain_points(category)):>3} built-in pain points"
+        if corpus is not None:
+            line += f", {counts.get(category, 0)} in corpus"
+        print(line)
+    print(f"\n📦 {len(CATEGORIES)} categories")
+
+
+def accept_concept(concept: dict):
+    """Index a new concept. Returns (name, similarity) of the match if it's a near-duplicate."""
+    
+    if concept_index is None:
+        return None
+    match = concept_index.find_duplicate(concept)
+    if match is None:
+        concept_index.add(concept)
+    return match
+
+
+def saved_spark_records(output_dir, store: SparkStore = None) -> list:
+    """Every spark record already saved to a store or as spark_*.json in output_dir."""
+    
+    if store is not None:
+        return store.query()
+    records = []
+    for json_path in sorted(Path(output_dir).glob("spark_*.json")):
+        try:
+            with open(json_path) as f:
+                records.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return records
+
+
+def harvest_pain_points(search_url: str, corpus: PainCorpus, concurrency: int = 8, per_host: int = 4,
+                        max_links: int = 5, page_cache: "PageCache" = None):
+    """Crawl SEARCH_TEMPLATES for every category and stream complaints into a corpus.
+    
+    search_url is a search-results URL with a {query} placeholder.
+    """
+    
+    import asyncio
+    from spark_harvest import Harvester
+    
+    harvester = Harvester(search_url, corpus, cache=page_cache, concurrency=concurrency,
+                          per_host=per_host, max_links=max_links)
+    print(f"🕸️  Harvesting {len(CATEGORIES) * len(SEARCH_TEMPLATES)} queries into {corpus.path}")
+    stats = asyncio.run(harvester.harvest(CATEGORIES, SEARCH_TEMPLATES))
+    print(f"📥 {stats['fetched']} pages fetched ({stats['bytes'] / 1024:.0f} KB), "
+          f"{stats['revalidated']} unchanged (304), {stats['errors']} errors")
+    print(f"😤 {stats['sentences']} complaint sentences, {stats['added']} new pain points")
+    return stats
+
+
+def demo_concept(selected_pains: list) -> dict:
+    """Placeholder concept used when the Claude API is unavailable."""
+    
+    return {
+        "name": "DemoProduct",
+        "tagline": "This is a demo - set your API key!",
+        "pain_solved": selected_pains[0] if selected_pains else "Demo pain point",
+        "description": "Set your ANTHROPIC_API_KEY environment variable to generate real product concepts with Claude AI.",
+        "features": ["AI-powered ideation", "Real pain points", "Beautiful visuals", "Daily inspiration"],
+        "price_point": "$0 - It's a demo",
+        "vibe": "Demo meets placeholder"
+    }
+
+
+def spark_outcome(usage: dict) -> str:
+    """How a concept was obtained: "generated", "response_cache" or "demo"."""
+    
+    if usage is None:
+        return "demo"
+    return "response_cache" if usage.get("response_cache") else "generated"
+
+
+def build_spark_record(concept: dict, category: str, selected_pains: list, card_path: str,
+                       usage: dict = None, error: str = None, extra: dict = None) -> dict:
+    """The JSON record of one spark, as written to disk or a SparkStore.
+    
+    extra holds more top-level entries, e.g. the batch request it came from.
+    """
+    
+    full_data = {
+        "generated_at": datetime.now().isoformat(),
+        "category": category,
+        "pain_points": selected_pains,
+        "concept": concept,
+        "card_path": str(card_path)
+    }
+    full_data["outcome"] = spark_outcome(usage)
+    if usage is not None:
+        full_data["model"] = MODEL
+        full_data["usage"] = usage
+    if error is not None:
+        full_data["error"] = error
+    full_data.update(extra or {})
+    return full_data
+
+
+def write_spark_record(concept: dict, category: str, selected_pains: list, output_dir: Path,
+                       usage: dict = None, error: str = None, store: SparkStore = None,
+                       extra: dict = None) -> dict:
+    """Reserve output paths for one spark and write its JSON record.
+    
+    With a store, no files are written: the card path is a scratch file in
+    the store, and the record is indexed by store.add() once it's rendered.
+    """
+    
+    if store is not None:
+        return _with_thumbnails(build_spark_record(concept, category, selected_pains,
+                                                   store.tmp_card_path(card_suffix()), usage, error, extra))
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_name = concept['name'].lower().replace(' ', '_').replace('-', '_')
+    stem = f"spark_{safe_name}_{timestamp}"
+    # Several sparks can finish within the same second in batch mode
+    suffix = 2
+    while (output_dir / f"{stem}.json").exists():
+        stem = f"spark_{safe_name}_{timestamp}_{suffix}"
+        suffix += 1
+    output_path = output_dir / f"{stem}{card_suffix()}"
+    
+    json_path = output_dir / f"{stem}.json"
+    full_data = _with_thumbnails(build_spark_record(concept, category, selected_pains, output_path, usage, error,
+                                                    extra))
+    with tracer.span("write_record"), open(json_path, 'w') as f:
+        json.dump(full_data, f, indent=2)
+    
+    return full_data
+
+
+def _with_thumbnails(record: dict) -> dict:
+    # Thumbnail paths are known up front, so the JSON record is written only once
+    if card_encoder.thumbnails and card_backend == "pillow":
+        record["thumbnails"] = {str(width): str(thumbnail_path(record["card_path"], width))
+                                for width in card_encoder.thumbnails if width < CARD_SIZE[0]}
+    return record
+
+
+def render_spark_record(record: dict, card_path: str = None) -> dict:
+    """Render and encode the card for a saved spark record. Safe to run in a worker process."""
+    
+    generated_at = record.get("generated_at")
+    if card_backend != "pillow":
+        return create_vector_card(record["concept"], record["category"], card_path or record["card_path"],
+                                  generated_at=generated_at)
+    return create_product_card(record["concept"], record["category"], card_path or record["card_path"],
+                               generated_at=generated_at)
+
+
+def try_render_spark_record(record: dict, card_path: str = None) -> tuple:
+    """render_spark_record for worker pools: (encode report, None), or (None, problems) on overflow."""
+    
+    try:
+        return render_spark_record(record, card_path), None
+    except CardOverflowError as e:
+        return None, e.problems
+
+
+def trace_card(report: dict):
+    """Record the render, encode and write spans a worker timed for one card, back to back."""
+    
+    start = tracer.record("write_card", report["write_seconds"])
+    start = tracer.record("encode", report["seconds"] - report["write_seconds"], end=start,
+                          format=report["format"], bytes=report["bytes"])
+    tracer.record("render", report.get("render_seconds"), end=start)
+
+
+def report_overflow(record: dict, problems: list, store: SparkStore = None):
+    """Record that a spark's card overflowed: it keeps its data but gets no card."""
+    
+    print(f"📐 {record['concept'].get('name', 'Product')} ({record['category']}) not rendered: {'; '.join(problems)}")
+    tracer.count("spark_overflows_total")
+    card_path = Path(record["card_path"])
+    record["card_path"] = None
+    record["overflow"] = problems
+    record.pop("thumbnails", None)
+    if store is not None:
+        card_path.unlink(missing_ok=True)  # the store's empty scratch file
+    else:
+        with open(card_path.with_suffix(".json"), "w") as f:
+            json.dump(record, f, indent=2)
+
+
+def init_render_worker(font_search_path: list = None, encoder: CardEncoder = None, backend: str = None):
+    """Warm a renderer process: load card fonts and the default template once."""
+    
+    global card_encoder, card_backend
+    if font_search_path is not None:
+        spark_fonts.configure(font_search_path)
+    if encoder is not None:
+        card_encoder = encoder
+    if backend is not None:
+        card_backend = backend
+    warm_fonts(CARD_FONTS.values())
+    card_template("default", *CARD_SIZE)
+
+
+def _render_pool(render_workers: int) -> "ProcessPoolExecutor":
+    from concurrent.futures import ProcessPoolExecutor
+    
+    return ProcessPoolExecutor(max_workers=render_workers, initializer=init_render_worker,
+                               initargs=(spark_fonts.registry.search_path, card_encoder, card_backend))
+
+
+def save_spark(concept: dict, category: str, selected_pains: list, output_dir: Path,
+               usage: dict = None, error: str = None, store: SparkStore = None) -> dict:
+    """Write the JSON record and render the card for one spark (or add both to a store)."""
+    
+    full_data = write_spark_record(concept, category, selected_pains, output_dir, usage, error, store)
+    encoded, problems = try_render_spark_record(full_data)
+    if problems:
+        report_overflow(full_data, problems, store)
+    else:
+        trace_card(encoded)
+        say(f"🗜️  Encoded {encoded['format']}: {encoded['bytes'] / 1024:.0f} KB in {encoded['seconds'] * 1000:.0f} ms")
+    if store is not None:
+        with tracer.span("write_record", store=True):
+            full_data["id"] = store.add(full_data, full_data["card_path"])
+    return full_data
+
+
+def _resolve_output_dir(output_dir) -> Path:
     if output_dir is None:
         output_dir = Path.home() / "sparks"
     output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True)
+    return output_dir
+
+
+def run_spark(output_dir: str = None, stream: bool = False, store: SparkStore = None) -> dict:
+    """Run the One Spark ideation engine.
     
-    print("\n" + "="*70)
-    print("🔥  ONE SPARK PRO - AI-Powered Consumer Product Ideation Engine")
-    print("="*70)
+    With stream=True the concept is streamed, and each field is printed as
+    soon as Claude finishes writing it. With a store, the spark is indexed
+    there instead of written as loose files in output_dir.
+    """
     
-    # Step 1: Select random category
-    category = random.choice(CATEGORIES)
-    print(f"\n📦 Category Selected: {category.upper()}")
+    with tracer.span("spark", mode="single", stream=stream) as span:
+        full_data = _run_spark(output_dir, stream, store)
+        span.set(category=full_data["category"], outcome=full_data["outcome"])
+    tracer.count("spark_sparks_total", outcome=full_data["outcome"])
+    return full_data
+
+
+def _run_spark(output_dir: str, stream: bool, store: SparkStore) -> dict:
+    if store is None:
+        output_dir = _resolve_output_dir(output_dir)
     
-    # Step 2: Get pain points
-    if category in PAIN_POINT_DATABASE:
-        pain_points = PAIN_POINT_DATABASE[category]
-    else:
-        # Use a general search or fallback
-        pain_points = [
-            f"Products in {category} are overpriced for the quality",
-            f"Most {category} products break or fail too quickly",
-            f"Hard to find {category} that actually work as advertised",
-            f"Design and aesthetics are often neglected in {category}",
-        ]
-    
-    # Select random subset of pain points
-    selected_pains = random.sample(pain_points, min(4, len(pain_points)))
-    print(f"\n😤 Pain Points Identified:")
+    say("\n" + "="*70)
+    say("🔥  ONE SPARK PRO - AI-Powered Consumer Product Ideation Engine")
+    say("="*70)
+    
+    # Steps 1 & 2: Select a category and a subset of its pain points
+    category, selected_pains, saturated = plan_spark()
+    say(f"\n📦 Category Selected: {category.upper()}")
+    if saturated:
+        print("🧭 Every pain region tried is saturated; generating anyway")
+    
+    say(f"\n😤 Pain Points Identified:")
     for p in selected_pains:
-        print(f"   • {p[:60]}{'...' if len(p) > 60 else ''}")
+        say(f"   • {p[:60]}{'...' if len(p) > 60 else ''}")
     
     # Step 3: Generate product concept with Claude
-    print(f"\n🧠 Generating product concept with Claude...")
+    say(f"\n🧠 Generating product concept with Claude...")
     
+    usage = error = None
     try:
-        concept = generate_product_with_claude(category, selected_pains)
+        with tracer.span("claude", category=category, model=MODEL, stream=stream) as span:
+            if stream:
+                concept, usage = stream_concept_with_usage(
+                    category, selected_pains,
+                    on_field=lambda key, value: say(f"   ✓ {key}: {value}"))
+            else:
+                concept, usage = generate_concept_with_usage(category, selected_pains)
+            span.set(**usage)
     except Exception as e:
         print(f"\n⚠️  Claude API error: {e}")
         print("    Make sure ANTHROPIC_API_KEY is set")
         print("    Falling back to demo concept...")
-        concept = {
-            "name": "DemoProduct",
-            "tagline": "This is a demo - set your API key!",
-            "pain_solved": selected_pains[0] if selected_pains else "Demo pain point",
-            "description": "Set your ANTHROPIC_API_KEY environment variable to generate real product concepts with Claude AI.",
-            "features": ["AI-powered ideation", "Real pain points", "Beautiful visuals", "Daily inspiration"],
-            "price_point": "$0 - It's a demo",
-            "vibe": "Demo meets placeholder"
-        }
-    
-    print(f"\n💡 SPARK GENERATED!")
-    print("-" * 50)
-    print(f"   Name:    {concept['name']}")
-    print(f"   Tagline: {concept['tagline']}")
-    print(f"   Price:   {concept['price_point']}")
-    print("-" * 50)
-    
-    # Step 4: Create visual card
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_name = concept['name'].lower().replace(' ', '_').replace('-', '_')
-    filename = f"spark_{safe_name}_{timestamp}.png"
-    output_path = output_dir / filename
+        tracer.count("spark_api_errors_total")
+        tracer.count("spark_demo_fallbacks_total")
+        concept = demo_concept(selected_pains)
+        error = str(e)
+    else:
+        match = accept_concept(concept)
+        if match is not None:
+            print(f"\n🪞 Near-duplicate of {match[0]} ({match[1]:.0%} similar); saving it anyway")
     
-    create_product_card(concept, category, str(output_path))
-    print(f"\n🎨 Product card saved: {output_path}")
+    say(f"\n💡 SPARK GENERATED!")
+    say("-" * 50)
+    say(f"   Name:    {concept['name']}")
+    say(f"   Tagline: {concept['tagline']}")
+    say(f"   Price:   {concept['price_point']}")
+    say("-" * 50)
     
-    # Step 5: Save JSON data
-    json_path = output_dir / f"spark_{safe_name}_{timestamp}.json"
-    full_data = {
-        "generated_at": datetime.now().isoformat(),
-        "category": category,
-        "pain_points": selected_pains,
-        "concept": concept,
-        "card_path": str(output_path)
-    }
-    with open(json_path, 'w') as f:
-        json.dump(full_data, f, indent=2)
-    print(f"📋 Data saved: {json_path}")
+    # Steps 4 & 5: Create visual card and save JSON data
+    full_data = save_spark(concept, category, selected_pains, output_dir, usage, error, store)
+    if full_data["card_path"] is not None:
+        say(f"\n🎨 Product card saved: {full_data['card_path']}")
+        if store is None:
+            say(f"📋 Data saved: {Path(full_data['card_path']).with_suffix('.json')}")
+    if store is not None:
+        say(f"📋 Data saved: {store.db_path} (id {full_data['id']})")
     
-    print("\n✅ Spark complete!")
+    say("\n✅ Spark complete!")
     
     return full_data
 
 
+# ============================================================================
+# BATCH ENGINE
+# ============================================================================
+
+# Rendered sparks are indexed in a SparkStore in transactions of this many
+STORE_FLUSH_EVERY = 50
+
+def dry_run_batch(count: int) -> list:
+    """Plan `count` sparks the way a batch would, without calling Claude or rendering anything.
+    
+    Prints each spark's category and pain points, then how the batch
+    spreads over categories. Returns the (category, pain points, saturated)
+    plans.
+    """
+    
+    plans = [plan_spark() for _ in range(count)]
+    for i, (category, selected_pains, saturated) in enumerate(plans, 1):
+        say(f"{i:>5}. {category}{' (saturated)' if saturated else ''}")
+        for p in selected_pains:
+            say(f"         • {p[:60]}{'...' if len(p) > 60 else ''}")
+    spread = Counter(category for category, _, _ in plans)
+    saturated = sum(plan[2] for plan in plans)
+    print(f"\n🧭 Dry run: {count} sparks over {len(spread)} categories, "
+          f"most in {', '.join(f'{c} ({n})' for c, n in spread.most_common(3))}"
+          + (f"; {saturated} in saturated regions" if saturated else ""))
+    return plans
+
+
+async def run_spark_batch_async(count: int, concurrency: int = 8, output_dir: str = None,
+                                render_workers: int = None, queue_size: int = None,
+                                stream: bool = False, demo_fallback: bool = True,
+                                store: SparkStore = None) -> list:
+    """Run `count` sparks concurrently with at most `concurrency` API calls in flight.
+    
+    Concept generation and card rendering are separate stages: finished
+    concepts go into a bounded queue, and `render_workers` processes render
+    cards from it. The JSON record of each spark is written as soon as its
+    concept arrives, so an interrupted batch keeps what finished. A full
+    queue pauses generation until the renderers catch up. With stream=True,
+    answers are validated while they stream and off-schema ones are retried
+    early.
+    
+    Sparks whose API call failed are counted as "demo" outcomes and, unless
+    demo_fallback=False, still written with the placeholder demo concept
+    (marked "outcome": "demo" in their JSON record).
+    
+    With a store, rendered sparks are indexed there in bulk, one
+    transaction per STORE_FLUSH_EVERY sparks, instead of written as loose
+    files.
+    """
+    
+    import asyncio
+    
+    if store is None:
+        output_dir = _resolve_output_dir(output_dir)
+    render_workers = render_workers or os.cpu_count() or 1
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    queue = asyncio.Queue(maxsize=queue_size or 2 * render_workers)
+    loop = asyncio.get_running_loop()
+    ledger = TokenLedger()
+    outcomes = Counter()
+    results = []
+    encoded = []
+    unstored = []
+    
+    def flush_store():
+        if unstored:
+            with tracer.span("write_record", store=True, records=len(unstored)):
+                store.add_many([(record, record["card_path"]) for record in unstored])
+            unstored.clear()
+    
+    def finish(root, outcome: str):
+        root.set(outcome=outcome)
+        root.end()
+        tracer.count("spark_sparks_total", outcome=outcome)
+    
+    async def generate():
+        # The spark's root span ends in render(), or here if the spark is dropped
+        root = tracer.start("spark", mode="batch", stream=stream)
+        with tracer.use(root):
+            category, selected_pains, saturated = plan_spark()
+            root.set(category=category)
+            if saturated:
+                outcomes["saturated"] += 1
+                finish(root, "saturated")
+                return
+            usage = error = None
+            async with semaphore:
+                try:
+                    with tracer.span("claude", category=category, model=MODEL, stream=stream) as span:
+                        if stream:
+                            concept, usage = await stream_concept_with_usage_async(category, selected_pains)
+                        else:
+                            concept, usage = await generate_concept_with_usage_async(category, selected_pains)
+                        span.set(**usage)
+                    ledger.add(usage)
+                except Exception as e:
+                    print(f"⚠️  Claude API error ({category}): {e}")
+                    tracer.count("spark_api_errors_total")
+                    concept = demo_concept(selected_pains)
+                    error = str(e)
+        outcomes[spark_outcome(usage)] += 1
+        if usage is None and not demo_fallback:
+            finish(root, "failed")
+            return
+        if usage is None:
+            tracer.count("spark_demo_fallbacks_total")
+        else:
+            match = accept_concept(concept)
+            if match is not None:
+                outcomes["duplicate"] += 1
+                print(f"🪞 Rejected {concept['name']} ({category}): {match[1]:.0%} similar to {match[0]}")
+                finish(root, "duplicate")
+                return
+        await queue.put((concept, category, selected_pains, usage, error, root))
+    
+    async def render(executor):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            concept, category, selected_pains, usage, error, root = item
+            with tracer.use(root):
+                try:
+                    full_data = write_spark_record(concept, category, selected_pains, output_dir, usage, error,
+                                                   store)
+                    report, problems = await loop.run_in_executor(executor, try_render_spark_record, full_data)
+                except Exception as e:
+                    # Keep consuming: with every renderer gone, generate() would block forever on a full queue
+                    print(f"⚠️  Card failed for {concept['name']} ({category}): {type(e).__name__}: {e}")
+                    outcomes["render_failed"] += 1
+                    finish(root, "failed")
+                    continue
+                if problems:
+                    outcomes["overflow"] += 1
+                    report_overflow(full_data, problems, store)
+                else:
+                    trace_card(report)
+                    encoded.append(report)
+            finish(root, full_data["outcome"])
+            results.append(full_data)
+            say(f"💡 [{len(results)}/{count}] {concept['name']} ({category})"
+                  + ("" if problems else f" • {report['bytes'] / 1024:.0f} KB, {report['seconds'] * 1000:.0f} ms encode")
+                  + ("" if store is not None or problems else f" → {full_data['card_path']}"))
+            if store is not None:
+                unstored.append(full_data)
+                if len(unstored) >= STORE_FLUSH_EVERY:
+                    flush_store()
+    
+    with _render_pool(render_workers) as executor:
+        renderers = [asyncio.ensure_future(render(executor)) for _ in range(render_workers)]
+        try:
+            await asyncio.gather(*(generate() for _ in range(count)))
+        finally:
+            await client_manager.aclose()
+        for _ in renderers:
+            await queue.put(None)
+        await asyncio.gather(*renderers)
+    if store is not None:
+        flush_store()
+    
+    print(f"🧮 Tokens: {ledger.summary()}")
+    print(f"📊 Outcomes: {outcomes['generated']} generated, {outcomes['response_cache']} from response cache, "
+          f"{outcomes['demo']} demo fallbacks{'' if demo_fallback else ' (not written)'}")
+    print(f"🗜️  Encoding ({card_output()}): {encode_summary(encoded)}")
+    if outcomes["overflow"]:
+        print(f"📐 {outcomes['overflow']} cards overflowed and were not rendered")
+    if outcomes["render_failed"]:
+        print(f"⚠️  {outcomes['render_failed']} sparks failed while writing or rendering their card")
+    if concept_index is not None:
+        print(f"🪞 Dedup: {outcomes['duplicate']} near-duplicates rejected, "
+              f"{outcomes['saturated']} sparks skipped in saturated regions")
+    if client_manager.rate_limiter is not None:
+        print(f"🚦 Rate-limit waits: {client_manager.rate_limiter.waited:.1f}s (summed over concurrent sparks)")
+    return results
+
+
+def run_spark_batch(count: int, concurrency: int = 8, output_dir: str = None,
+                    render_workers: int = None, queue_size: int = None, stream: bool = False,
+                    demo_fallback: bool = True, store: SparkStore = None) -> list:
+    """Synchronous entry point for run_spark_batch_async."""
+    
+    import asyncio
+    
+    return asyncio.run(run_spark_batch_async(count, concurrency, output_dir, render_workers, queue_size,
+                                             stream, demo_fallback, store))
+
+
+# Incremental re-renders save the manifest after every this many cards
+MANIFEST_SAVE_EVERY = 1000
+
+def render_only(input_dir: str, render_workers: int = None, incremental: bool = False) -> list:
+    """Re-render cards from saved spark_*.json records without calling the API.
+    
+    Each card is written next to its JSON file, so moved or copied output
+    directories re-render in place. Every render is noted in the
+    directory's manifest. With incremental=True, cards whose concept,
+    theme, fonts, renderer version, size and output format all match the
+    manifest are skipped.
+    """
+    
+    manifest = RenderManifest(input_dir)
+    base_key = render_key()
+    json_paths, records, card_paths, keys = [], [], [], []
+    up_to_date = 0
+    for json_path in sorted(Path(input_dir).glob("spark_*.json")):
+        card_path = json_path.with_suffix(card_suffix())
+        record = None
+        # Unchanged record files aren't even parsed: their concept hash is in the manifest
+        concept_hash = manifest.cached_hash(json_path) if incremental else None
+        if concept_hash is None:
+            with open(json_path) as f:
+                record = json.load(f)
+            concept_hash = content_hash([record["concept"], record["category"], record.get("generated_at")])
+        key = dict(base_key, concept=concept_hash)
+        if incremental and manifest.is_current(json_path, card_path, key):
+            up_to_date += 1
+            continue
+        if record is None:
+            with open(json_path) as f:
+                record = json.load(f)
+        json_paths.append(json_path)
+        records.append(record)
+        card_paths.append(str(card_path))
+        keys.append(key)
+    
+    rendered = []
+    if records:
+        render_workers = render_workers or os.cpu_count() or 1
+        chunksize = max(1, len(records) // (render_workers * 4))
+        with _render_pool(render_workers) as executor:
+            results = executor.map(try_render_spark_record, records, card_paths, chunksize=chunksize)
+            for i, (report, problems) in enumerate(results):
+                if problems:
+                    print(f"📐 {records[i]['concept'].get('name', 'Product')} not rendered: {'; '.join(problems)}")
+                else:
+                    trace_card(report)
+                    rendered.append(report)
+                manifest.record(json_paths[i], report and report["path"], keys[i])
+                if (i + 1) % MANIFEST_SAVE_EVERY == 0:
+                    manifest.save()  # an interrupted rebuild keeps what it finished
+    manifest.save()
+    
+    print(f"🎨 Re-rendered {len(rendered)} cards in {input_dir}"
+          + (f" ({len(records) - len(rendered)} overflowed)" if len(rendered) < len(records) else "")
+          + (f", {up_to_date} up to date" if incremental else ""))
+    print(f"🗜️  Encoding ({card_output()}): {encode_summary(rendered)}")
+    return [report["path"] for report in rendered]
+
+
+# ============================================================================
+# MESSAGE BATCHES BACKEND
+# ============================================================================
+
+# Collected results are rendered, indexed and checkpointed this many at a time
+BATCH_COLLECT_CHUNK = 50
+
+
+def batch_source(job: dict, custom_id: str) -> str:
+    """The SparkStore source key of one batch request's spark."""
+    
+    return f"batch:{job['job_id']}/{custom_id}"
+
+
+def _written_batch_records(output_dir: Path, job_id: str) -> dict:
+    """custom_id -> record of the sparks a batch job already wrote to output_dir."""
+    
+    written = {}
+    for json_path in output_dir.glob("spark_*.json"):
+        try:
+            with open(json_path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        batch = record.get("batch") or {}
+        if batch.get("job_id") == job_id:
+            written[batch["custom_id"]] = record
+    return written
+
+
+def _card_written(record: dict) -> bool:
+    paths = [record["card_path"], *(record.get("thumbnails") or {}).values()]
+    return all(Path(path).exists() for path in paths)
+
+
+def run_spark_message_batch(count: int = None, output_dir: str = None, job_id: str = None,
+                            poll_interval: float = 30.0, render_workers: int = None,
+                            spark_store: SparkStore = None) -> list:
+    """Generate sparks through one Message Batches job instead of live calls.
+    
+    Pass `count` to plan and submit a new job, or `job_id` to reattach to
+    an interrupted one. Results go through the same JSON record and card
+    rendering path as run_spark. Requests that errored or expired are
+    reported and skipped. They don't get a demo concept.
+    
+    Results are handled in chunks: rendered, indexed in spark_store (one
+    transaction per chunk) and only then checkpointed as collected, so a
+    resumed job never skips a spark whose card wasn't finished. Records
+    carry a "batch" entry naming the job and request. A spark finished
+    after the last checkpoint is found by it on resume and not redone:
+    it's already in the store, or its written record only needs its card.
+    """
+    
+    output_dir = _resolve_output_dir(output_dir)
+    store = BatchJobStore(output_dir / ".spark_batches")
+    
+    if job_id is not None:
+        job = store.load(job_id)
+        print(f"🔁 Reattaching to batch job {job_id} ({job['batch_id'] or 'not yet submitted'})")
+    else:
+        plan = {}
+        for i in range(count):
+            category, selected_pains, saturated = plan_spark()
+            if saturated:
+                continue
+            plan[f"spark-{i:05d}"] = {
+                "category": category,
+                "pain_points": selected_pains,
+                "params": build_request(category, selected_pains),
+            }
+        job = store.create(plan)
+        print(f"📮 Planned batch job {job['job_id']} with {len(plan)} requests"
+              + (f" ({count - len(plan)} skipped in saturated regions)" if len(plan) < count else ""))
+    
+    batch_id = submit_job(client_manager, store, job)
+    print(f"⏳ Waiting for batch {batch_id} (resume with --resume-batch {job['job_id']})")
+    
+    def on_poll(batch):
+        counts = batch.request_counts
+        print(f"   {batch.processing_status}: {counts.succeeded} succeeded, "
+              f"{counts.errored} errored, {counts.processing} processing")
+    
+    wait_for_job(client_manager, job, poll_interval=poll_interval, on_poll=on_poll)
+    
+    ledger = TokenLedger()
+    records, reports = [], []
+    chunk, chunk_ids = [], []
+    failed = duplicates = 0
+    written = _written_batch_records(output_dir, job["job_id"]) if job_id is not None and spark_store is None else {}
+    render_workers = render_workers or os.cpu_count() or 1
+    
+    def flush(executor):
+        if chunk:
+            chunksize = max(1, len(chunk) // (render_workers * 4))
+            for record, (report, problems) in zip(chunk, executor.map(try_render_spark_record, chunk,
+                                                                      chunksize=chunksize)):
+                if problems:
+                    report_overflow(record, problems, spark_store)
+                else:
+                    trace_card(report)
+                    reports.append(report)
+            if spark_store is not None:
+                spark_store.add_many([(record, record["card_path"]) for record in chunk],
+                                     sources=[batch_source(job, record["batch"]["custom_id"]) for record in chunk])
+            records.extend(chunk)
+        # Checkpoint only finished sparks: a crash before this re-collects the whole chunk on resume
+        job["collected"].extend(chunk_ids)
+        store.save(job)
+        chunk.clear()
+        chunk_ids.clear()
+    
+    with _render_pool(render_workers) as executor:
+        for custom_id, message, error in iter_job_results(client_manager, job):
+            entry = job["plan"][custom_id]
+            resumed = written.get(custom_id)
+            if spark_store is not None and spark_store.has_source(batch_source(job, custom_id)):
+                say(f"🔁 {custom_id} was indexed before the interruption")
+            elif resumed is not None:
+                # Written before the interruption: render its card unless that finished too (or overflowed)
+                if resumed["card_path"] is not None and not _card_written(resumed):
+                    chunk.append(resumed)
+            else:
+                try:
+                    if message is None:
+                        raise ValueError(error)
+                    concept, usage = _parse_and_cache(entry["params"], message)
+                except ValueError as e:
+                    failed += 1
+                    tracer.count("spark_api_errors_total")
+                    print(f"⚠️  {custom_id} ({entry['category']}) failed: {e}")
+                else:
+                    ledger.add(usage)
+                    match = accept_concept(concept)
+                    if match is not None:
+                        duplicates += 1
+                        print(f"🪞 {custom_id} rejected: {concept['name']} is {match[1]:.0%} similar to {match[0]}")
+                    else:
+                        chunk.append(write_spark_record(concept, entry["category"], entry["pain_points"],
+                                                        output_dir, usage, store=spark_store,
+                                                        extra={"batch": {"job_id": job["job_id"],
+                                                                         "custom_id": custom_id}}))
+            chunk_ids.append(custom_id)
+            if len(chunk_ids) == BATCH_COLLECT_CHUNK:
+                flush(executor)
+        flush(executor)
+    if records:
+        print(f"🗜️  Encoding ({card_output()}): {encode_summary(reports)}")
+    
+    job["status"] = "collected"
+    store.save(job)
+    print(f"🧮 Tokens: {ledger.summary()}")
+    print(f"\n✅ Batch job {job['job_id']} complete: {len(records)} sparks, {failed} failed"
+          + (f", {duplicates} near-duplicates rejected" if duplicates else ""))
+    return records
+
+
+# ============================================================================
+# DISTRIBUTED QUEUE
+# ============================================================================
+
+# Merged sparks are marked in the queue (and indexed in a store) this many at a time
+MERGE_CHUNK = 100
+
+
+def queue_source(job_id: str, item_id: int) -> str:
+    """The SparkStore source key of one queue item's spark."""
+    
+    return f"queue:{job_id}/{item_id}"
+
+
+def default_worker_id() -> str:
+    import socket
+    
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def plan_queue_job(queue: "WorkQueue", count: int, max_attempts: int) -> str:
+    """Plan `count` sparks up front and queue them as one job. Returns the job id.
+    
+    The job also carries this run's card settings, so every worker renders
+    the same format whatever its own flags say.
+    """
+    
+    items = []
+    for _ in range(count):
+        category, selected_pains, saturated = plan_spark()
+        if not saturated:
+            items.append({"category": category, "pain_points": selected_pains})
+    settings = {"image_format": card_encoder.format, "image_preset": card_encoder.preset,
+                "target_bytes": card_encoder.target_bytes, "thumbnails": list(card_encoder.thumbnails),
+                "backend": card_backend}
+    job_id = queue.create_job(items, max_attempts, settings)
+    print(f"📮 Queued job {job_id} with {len(items)} sparks in {queue.directory}"
+          + (f" ({count - len(items)} skipped in saturated regions)" if len(items) < count else ""))
+    print(f"   Start workers with: python one_spark_pro.py --queue {queue.directory} --work")
+    return job_id
+
+
+def _work_queue_item(queue: "WorkQueue", job_id: str, item: dict, output_dir: Path, worker_id: str,
+                     lease_seconds: float) -> str:
+    """Generate and render one claimed item. Returns its outcome: done, failed or lost (lease)."""
+    
+    category, selected_pains = item["category"], item["pain_points"]
+    try:
+        with tracer.span("claude", category=category, model=MODEL, stream=False) as span:
+            concept, usage = generate_concept_with_usage(category, selected_pains)
+            span.set(**usage)
+    except Exception as e:
+        print(f"⚠️  Item {item['item_id']} ({category}), attempt {item['attempt']}: Claude API error: {e}")
+        tracer.count("spark_api_errors_total")
+        queue.release(job_id, item, str(e))
+        return "failed"
+    # Don't spend a render on an item another worker has taken over
+    if not queue.extend(job_id, item, lease_seconds):
+        return "lost"
+    full_data = write_spark_record(concept, category, selected_pains, output_dir, usage)
+    json_path = Path(full_data["card_path"]).with_suffix(".json")
+    report, problems = try_render_spark_record(full_data)
+    if problems:
+        report_overflow(full_data, problems)
+    else:
+        trace_card(report)
+    result = {"record": json_path.relative_to(queue.directory).as_posix(), "worker": worker_id,
+              "attempt": item["attempt"]}
+    return "done" if queue.complete(job_id, item, result) else "lost"
+
+
+def run_queue_worker(queue_dir: str, job_id: str = None, worker_id: str = None, lease_seconds: float = 300.0,
+                     poll_interval: float = 30.0) -> Counter:
+    """Claim and work through a queued job's items until none are left to do.
+    
+    Once nothing is claimable, the worker keeps polling while other workers
+    hold leases, so it picks up their items if they crash. Returns outcome
+    counts (done, failed, lost).
+    """
+    
+    global card_encoder, card_backend
+    from spark_queue import WorkQueue
+    
+    queue = WorkQueue(queue_dir)
+    job_id = job_id or queue.open_job()
+    if job_id is None:
+        print(f"📭 No unfinished job in {queue.directory}")
+        return Counter()
+    settings = queue.settings(job_id)
+    card_encoder = CardEncoder(settings["image_format"], settings["image_preset"], settings["target_bytes"],
+                               settings["thumbnails"])
+    card_backend = settings["backend"]
+    worker_id = worker_id or default_worker_id()
+    output_dir = queue.results_dir(job_id, worker_id)
+    print(f"👷 Worker {worker_id} on job {job_id} ({card_output()})")
+    
+    outcomes = Counter()
+    while True:
+        item = queue.claim(job_id, worker_id, lease_seconds)
+        if item is None:
+            queue.reap(job_id)
+            counts = queue.progress(job_id)
+            if counts["pending"] + counts["leased"] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+        with tracer.span("spark", mode="queue", job=job_id, item=item["item_id"], attempt=item["attempt"],
+                         category=item["category"]) as span:
+            outcome = _work_queue_item(queue, job_id, item, output_dir, worker_id, lease_seconds)
+            span.set(outcome=outcome)
+        tracer.count("spark_sparks_total", outcome=outcome)
+        outcomes[outcome] += 1
+        if outcome == "lost":
+            print(f"⌛ Item {item['item_id']} ({item['category']}): lease lost to another worker, result dropped")
+        else:
+            say(f"💡 Item {item['item_id']} ({item['category']}): {outcome}"
+                + (f" on attempt {item['attempt']}" if item["attempt"] > 1 else ""))
+    print(f"👷 Worker {worker_id} finished job {job_id}: {outcomes['done']} done, "
+          f"{outcomes['failed']} failed attempts, {outcomes['lost']} lost leases")
+    return outcomes
+
+
+def _merged_stem(output_dir: Path, stem: str, job_id: str, item_id: int) -> str:
+    """The worker's file stem, or a per-item one if another spark already has it.
+    
+    A merged record that came from the same queue item is overwritten, so
+    re-running an interrupted merge doesn't duplicate sparks.
+    """
+    
+    for candidate in (stem, f"{stem}_{item_id}"):
+        try:
+            with open(output_dir / f"{candidate}.json") as f:
+                existing = json.load(f).get("queue", {})
+        except FileNotFoundError:
+            return candidate
+        except (OSError, ValueError):
+            continue
+        if existing.get("job_id") == job_id and existing.get("item_id") == item_id:
+            return candidate
+    return f"{stem}_{job_id}_{item_id}"
+
+
+def merge_queue_results(queue: "WorkQueue", job_id: str, output_dir: str = None, store: SparkStore = None) -> list:
+    """Collect finished items from every worker's results into one output directory (or store).
+    
+    Only each item's completed attempt is merged; files left by crashed
+    attempts are ignored. Records gain a "queue" entry naming the job, item,
+    worker and attempt. Merged items are marked, so merging again only picks
+    up what's new. A merge interrupted before marking its last chunk redoes
+    it without duplicates: store rows are keyed by item, files are overwritten.
+    """
+    
+    if store is None:
+        output_dir = _resolve_output_dir(output_dir)
+    merged = []
+    pending = queue.unmerged(job_id)
+    for start in range(0, len(pending), MERGE_CHUNK):
+        chunk = pending[start:start + MERGE_CHUNK]
+        store_items = []
+        for item_id, result in chunk:
+            json_path = queue.directory / result["record"]
+            with open(json_path) as f:
+                record = json.load(f)
+            record["queue"] = {"job_id": job_id, "item_id": item_id, "worker": result["worker"],
+                               "attempt": result["attempt"]}
+            # The worker's absolute paths may be another node's mount point; its files sit next to the record
+            card_file = json_path.parent / Path(record["card_path"]).name if record["card_path"] else None
+            thumbnails = {width: json_path.parent / Path(thumb).name
+                          for width, thumb in (record.get("thumbnails") or {}).items()}
+            if store is not None:
+                record["card_path"] = card_file and str(card_file)
+                if thumbnails:
+                    record["thumbnails"] = {width: str(thumb) for width, thumb in thumbnails.items()}
+                store_items.append((record, card_file))
+            else:
+                stem = _merged_stem(output_dir, json_path.stem, job_id, item_id)
+                if card_file is not None:
+                    record["card_path"] = str(output_dir / f"{stem}{card_file.suffix}")
+                    shutil.copyfile(card_file, record["card_path"])
+                if thumbnails:
+                    record["thumbnails"] = {}
+                    for width, thumb in thumbnails.items():
+                        target = output_dir / f"{stem}_{width}w{thumb.suffix}"
+                        shutil.copyfile(thumb, target)
+                        record["thumbnails"][width] = str(target)
+                with open(output_dir / f"{stem}.json", "w") as f:
+                    json.dump(record, f, indent=2)
+            merged.append(record)
+        if store_items:
+            ids = store.add_many(store_items, move=False,
+                                 sources=[queue_source(job_id, record["queue"]["item_id"]) for record, _ in store_items])
+            for (record, _), spark_id in zip(store_items, ids):
+                record["id"] = spark_id
+        queue.mark_merged(job_id, [item_id for item_id, _ in chunk])
+    return merged
+
+
+def run_queue_job(queue_dir: str, count: int = None, job_id: str = None, output_dir: str = None,
+                  store: SparkStore = None, max_attempts: int = 3, poll_interval: float = 30.0) -> list:
+    """Coordinate a distributed run: plan a job (or reattach to job_id), wait for workers, merge.
+    
+    Interrupting the coordinator doesn't stop the workers. Run it again
+    with the job id to wait for the rest and merge it.
+    """
+    
+    from spark_queue import WorkQueue
+    
+    queue = WorkQueue(queue_dir)
+    if job_id is None:
+        job_id = plan_queue_job(queue, count, max_attempts)
+    else:
+        print(f"🔁 Reattaching to queue job {job_id}")
+    
+    shown = None
+    while True:
+        queue.reap(job_id)
+        counts = queue.progress(job_id)
+        line = (f"   {counts['done']} done, {counts['leased']} leased ({counts['expired']} expired), "
+                f"{counts['pending']} pending, {counts['failed']} failed")
+        if line != shown:
+            say(line)
+            shown = line
+        if counts["pending"] + counts["leased"] == 0:
+            break
+        time.sleep(poll_interval)
+    
+    records = merge_queue_results(queue, job_id, output_dir, store)
+    failures = queue.failures(job_id)
+    for item_id, category, attempts, error in failures:
+        print(f"⚠️  Item {item_id} ({category}) failed after {attempts} attempts: {error}")
+    print(f"\n✅ Queue job {job_id} complete: {len(records)} sparks merged into "
+          f"{store.db_path if store is not None else _resolve_output_dir(output_dir)}, "
+          f"{counts['retried']} items retried, {len(failures)} failed")
+    return records
+
+
+# ============================================================================
+# SPARK SERVICE
+# ============================================================================
+
+def serve_sparks(port: int, host: str = "127.0.0.1", categories: list = None, pool_size: int = 3,
+                 ttl: float = None, workers: int = 4, output_dir: str = None, store: SparkStore = None):
+    """Serve sparks over HTTP from a pool of pre-generated ones until interrupted.
+    
+    Pooled sparks are complete: JSON record written and card rendered, in
+    output_dir or the store. A failed Claude call is never papered over with
+    the demo concept; the pool retries, and an on-the-spot request gets a 503.
+    """
+    
+    import signal
+    from spark_service import SparkPool, start_spark_server
+    
+    # Service managers stop daemons with SIGTERM; shut down as cleanly as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if store is None:
+        output_dir = _resolve_output_dir(output_dir)
+    # The sampler and concept index aren't thread-safe; Claude calls and rendering run unlocked
+    plan_lock = threading.Lock()
+    
+    def generate(category: str) -> dict:
+        with tracer.span("spark", mode="serve", category=category) as span:
+            with plan_lock:
+                selected_pains = select_pain_points(category)
+            try:
+                with tracer.span("claude", category=category, model=MODEL, stream=False) as claude_span:
+                    concept, usage = generate_concept_with_usage(category, selected_pains)
+                    claude_span.set(**usage)
+            except Exception:
+                tracer.count("spark_api_errors_total")
+                raise
+            with plan_lock:
+                match = accept_concept(concept)
+            if match is not None:
+                print(f"🪞 {concept['name']} ({category}) is {match[1]:.0%} similar to {match[0]}; pooling it anyway")
+            full_data = save_spark(concept, category, selected_pains, output_dir, usage, store=store)
+            span.set(outcome=full_data["outcome"])
+        tracer.count("spark_sparks_total", outcome=full_data["outcome"])
+        return full_data
+    
+    pool = SparkPool(categories or CATEGORIES, generate, size=pool_size, ttl=ttl, workers=workers)
+    server = start_spark_server(pool, host, port, card_dir=output_dir if store is None else None)
+    print(f"🔥 Serving sparks on {server.base_url}/spark: {pool_size} pooled per category x "
+          f"{len(pool.categories)} categories, {workers} refill threads"
+          + (f", fresh for {ttl:.0f}s" if ttl else ""))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        pool.stop()
+        status = pool.status()["stats"]
+        print(f"\n🛑 Served {status.get('hits', 0)} from the pool, {status.get('misses', 0)} generated on request")
+
+
 # ============================================================================
 # ENTRY POINT
 # ============================================================================
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ONE SPARK PRO - AI-Powered Consumer Product Ideation Engine")
+    parser.add_argument("--output-dir", default="/home/claude", help="Where cards and JSON records are written")
+    parser.add_argument("--count", type=int, default=None, help="Generate N sparks in one concurrent batch")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max in-flight Claude requests in batch mode")
+    parser.add_argument("--render-workers", type=int, default=None, help="Card renderer processes (default: all cores)")
+    parser.add_argument("--font-path", default=None, help=f"Font directories to search, separated by '{os.pathsep}'")
+    parser.add_argument("--show-fonts", action="store_true", help="Print which card fonts resolved, then exit")
+    parser.add_argument("--message-batch", action="store_true",
+                        help="With --count: submit one Message Batches job instead of live requests")
+    parser.add_argument("--resume-batch", metavar="JOB_ID", default=None,
+                        help="Reattach to an interrupted Message Batches job in --output-dir")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch or queue status polls")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream answers, validating fields as they arrive and retrying off-schema output early")
+    parser.add_argument("--base-url", default=None, help="Claude API base URL (e.g. a local spark_mock_api.py)")
+    parser.add_argument("--api-timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--max-retries", type=int, default=4, help="Retries on 429/5xx with jittered backoff")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="Send a duplicate request once the first passes this latency percentile (e.g. 95)")
+    parser.add_argument("--rpm", type=float, default=None, help="Host-wide requests per minute (shared by all workers)")
+    parser.add_argument("--input-tpm", type=float, default=None, help="Host-wide input tokens per minute")
+    parser.add_argument("--output-tpm", type=float, default=None, help="Host-wide output tokens per minute")
+    parser.add_argument("--limiter-path", default=str(DEFAULT_LIMITER_PATH),
+                        help="SQLite file holding the shared rate-limit buckets")
+    parser.add_argument("--no-demo", action="store_true",
+                        help="In batch mode, don't write demo placeholder sparks for failed API calls")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Claude response cache directory")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL, help="Seconds before a cached response expires")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2, help="Cache size budget (LRU eviction)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Answer repeated identical prompts from the response cache (for retries and resumed "
+                             "runs; a repeated category + pain subset then replays its old concept)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the response and page caches (overrides --cache)")
+    parser.add_argument("--store", metavar="DIR", default=None,
+                        help="Index sparks in a SQLite spark store in DIR instead of loose files in --output-dir")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Reject near-duplicates of sparks already in --output-dir/--store")
+    parser.add_argument("--dedup-threshold", type=float, default=0.6,
+                        help="Estimated similarity (0-1) of name/tagline/description that counts as a duplicate")
+    parser.add_argument("--region-limit", type=int, default=None,
+                        help="With --dedup: skip a category + pain-point subset after N sparks, steering to new ones")
+    parser.add_argument("--pain-corpus", metavar="PATH", default=None,
+                        help="Sample pain points from a spark_corpus.py SQLite corpus")
+    parser.add_argument("--harvest", metavar="SEARCH_URL", default=None,
+                        help="Crawl SEARCH_TEMPLATES into the pain corpus via a search URL containing {query}, then exit")
+    parser.add_argument("--harvest-per-host", type=int, default=4, help="Max concurrent requests per host when harvesting")
+    parser.add_argument("--harvest-links", type=int, default=5, help="Result links followed per search query")
+    parser.add_argument("--page-cache-dir", default=None,
+                        help="Harvested pages with ETag/Last-Modified, for conditional re-crawls "
+                             "(default: ~/.cache/one_spark/pages)")
+    parser.add_argument("--sampling", choices=SAMPLER_MODES, default="random",
+                        help="random: intensity-weighted draws; coverage: spread sparks evenly over categories and pain points")
+    parser.add_argument("--seed", type=int, default=None, help="Seed category and pain-point draws for a reproducible run")
+    parser.add_argument("--image-format", choices=IMAGE_FORMATS, default="png", help="Card image format")
+    parser.add_argument("--image-preset", choices=PRESET_NAMES, default="balanced",
+                        help="Encoder speed/size trade-off (measure with spark_encode.py --compare)")
+    parser.add_argument("--target-kb", type=float, default=None,
+                        help="Byte budget per card: lowers quality (or PNG palette size) until it fits")
+    parser.add_argument("--thumbnails", type=int, nargs="*", default=[], metavar="WIDTH",
+                        help="Also write card thumbnails this many pixels wide, in the same pass")
+    parser.add_argument("--vector", choices=VECTOR_FORMATS, default=None,
+                        help="Write SVG or self-contained HTML cards instead of images (rasterize later with --render-only)")
+    parser.add_argument("--render-only", metavar="DIR", default=None, help="Re-render cards from spark_*.json in DIR, no API calls")
+    parser.add_argument("--incremental", action="store_true",
+                        help="With --render-only, skip cards whose inputs haven't changed since the last render")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="Append a JSON-lines span per pipeline stage (category, Claude call, render...) to FILE")
+    parser.add_argument("--metrics", metavar="FILE", default=None,
+                        help="Write stage latency histograms and error counters to FILE (Prometheus text format) on exit")
+    parser.add_argument("--serve", metavar="PORT", type=int, default=None,
+                        help="Run as a daemon serving sparks over HTTP from a prefetched per-category pool")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface --serve listens on")
+    parser.add_argument("--category", action="append", choices=CATEGORIES, default=None, metavar="CATEGORY",
+                        help="With --serve, only pool and serve this category (repeatable; default: all)")
+    parser.add_argument("--pool-size", type=int, default=3, help="With --serve, sparks kept ready per category")
+    parser.add_argument("--pool-ttl", type=float, default=None,
+                        help="With --serve, seconds before a pooled spark is stale and replaced (default: never)")
+    parser.add_argument("--pool-workers", type=int, default=4, help="With --serve, background refill threads")
+    parser.add_argument("--queue", metavar="DIR", default=None,
+                        help="Distributed run through a shared queue directory. With --count: plan a job, wait for "
+                             "workers and merge their sparks into --output-dir (or --store)")
+    parser.add_argument("--work", action="store_true",
+                        help="With --queue, run as a worker: claim and generate items until the job is finished")
+    parser.add_argument("--job", default=None,
+                        help="With --queue, the job to work on or reattach to and merge (default: newest unfinished)")
+    parser.add_argument("--lease", type=float, default=300.0,
+                        help="With --queue --work, seconds a claimed item stays leased before others may retry it")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="With --queue, claims per item before it counts as failed")
+    parser.add_argument("--worker-id", default=None, help="With --queue --work, this worker's name (default: host-pid)")
+    parser.add_argument("--list-categories", action="store_true",
+                        help="Print the categories and their pain point counts, then exit")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Plan --count sparks (categories and pain points) without calling Claude or rendering")
+    parser.add_argument("--quiet", action="store_true", help="Only print warnings and summaries, not per-spark progress")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    quiet = args.quiet
+    
+    if args.trace or args.metrics:
+        configure_tracing(args.trace, args.metrics)
+        atexit.register(tracer.close)
+    
+    if args.font_path:
+        spark_fonts.configure(args.font_path.split(os.pathsep) + spark_fonts.DEFAULT_FONT_DIRS)
+    
+    if args.show_fonts:
+        warm_fonts(CARD_FONTS.values())
+        print("🔤 Card fonts:")
+        print(spark_fonts.font_report())
+        sys.exit(0)
+    
+    if args.list_categories:
+        list_categories(PainCorpus(args.pain_corpus) if args.pain_corpus else None)
+        sys.exit(0)
+    
+    card_encoder = CardEncoder(args.image_format, args.image_preset,
+                               int(args.target_kb * 1024) if args.target_kb else None, args.thumbnails)
+    card_backend = args.vector or "pillow"
+    
+    if args.render_only:
+        render_only(args.render_only, args.render_workers, incremental=args.incremental)
+        sys.exit(0)
+    
+    if args.harvest:
+        from spark_harvest import PageCache, DEFAULT_PAGE_CACHE_DIR
+        
+        harvest_pain_points(args.harvest, PainCorpus(args.pain_corpus or DEFAULT_CORPUS_PATH),
+                            concurrency=args.concurrency, per_host=args.harvest_per_host,
+                            max_links=args.harvest_links,
+                            page_cache=None if args.no_cache else PageCache(args.page_cache_dir or DEFAULT_PAGE_CACHE_DIR))
+        sys.exit(0)
+    
+    rate_limiter = None
+    if args.rpm or args.input_tpm or args.output_tpm:
+        rate_limiter = RateLimiter(args.limiter_path, rpm=args.rpm,
+                                   input_tpm=args.input_tpm, output_tpm=args.output_tpm)
+    client_manager = ClientManager(base_url=args.base_url, timeout=args.api_timeout,
+                                   max_retries=args.max_retries, hedge_percentile=args.hedge_percentile,
+                                   rate_limiter=rate_limiter)
+    
+    if args.cache and not args.no_cache:
+        response_cache = ResponseCache(args.cache_dir, args.cache_ttl, int(args.cache_max_mb * 1024 ** 2))
+    
+    spark_store = SparkStore(args.store) if args.store else None
+    
+    if args.pain_corpus:
+        pain_corpus = PainCorpus(args.pain_corpus)
+    sampler = SparkSampler(CATEGORIES, mode=args.sampling, seed=args.seed)
+    
+    if args.dedup:
+        from spark_dedup import ConceptIndex
+        
+        concept_index = ConceptIndex(threshold=args.dedup_threshold, region_limit=args.region_limit)
+        seeded = concept_index.add_records(saved_spark_records(args.output_dir, spark_store))
+        print(f"🪞 Dedup index seeded with {seeded} saved sparks")
+    
+    if args.dry_run:
+        dry_run_batch(args.count or 1)
+        sys.exit(0)
+    
     # Check for API key
     if not os.environ.get("ANTHROPIC_API_KEY"):
         print("\n⚠️  ANTHROPIC_API_KEY not set!")
@@ -505,8 +2022,37 @@ if __name__ == "__main__":
         print("   Or run with: ANTHROPIC_API_KEY=your_key python one_spark_pro.py")
         print("\n   Running in demo mode...\n")
     
+    if args.queue:
+        if args.work:
+            run_queue_worker(args.queue, args.job, args.worker_id, args.lease, args.poll_interval)
+        elif args.count or args.job:
+            run_queue_job(args.queue, args.count, args.job, args.output_dir, spark_store,
+                          args.max_attempts, args.poll_interval)
+        else:
+            print("⚠️  --queue needs --count (plan and coordinate a job), --job (reattach) or --work")
+            sys.exit(2)
+        sys.exit(0)
+    
+    if args.serve is not None:
+        serve_sparks(args.serve, args.host, args.category, args.pool_size, args.pool_ttl,
+                     args.pool_workers, args.output_dir, spark_store)
+        sys.exit(0)
+    
+    if args.resume_batch or (args.count and args.message_batch):
+        run_spark_message_batch(args.count, args.output_dir, job_id=args.resume_batch,
+                                poll_interval=args.poll_interval, render_workers=args.render_workers,
+                                spark_store=spark_store)
+        sys.exit(0)
+    
+    if args.count:
+        results = run_spark_batch(args.count, args.concurrency, output_dir=args.output_dir,
+                                  render_workers=args.render_workers, stream=args.stream,
+                                  demo_fallback=not args.no_demo, store=spark_store)
+        print(f"\n✅ Batch complete: {len(results)} sparks in {args.store or args.output_dir}")
+        sys.exit(0)
+    
     # Run the engine
-    result = run_spark(output_dir="/home/claude")
+    result = run_spark(output_dir=args.output_dir, stream=args.stream, store=spark_store)
     
     # Print full concept
     print(f"\n📋 Full Concept:")
@@ -0,0 +1,128 @@
+"""
+ONE SPARK - Message Batches Backend
+===================================
+Submit a whole run's prompts as one Message Batches job instead of one
+messages.create call per spark. It costs less and does not tie up a
+process for the whole run.
+
+Each job is written to disk before submission as
+<jobs dir>/<job_id>.json, holding the batch id, the plan for every
+request and which results have been collected. An interrupted run can
+then reattach with its job_id and pick up where it stopped.
+
+Usage:
+    store = BatchJobStore(output_dir / ".spark_batches")
+    job = store.create(plan)                  # plan: {custom_id: {..., "params": {...}}}
+    submit_job(manager, store, job)
+    wait_for_job(manager, job)
+    for custom_id, message, error in iter_job_results(manager, job): ...
+"""
+
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+
+class BatchJobStore:
+    """On-disk records of submitted batch jobs, one JSON file per job."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def create(self, plan: dict) -> dict:
+        job_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = 2
+        while self.path(job_id).exists():
+            job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix}"
+            suffix += 1
+        job = {
+            "job_id": job_id,
+            "batch_id": None,
+            "created_at": datetime.now().isoformat(),
+            "status": "planned",
+            "plan": plan,
+            "collected": [],
+        }
+        self.save(job)
+        return job
+
+    def load(self, job_id: str) -> dict:
+        with open(self.path(job_id)) as f:
+            return json.load(f)
+
+    def save(self, job: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, self.path(job["job_id"]))
+
+    def unfinished(self) -> list:
+        """Job ids that were planned or submitted but never fully collected."""
+
+        job_ids = []
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                with open(path) as f:
+                    if json.load(f).get("status") != "collected":
+                        job_ids.append(path.stem)
+            except (OSError, ValueError):
+                continue
+        return job_ids
+
+
+def submit_job(manager, store: BatchJobStore, job: dict) -> str:
+    """Submit a planned job (no-op if it already has a batch id)."""
+
+    if job["batch_id"] is None:
+        requests = [
+            {"custom_id": custom_id, "params": entry["params"]}
+            for custom_id, entry in job["plan"].items()
+        ]
+        batch = manager.call(manager.client.messages.batches.create, requests=requests)
+        job["batch_id"] = batch.id
+        job["status"] = "submitted"
+        store.save(job)
+    return job["batch_id"]
+
+
+def wait_for_job(manager, job: dict, poll_interval: float = 30.0, timeout: float = None,
+                 on_poll=None):
+    """Poll until the batch has ended. Returns the final batch object."""
+
+    started = time.monotonic()
+    while True:
+        batch = manager.call(manager.client.messages.batches.retrieve, job["batch_id"])
+        if on_poll is not None:
+            on_poll(batch)
+        if batch.processing_status == "ended":
+            return batch
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise TimeoutError(f"Batch {job['batch_id']} still {batch.processing_status} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def iter_job_results(manager, job: dict):
+    """Yield (custom_id, message, error) for results not yet collected.
+
+    message is None when the request errored, was canceled or expired;
+    error then describes why.
+    """
+
+    collected = set(job["collected"])
+    results = manager.call(manager.client.messages.batches.results, job["batch_id"])
+    for entry in results:
+        if entry.custom_id in collected:
+            continue
+        result = entry.result
+        if result.type == "succeeded":
+            yield entry.custom_id, result.message, None
+        else:
+            error = getattr(result, "error", None)
+            yield entry.custom_id, None, f"{result.type}: {error}" if error else result.type
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Benchmarks
+======================
+Offline benchmarks for the spark pipeline, so a change to the card
+renderers, concept selection or the batch engine can be measured before
+it is merged. No API key or network access is needed: the end-to-end
+benchmark talks to spark_mock_api on localhost.
+
+Suites:
+- render: per-card time (layout alone and the full card with encode and
+  write) and peak memory, for the basic 1080x1350 card and the Pro
+  1080x1920 card. Each size runs in a fresh process, so its peak RSS is
+  the renderer's own.
+- select: concept selection (basic) and spark planning (Pro) per second.
+- json: parsing Claude's fenced JSON answers, writing spark records and
+  reading them back, per second.
+- e2e: sparks per second through run_spark_batch against the mock API
+  with --latency seconds per call.
+
+The select and json suites are short timed passes, so each is repeated
+--repeats times and reports the median pass. Each metric's min-max range
+over the passes is saved under "spread". compare doesn't flag a metric
+whose new value is still inside the baseline's range, since the baseline
+itself varied that much.
+
+Results are one flat JSON object of metrics. Names ending in _per_s are
+better when higher; every other metric (ms, mb, s) is better when lower.
+compare flags every metric that got worse by more than --threshold.
+
+Usage:
+    python spark_bench.py run --out before.json
+    ... change something ...
+    python spark_bench.py run --out after.json
+    python spark_bench.py compare before.json after.json --threshold 0.1   # exit status 1 on regressions
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+SUITES = ("render", "select", "json", "e2e")
+
+# Timed passes per metric in the select and json suites; the median is reported
+DEFAULT_REPEATS = 5
+
+
+def _percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _fake_concepts(n: int, seed: int = 1) -> list:
+    from spark_mock_api import fake_concept
+    from one_spark_pro_1764697514875 import CATEGORIES
+
+    rng = random.Random(seed)
+    return [(category, fake_concept(category, str(i))) for i, category in
+            ((i, rng.choice(CATEGORIES)) for i in range(n))]
+
+
+def _render_cards(size: str, cards: int) -> dict:
+    """Render `cards` cards of one size in this (fresh) process. Runs in a worker."""
+
+    scratch = tempfile.mkdtemp(prefix="spark_bench_")
+    if size == "1080x1350":
+        import one_spark_1764697514875 as basic
+        from spark_sampler import SparkSampler
+
+        basic.sampler = SparkSampler(basic.CATEGORIES, seed=1)
+        jobs = []
+        for _ in range(cards):
+            category = basic.select_category()
+            concept, pain = basic.generate_product_concept(category, basic.get_pain_points(category))
+            jobs.append((concept, category, pain))
+
+        def layout(job):
+            basic.layout_product_card(*job)
+
+        def render(job, path):
+            basic.create_product_card(*job, path)
+    else:
+        import one_spark_pro_1764697514875 as pro
+
+        jobs = _fake_concepts(cards)
+
+        def layout(job):
+            pro.layout_product_card(job[1], job[0])
+
+        def render(job, path):
+            pro.create_product_card(job[1], job[0], path)
+
+    # Warm fonts, templates and caches once, then measure steady state
+    render(jobs[0], f"{scratch}/warm.png")
+    layout_ms, card_ms = [], []
+    for i, job in enumerate(jobs):
+        start = time.perf_counter()
+        layout(job)
+        layout_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        render(job, f"{scratch}/card_{i}.png")
+        card_ms.append((time.perf_counter() - start) * 1000)
+    peak_rss = _peak_rss_mb()
+
+    tracemalloc.start()
+    render(jobs[0], f"{scratch}/traced.png")
+    py_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    for path in Path(scratch).iterdir():
+        path.unlink()
+    os.rmdir(scratch)
+    metrics = {
+        "layout_ms_median": statistics.median(layout_ms),
+        "card_ms_median": statistics.median(card_ms),
+        "card_ms_p95": _percentile(card_ms, 0.95),
+        "py_peak_mb": py_peak / 1024 ** 2,
+    }
+    if peak_rss is not None:
+        metrics["peak_rss_mb"] = peak_rss
+    return metrics
+
+
+def bench_render(cards: int = 30) -> dict:
+    results = {}
+    spawn = multiprocessing.get_context("spawn")
+    for size in ("1080x1350", "1080x1920"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+            metrics = executor.submit(_render_cards, size, cards).result()
+        results.update({f"render.{size}.{name}": value for name, value in metrics.items()})
+    return results
+
+
+def _rate(fn, seconds: float) -> float:
+    """Calls per second of fn(), run repeatedly for about `seconds`."""
+
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        fn()
+        calls += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+def _median_of(measure, repeats: int, spread: dict) -> dict:
+    """Median of each metric over `repeats` calls of measure(); its min-max range goes into spread."""
+
+    passes = [measure() for _ in range(repeats)]
+    metrics = {}
+    for name in passes[0]:
+        values = [metrics_pass[name] for metrics_pass in passes]
+        metrics[name] = statistics.median(values)
+        spread[name] = [min(values), max(values)]
+    return metrics
+
+
+def bench_select(seconds: float = 0.5, repeats: int = DEFAULT_REPEATS, spread: dict = None) -> dict:
+    import one_spark_1764697514875 as basic
+    import one_spark_pro_1764697514875 as pro
+    from spark_sampler import SparkSampler
+
+    basic.sampler = SparkSampler(basic.CATEGORIES, seed=1)
+    pro.sampler = SparkSampler(pro.CATEGORIES, seed=1)
+
+    def select_basic():
+        category = basic.select_category()
+        basic.generate_product_concept(category, basic.get_pain_points(category))
+
+    def measure():
+        return {
+            "select.basic_concepts_per_s": _rate(select_basic, seconds),
+            "select.pro_plans_per_s": _rate(pro.plan_spark, seconds),
+        }
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _median_of(measure, repeats, {} if spread is None else spread)
+
+
+def bench_json(records: int = 2000, repeats: int = DEFAULT_REPEATS, spread: dict = None) -> dict:
+    import one_spark_pro_1764697514875 as pro
+
+    concepts = _fake_concepts(records)
+    answers = [f"```json\n{json.dumps(concept, indent=2)}\n```" for _, concept in concepts]
+    usage = {"input_tokens": 300, "output_tokens": 250}
+
+    return _median_of(lambda: _json_pass(pro, concepts, answers, usage), repeats, {} if spread is None else spread)
+
+
+def _json_pass(pro, concepts: list, answers: list, usage: dict) -> dict:
+    # A fresh scratch directory per pass, so no pass pays for the files of earlier ones
+    start = time.perf_counter()
+    for answer in answers:
+        pro.parse_concept_response(answer)
+    parse_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(prefix="spark_bench_") as scratch:
+        output_dir = Path(scratch)
+        start = time.perf_counter()
+        for category, concept in concepts:
+            pro.write_spark_record(concept, category, ["pain"] * 4, output_dir, usage)
+        save_s = time.perf_counter() - start
+
+        paths = list(output_dir.glob("spark_*.json"))
+        start = time.perf_counter()
+        for path in paths:
+            with open(path) as f:
+                json.load(f)
+        load_s = time.perf_counter() - start
+
+    return {
+        "json.parse_per_s": len(answers) / parse_s,
+        "json.save_per_s": len(concepts) / save_s,
+        "json.load_per_s": len(paths) / load_s,
+    }
+
+
+def bench_e2e(count: int = 40, latency: float = 0.2, concurrency: int = 8, render_workers: int = None) -> dict:
+    import one_spark_pro_1764697514875 as pro
+    from spark_client import ClientManager
+    from spark_mock_api import start_mock_server
+    from spark_sampler import SparkSampler
+
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+    server = start_mock_server(latency=latency, seed=1)
+    pro.client_manager = ClientManager(base_url=server.base_url)
+    pro.response_cache = None
+    pro.sampler = SparkSampler(pro.CATEGORIES, seed=1)
+    try:
+        with tempfile.TemporaryDirectory(prefix="spark_bench_") as scratch:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = pro.run_spark_batch(count, concurrency, output_dir=scratch,
+                                              render_workers=render_workers)
+            wall = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    return {
+        "e2e.sparks_per_s": len(results) / wall,
+        "e2e.wall_s": wall,
+    }
+
+
+def run(suites=SUITES, cards: int = 30, e2e_count: int = 40, latency: float = 0.2,
+        concurrency: int = 8, render_workers: int = None, repeats: int = DEFAULT_REPEATS) -> dict:
+    """Run the selected suites and return {"meta": ..., "metrics": {name: value}, "spread": {name: [min, max]}}."""
+
+    from PIL import __version__ as pillow_version
+
+    metrics = {}
+    spread = {}
+    if "render" in suites:
+        metrics.update(bench_render(cards))
+    if "select" in suites:
+        metrics.update(bench_select(repeats=repeats, spread=spread))
+    if "json" in suites:
+        metrics.update(bench_json(repeats=repeats, spread=spread))
+    if "e2e" in suites:
+        metrics.update(bench_e2e(e2e_count, latency, concurrency, render_workers))
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "pillow": pillow_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {"cards": cards, "e2e_count": e2e_count, "latency": latency,
+                         "concurrency": concurrency, "render_workers": render_workers, "repeats": repeats},
+        },
+        "metrics": {name: round(value, 4) for name, value in metrics.items()},
+        "spread": {name: [round(low, 4), round(high, 4)] for name, (low, high) in spread.items()},
+    }
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+
+def compare(before: dict, after: dict, threshold: float = 0.1) -> list:
+    """[(metric, before, after, relative change, regressed)] for metrics in both runs.
+
+    The change is signed so that positive always means better. A metric
+    regresses when it got worse by more than threshold and, if the
+    baseline recorded a spread, also fell outside that spread.
+    """
+
+    rows = []
+    spread = before.get("spread", {})
+    for metric in sorted(set(before["metrics"]) & set(after["metrics"])):
+        old, new = before["metrics"][metric], after["metrics"][metric]
+        if not old:
+            continue
+        change = (new - old if higher_is_better(metric) else old - new) / abs(old)
+        regressed = change < -threshold
+        if regressed and metric in spread:
+            low, high = spread[metric]
+            regressed = new < low if higher_is_better(metric) else new > high
+        rows.append((metric, old, new, change, regressed))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the spark pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_cmd = commands.add_parser("run", help="Run benchmarks and print (or save) JSON results")
+    run_cmd.add_argument("--suite", action="append", choices=SUITES, default=None,
+                         help="Only these suites (repeatable; default: all)")
+    run_cmd.add_argument("--cards", type=int, default=30, help="Cards rendered per card size")
+    run_cmd.add_argument("--e2e-count", type=int, default=40, help="Sparks in the end-to-end batch")
+    run_cmd.add_argument("--latency", type=float, default=0.2, help="Mock API seconds per call")
+    run_cmd.add_argument("--concurrency", type=int, default=8, help="Requests in flight in the end-to-end batch")
+    run_cmd.add_argument("--render-workers", type=int, default=None, help="Renderer processes in the end-to-end batch")
+    run_cmd.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                         help="Timed passes per select/json metric; the median is reported")
+    run_cmd.add_argument("--out", default=None, help="Write results here instead of stdout")
+    compare_cmd = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare_cmd.add_argument("before")
+    compare_cmd.add_argument("after")
+    compare_cmd.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown that counts (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.suite or SUITES, args.cards, args.e2e_count, args.latency,
+                      args.concurrency, args.render_workers, args.repeats)
+        output = json.dumps(results, indent=2)
+        if args.out:
+            Path(args.out).write_text(output + "\n")
+            print(f"📏 {len(results['metrics'])} metrics written to {args.out}")
+        else:
+            print(output)
+    else:
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        rows = compare(before, after, args.threshold)
+        for metric, old, new, change, regressed in rows:
+            flag = "  ⚠️  REGRESSION" if regressed else ""
+            print(f"{metric:<42} {old:>12.3f} → {new:<12.3f} {change:+7.1%}{flag}")
+        regressions = sum(row[4] for row in rows)
+        print(f"\n{'⚠️ ' if regressions else '✅'} {regressions} of {len(rows)} metrics regressed "
+              f"by more than {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
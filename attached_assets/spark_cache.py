@@ -0,0 +1,149 @@
+"""
+ONE SPARK - Response Cache
+==========================
+Content-addressed on-disk cache for Claude completions.
+
+Entries are keyed by a SHA-256 of (model, prompt text, max_tokens), so any
+change to the prompt or request settings misses the cache. Each entry is
+a small JSON file under <cache dir>/<first two hex chars>/<key>.json.
+Entries expire after a TTL. The directory is kept under a byte budget by
+evicting the least recently used entries first. Recency is the file
+mtime, which is bumped on every hit.
+
+Writes are atomic (temp file + rename), so several processes can share
+one cache directory.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "one_spark" / "responses"
+DEFAULT_TTL = 7 * 24 * 3600          # one week
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2  # 256 MB
+
+
+def cache_key(model: str, prompt: str, max_tokens: int) -> str:
+    payload = json.dumps([model, prompt, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """TTL + size-bounded LRU cache of response texts on disk."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # computed on the first write
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, model: str, prompt: str, max_tokens: int):
+        """Return the cached response text, or None on a miss or expired entry."""
+
+        entry = self._read(self._path(cache_key(model, prompt, max_tokens)))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["response_text"]
+
+    def put(self, model: str, prompt: str, max_tokens: int, response_text: str):
+        """Store a response text and evict old entries if over the size budget."""
+
+        self._write(self._path(cache_key(model, prompt, max_tokens)), {
+            "model": model,
+            "max_tokens": max_tokens,
+            "created_at": time.time(),
+            "response_text": response_text,
+        })
+
+    def _read(self, path: Path):
+        """Load an unexpired entry and mark it as recently used, or return None."""
+
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("created_at", 0) > self.ttl:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def _write(self, path: Path, entry: dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        previous = path.stat().st_size if path.exists() else 0
+        os.replace(tmp_path, path)
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += path.stat().st_size - previous
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                # Not used within a TTL, so it can only be expired
+                self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes is not None and total > self.max_bytes:
+            # Trim to 90% of the budget so we don't evict on every write
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(entries, key=lambda e: e[0]):
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+        self._size = total
+
+    def clear(self):
+        for path in self.directory.glob("*/*.json"):
+            self._remove(path)
+        self._size = 0
+
+    def _scan_size(self) -> int:
+        total = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,378 @@
+"""
+ONE SPARK - Claude Client Manager
+=================================
+One long-lived Anthropic client per process instead of one per spark.
+
+Reusing the client keeps its HTTP connection pool (and the TLS sessions in
+it) alive between sparks. On top of that the manager adds:
+
+- configurable timeouts and base URL (point it at spark_mock_api.py to test)
+- retries on 429 / 5xx / connection errors with full-jitter exponential
+  backoff, honouring the server's retry-after header
+- optional hedging: if a request is still running past a latency
+  percentile of recent requests, a duplicate is sent and whichever
+  answers first wins. The async loser is cancelled. A sync loser can't
+  be: its thread runs to the end and the request is still billed.
+- optional pacing through a shared spark_ratelimit.RateLimiter, so
+  several workers on one host stay under the account's limits together
+
+Usage:
+    manager = ClientManager(timeout=60, max_retries=4, hedge_percentile=95)
+    message = manager.create(model=..., max_tokens=..., messages=[...])
+    message = await manager.acreate(model=..., max_tokens=..., messages=[...])
+"""
+
+import time
+import random
+import threading
+from collections import deque
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def _is_retryable(error: Exception) -> bool:
+    import anthropic
+
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+def _retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def usage_from_message(message) -> dict:
+    """Token counts of one response (missing fields count as zero)."""
+
+    usage = getattr(message, "usage", None)
+    counts = {field: getattr(usage, field, None) or 0 for field in USAGE_FIELDS}
+    counts["response_cache"] = False
+    return counts
+
+
+def cached_usage() -> dict:
+    """Usage of a response replayed from the local response cache: no tokens spent."""
+
+    counts = {field: 0 for field in USAGE_FIELDS}
+    counts["response_cache"] = True
+    return counts
+
+
+class TokenLedger:
+    """Running token totals for a run."""
+
+    def __init__(self):
+        self.totals = {field: 0 for field in USAGE_FIELDS}
+        self.calls = 0
+        self.response_cache_hits = 0
+        self.lock = threading.Lock()
+
+    def add(self, usage: dict):
+        with self.lock:
+            self.calls += 1
+            if usage.get("response_cache"):
+                self.response_cache_hits += 1
+            for field in USAGE_FIELDS:
+                self.totals[field] += usage.get(field, 0)
+
+    def prompt_cache_ratio(self) -> float:
+        """Share of prompt tokens served from the API's prompt cache."""
+
+        prompt = (self.totals["input_tokens"] + self.totals["cache_creation_input_tokens"]
+                  + self.totals["cache_read_input_tokens"])
+        return self.totals["cache_read_input_tokens"] / prompt if prompt else 0.0
+
+    def summary(self) -> str:
+        t = self.totals
+        return (f"{self.calls} calls ({self.response_cache_hits} from response cache) • "
+                f"input {t['input_tokens']} • output {t['output_tokens']} • "
+                f"cache write {t['cache_creation_input_tokens']} • cache read {t['cache_read_input_tokens']} "
+                f"({self.prompt_cache_ratio():.0%} of prompt tokens)")
+
+
+class LatencyTracker:
+    """Rolling window of request latencies for percentile lookups."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 20):
+        """Latency at `pct` (0-100), or None until enough samples exist."""
+
+        with self.lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+class ClientManager:
+    """Shared sync and async Anthropic clients with retries and hedged requests."""
+
+    def __init__(self, base_url: str = None, timeout: float = 60.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_cap: float = 20.0,
+                 hedge_percentile: float = None, hedge_min_samples: int = 20, rate_limiter=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.rate_limiter = rate_limiter
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self._client = None
+        self._async_client = None
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+    # -- clients ---------------------------------------------------------
+
+    def _client_kwargs(self) -> dict:
+        # Retries are ours, so the SDK's own retry loop is switched off
+        kwargs = {"timeout": self.timeout, "max_retries": 0}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        return kwargs
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from anthropic import Anthropic
+                self._client = Anthropic(**self._client_kwargs())
+            return self._client
+
+    @property
+    def async_client(self):
+        # Async clients are bound to the event loop they were first used on,
+        # so callers close them with aclose() before their loop ends
+        if self._async_client is None:
+            from anthropic import AsyncAnthropic
+            self._async_client = AsyncAnthropic(**self._client_kwargs())
+        return self._async_client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            if self._hedge_pool is not None:
+                self._hedge_pool.shutdown(wait=False)
+                self._hedge_pool = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    # -- policy ----------------------------------------------------------
+
+    def backoff(self, attempt: int, error: Exception = None) -> float:
+        """Full-jitter exponential backoff, never shorter than retry-after."""
+
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def reserve(self, request: dict):
+        """Wait for rate-limit budget for one request. Returns a reservation (or None)."""
+
+        if self.rate_limiter is None:
+            return None
+        from spark_ratelimit import estimate_input_tokens
+        return self.rate_limiter.acquire(input_tokens=estimate_input_tokens(request),
+                                         output_tokens=request.get("max_tokens", 0))
+
+    async def areserve(self, request: dict):
+        if self.rate_limiter is None:
+            return None
+        from spark_ratelimit import estimate_input_tokens
+        return await self.rate_limiter.acquire_async(input_tokens=estimate_input_tokens(request),
+                                                     output_tokens=request.get("max_tokens", 0))
+
+    def settle(self, reservation, message=None, output_tokens: int = 0):
+        """Give back the unused part of a reservation once real usage is known.
+
+        Without a message (the call failed or was cancelled), the output
+        reservation is given back except for output_tokens already seen.
+        The input estimate stays charged, since the API may have read the
+        prompt.
+        """
+
+        if reservation is None or self.rate_limiter is None:
+            return
+        if message is None:
+            self.rate_limiter.settle(reservation, output_tokens=output_tokens)
+            return
+        usage = usage_from_message(message)
+        prompt_tokens = (usage["input_tokens"] + usage["cache_creation_input_tokens"]
+                         + usage["cache_read_input_tokens"])
+        self.rate_limiter.settle(reservation, input_tokens=prompt_tokens, output_tokens=usage["output_tokens"])
+
+    async def asettle(self, reservation, message=None, output_tokens: int = 0):
+        """settle() for coroutines; the limiter's SQLite write runs off the event loop."""
+
+        if reservation is None:
+            return
+        import asyncio
+
+        await asyncio.to_thread(self.settle, reservation, message, output_tokens)
+
+    def _on_retryable(self, error: Exception, delay: float):
+        # A 429 means the whole host is over budget, not just this worker
+        if self.rate_limiter is not None and getattr(error, "status_code", None) == 429:
+            self.rate_limiter.pause(delay)
+
+    def hedge_delay(self):
+        if not self.hedge_percentile:
+            return None
+        return self.latency.percentile(self.hedge_percentile, self.hedge_min_samples)
+
+    # -- sync ------------------------------------------------------------
+
+    def _timed_create(self, kwargs: dict):
+        reservation = self.reserve(kwargs)
+        message = None
+        try:
+            started = time.perf_counter()
+            message = self.client.messages.create(**kwargs)
+            self.latency.record(time.perf_counter() - started)
+        finally:
+            # A failed call gives its output reservation back too
+            self.settle(reservation, message)
+        return message
+
+    def _hedged_create(self, kwargs: dict):
+        # Threads can't be cancelled: a losing request runs to the end (and is
+        # billed). Its reservation is settled when it finishes.
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed_create(kwargs)
+
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="spark-hedge")
+            pool = self._hedge_pool
+        primary = pool.submit(self._timed_create, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = pool.submit(self._timed_create, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn with the manager's retry policy (for non-message endpoints)."""
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                self.retries += 1
+                delay = self.backoff(attempt, e)
+                self._on_retryable(e, delay)
+                time.sleep(delay)
+
+    def create(self, **kwargs):
+        """messages.create with retries and optional hedging."""
+
+        return self.call(self._hedged_create, kwargs)
+
+    # -- async -----------------------------------------------------------
+
+    async def _atimed_create(self, kwargs: dict):
+        reservation = await self.areserve(kwargs)
+        message = None
+        try:
+            started = time.perf_counter()
+            message = await self.async_client.messages.create(**kwargs)
+            self.latency.record(time.perf_counter() - started)
+        finally:
+            # Also runs for a failed call or a cancelled hedge loser
+            await self.asettle(reservation, message)
+        return message
+
+    async def _ahedged_create(self, kwargs: dict):
+        import asyncio
+
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._atimed_create(kwargs))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(self._atimed_create(kwargs))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) with the manager's retry policy."""
+
+        import asyncio
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                self.retries += 1
+                delay = self.backoff(attempt, e)
+                await asyncio.to_thread(self._on_retryable, e, delay)
+                await asyncio.sleep(delay)
+
+    async def acreate(self, **kwargs):
+        """Async messages.create with retries and optional hedging."""
+
+        return await self.acall(self._ahedged_create, kwargs)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Pain-Point Clustering
+=================================
+Merges near-identical complaints in a harvested corpus, e.g. "Pillows go
+flat" and "Pillows that go flat or lose shape after a few months". Each
+cluster is kept once, with a count of how many pain points it absorbed.
+
+The pipeline runs per category:
+
+1. Vectorize: words (minus stopwords) are hashed into n_features
+   columns (hashing trick, no vocabulary to keep in memory). They are
+   weighted by sublinear TF x IDF and L2-normalized into a SciPy CSR
+   matrix. Terms in more than max_df of a large category ("the",
+   "product") are dropped, since they say nothing about which complaint
+   it is and would make the similarity products dense.
+2. Link: rows are compared in chunks (chunk @ rest.T), so peak memory is
+   bounded by chunk_size, not by the category size. Pairs with cosine
+   similarity >= threshold become edges.
+3. Merge: connected components of the edge graph are the clusters. The
+   most frequent wording represents each cluster (shortest on ties).
+   Cluster sizes become `mentions`, and `intensity` is a label from
+   where a cluster's size ranks within its category.
+
+A category's pain points are all held in memory while it is clustered,
+since any two of them may merge. cluster_corpus therefore reads at most
+max_rows per category (MAX_ROWS by default), streamed from the corpus in
+seq order. The rest of a larger category is skipped and counted in the
+summary. Raise the cap if the machine has memory for it.
+
+Usage:
+    clusters = cluster_pains(texts, threshold=0.5)     # [(representative index, member indices), ...]
+    cluster_corpus(PainCorpus("pains.sqlite"), PainCorpus("clustered.sqlite"))
+
+    python spark_cluster.py pains.sqlite clustered.sqlite --threshold 0.5
+"""
+
+import re
+import zlib
+import argparse
+from itertools import islice
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+DEFAULT_FEATURES = 1 << 20
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Compress the edge list into one star per component beyond this many edges
+MAX_EDGES = 5_000_000
+
+# Pain points per category that cluster_corpus reads (a few hundred MB at most)
+MAX_ROWS = 500_000
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_TOKEN.findall(text.lower()))
+
+
+# Function words carry no complaint; dropping them lets a short wording
+# match a longer one ("Pillows go flat" vs "Pillows that go flat or ...")
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been but by can could did do does doing for from
+get gets got had has have i i'm i've if in into is it it's its just me my of on one or our out so
+some than that the their them then there these they this those to too up very was we were what
+when which while who will with would you your
+""".split())
+
+
+def _terms(text: str) -> list:
+    # Plural "s" is folded so "pillow goes flat" and "pillows go flat" share terms
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in _TOKEN.findall(text.lower()) if word not in STOPWORDS]
+
+
+def hashed_tfidf(texts: list, n_features: int = DEFAULT_FEATURES, max_df: float = 0.05,
+                 min_df_cap: int = 100) -> sparse.csr_matrix:
+    """L2-normalized TF-IDF rows over hashed word features.
+
+    Terms in more than max(max_df * len(texts), min_df_cap) rows are dropped,
+    except from rows that would be left with no terms at all.
+    """
+
+    mask = n_features - 1
+    if n_features & mask:
+        raise ValueError("n_features must be a power of two")
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    indices = []
+    for i, text in enumerate(texts):
+        indices.extend(zlib.crc32(term.encode("utf-8")) & mask for term in _terms(text))
+        indptr[i + 1] = len(indices)
+    indices = np.asarray(indices, dtype=np.int32)
+    counts = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                               shape=(len(texts), n_features))
+    counts.sum_duplicates()
+
+    n = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=n_features)
+    idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+    common = df > max(max_df * n, min_df_cap)
+
+    weights = counts.copy()
+    weights.data = (1 + np.log(weights.data)) * idf[weights.indices]
+    # A row made only of common terms keeps them, so a short, dominant
+    # complaint still matches its copies instead of becoming a zero vector
+    row_of = np.repeat(np.arange(n), np.diff(weights.indptr))
+    dropped = common[weights.indices]
+    emptied = np.bincount(row_of[~dropped], minlength=n) == 0
+    weights.data[dropped & ~emptied[row_of]] = 0.0
+    weights.eliminate_zeros()
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1 / norms).dot(weights).tocsr()
+
+
+def cluster_labels(vectors: sparse.csr_matrix, threshold: float = 0.5, chunk_size: int = 2000) -> np.ndarray:
+    """Cluster label per row: connected components of cosine similarity >= threshold."""
+
+    n = vectors.shape[0]
+    transposed = vectors.T.tocsc()
+    rows, cols = [], []
+    edges = 0
+
+    def compress():
+        nonlocal rows, cols, edges
+        _, labels = _components(n, rows, cols)
+        # Link every node to the first node of its component
+        first = np.full(labels.max() + 1, -1, dtype=np.int64)
+        order = np.arange(n)
+        first[labels[::-1]] = order[::-1]
+        linked = first[labels] != order
+        rows, cols = [order[linked]], [first[labels][linked]]
+        edges = int(linked.sum())
+
+    for start in range(0, n, chunk_size):
+        end = min(start + chunk_size, n)
+        # Only compare with rows at or after this chunk: each pair is seen once
+        similarity = (vectors[start:end] @ transposed[:, start:]).tocoo()
+        keep = (similarity.data >= threshold) & (similarity.col > similarity.row)
+        rows.append(similarity.row[keep].astype(np.int64) + start)
+        cols.append(similarity.col[keep].astype(np.int64) + start)
+        edges += int(keep.sum())
+        if edges > MAX_EDGES:
+            compress()
+
+    return _components(n, rows, cols)[1]
+
+
+def _components(n: int, rows: list, cols: list) -> tuple:
+    row = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    col = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    graph = sparse.coo_matrix((np.ones(len(row), dtype=np.int8), (row, col)), shape=(n, n))
+    return connected_components(graph, directed=False)
+
+
+def cluster_pains(texts: list, threshold: float = 0.5, chunk_size: int = 2000,
+                  n_features: int = DEFAULT_FEATURES) -> list:
+    """[(representative index, member indices)] for texts, largest clusters first."""
+
+    if not texts:
+        return []
+    labels = cluster_labels(hashed_tfidf(texts, n_features), threshold, chunk_size)
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    clusters = []
+    for members in np.split(order, boundaries):
+        if len(members) == 1:
+            clusters.append((int(members[0]), members))
+            continue
+        wordings = Counter(_normalize(texts[i]) for i in members)
+        representative = min(members, key=lambda i: (-wordings[_normalize(texts[i])], len(texts[i])))
+        clusters.append((int(representative), members))
+    clusters.sort(key=lambda cluster: -len(cluster[1]))
+    return clusters
+
+
+def intensity_label(mentions: int, high: float, medium: float) -> str:
+    if mentions >= high:
+        return "high"
+    if mentions >= medium:
+        return "medium"
+    return "low"
+
+
+def cluster_corpus(source, target, threshold: float = 0.5, chunk_size: int = 2000,
+                   n_features: int = DEFAULT_FEATURES, categories=None, batch_size: int = 5000,
+                   max_rows: int = MAX_ROWS) -> dict:
+    """Write one pain point per cluster of `source` into `target`.
+
+    Returns {category: (pain points clustered, clusters, pain points skipped)}.
+    Only the first max_rows pain points of a category are read (None: all).
+    Clusters in the top 20% by size (and seen at least twice) are "high"
+    intensity, the next 30% "medium", the rest "low".
+    """
+
+    if source.path.resolve() == target.path.resolve():
+        raise ValueError("cluster into a new corpus file, not the source")
+    summary = {}
+    for category in categories or sorted(source.counts()):
+        entries = list(islice(source.iter_category(category), max_rows))
+        skipped = source.count(category) - len(entries)
+        clusters = cluster_pains([entry["pain"] for entry in entries], threshold, chunk_size, n_features)
+        mentions = np.array([sum(entries[i]["mentions"] for i in members) for _, members in clusters])
+        if len(mentions) == 0:
+            continue
+        high = max(2, np.percentile(mentions, 80))
+        medium = max(2, np.percentile(mentions, 50))
+        batch = []
+        for (representative, members), count in zip(clusters, mentions):
+            sources = Counter(entries[i]["source"] for i in members if entries[i]["source"])
+            batch.append({
+                "category": category,
+                "pain": entries[representative]["pain"],
+                "source": sources.most_common(1)[0][0] if sources else None,
+                "intensity": intensity_label(count, high, medium),
+                "mentions": int(count),
+            })
+            if len(batch) >= batch_size:
+                target.add_many(batch)
+                batch = []
+        if batch:
+            target.add_many(batch)
+        summary[category] = (len(entries), len(clusters), skipped)
+    return summary
+
+
+if __name__ == "__main__":
+    from spark_corpus import PainCorpus
+
+    parser = argparse.ArgumentParser(description="Merge near-duplicate pain points into weighted clusters")
+    parser.add_argument("source", help="Harvested corpus (SQLite)")
+    parser.add_argument("target", help="Clustered corpus to write (SQLite)")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Cosine similarity that merges two pain points")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rows compared per step (bounds memory)")
+    parser.add_argument("--category", action="append", default=None, help="Only these categories (repeatable)")
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS,
+                        help="Pain points read per category; the rest are skipped (bounds memory)")
+    args = parser.parse_args()
+
+    summary = cluster_corpus(PainCorpus(args.source), PainCorpus(args.target), args.threshold,
+                             args.chunk_size, categories=args.category, max_rows=args.max_rows)
+    for category, (before, after, skipped) in summary.items():
+        print(f"{before:>10} → {after:<10} {category}" + (f" ({skipped} over --max-rows skipped)" if skipped else ""))
+    print(f"🧩 {sum(b for b, _, _ in summary.values())} pain points → "
+          f"{sum(a for _, a, _ in summary.values())} clusters in {args.target}")
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Pain-Point Corpus
+=============================
+Pain points on disk, for corpora far too big to hard-code in
+PAIN_POINT_DATABASE.
+
+The corpus is a single SQLite file. Within its category, each pain point
+gets a dense ordinal (seq = 0, 1, 2, ...). An index on (category, seq)
+serves as the per-category offset index. To sample k pain points, draw
+k ordinals below the category's count and fetch exactly those rows, so
+memory stays constant however many pain points the corpus holds.
+Nothing is opened until the first lookup, so importing the module, or
+creating a PainCorpus, costs nothing.
+
+Imports stream line by line and dedupe on (category, text), so
+re-importing a scrape is safe.
+
+Usage:
+    corpus = PainCorpus("~/.cache/one_spark/pains.sqlite")
+    corpus.add_many([{"category": "pet products", "pain": "...", "source": "Reddit"}])
+    corpus.sample("pet products", 4)        # [{"pain", "source", "intensity", "mentions"}, ...]
+
+    python spark_corpus.py pains.sqlite import scraped.jsonl     # {"category", "pain", "source"?, "intensity"?}
+    python spark_corpus.py pains.sqlite stats
+"""
+
+import json
+import random
+import sqlite3
+from array import array
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+DEFAULT_CORPUS_PATH = Path.home() / ".cache" / "one_spark" / "pains.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pains (
+    category  TEXT NOT NULL,
+    seq       INTEGER NOT NULL,
+    pain      TEXT NOT NULL,
+    source    TEXT,
+    intensity TEXT,
+    mentions  INTEGER NOT NULL DEFAULT 1,
+    digest    TEXT NOT NULL,
+    PRIMARY KEY (category, seq)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS pains_digest ON pains (category, digest);
+CREATE TABLE IF NOT EXISTS categories (
+    category TEXT PRIMARY KEY,
+    count    INTEGER NOT NULL
+);
+"""
+
+
+def pain_digest(pain: str) -> str:
+    """Dedup key: the pain text with case and whitespace normalized."""
+
+    return hashlib.sha1(" ".join(pain.lower().split()).encode()).hexdigest()
+
+
+def _entry(row) -> dict:
+    pain, source, intensity, mentions = row
+    return {"pain": pain, "source": source, "intensity": intensity, "mentions": mentions}
+
+
+class PainCorpus:
+    """SQLite pain-point corpus with constant-memory per-category sampling."""
+
+    def __init__(self, path=DEFAULT_CORPUS_PATH):
+        self.path = Path(path).expanduser()
+        self._local = threading.local()
+        self._counts = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pains)")}
+            if "mentions" not in columns:  # corpora created before clustering
+                conn.execute("ALTER TABLE pains ADD COLUMN mentions INTEGER NOT NULL DEFAULT 1")
+            self._local.conn = conn
+        return conn
+
+    # -- reading ---------------------------------------------------------
+
+    def counts(self) -> dict:
+        """Pain points per category (cached; one small row per category)."""
+
+        if self._counts is None:
+            self._counts = dict(self._connect().execute("SELECT category, count FROM categories"))
+        return self._counts
+
+    def count(self, category: str) -> int:
+        return self.counts().get(category, 0)
+
+    def __contains__(self, category: str) -> bool:
+        return self.count(category) > 0
+
+    def sample(self, category: str, k: int, rng=random) -> list:
+        """Up to k distinct pain points of a category, read by ordinal."""
+
+        total = self.count(category)
+        return self.fetch(category, rng.sample(range(total), min(k, total)))
+
+    def fetch(self, category: str, seqs: list) -> list:
+        """The pain points with these ordinals, in the order given."""
+
+        if not seqs:
+            return []
+        placeholders = ",".join("?" * len(seqs))
+        rows = self._connect().execute(
+            f"SELECT seq, pain, source, intensity, mentions FROM pains WHERE category = ? AND seq IN ({placeholders})",
+            [category, *seqs]).fetchall()
+        by_seq = {row[0]: _entry(row[1:]) for row in rows}
+        return [by_seq[seq] for seq in seqs if seq in by_seq]
+
+    def seqs_by_intensity(self, category: str) -> dict:
+        """{intensity: array of seqs} for a category, for weighted draws by ordinal (8 bytes per pain point)."""
+
+        strata = {}
+        for intensity, seq in self._connect().execute(
+                "SELECT intensity, seq FROM pains WHERE category = ? ORDER BY seq", (category,)):
+            seqs = strata.get(intensity)
+            if seqs is None:
+                seqs = strata[intensity] = array("q")
+            seqs.append(seq)
+        return strata
+
+    def iter_category(self, category: str, batch_size: int = 1000):
+        """Every pain point of a category, streamed in seq order."""
+
+        start = 0
+        conn = self._connect()
+        while True:
+            rows = conn.execute(
+                "SELECT seq, pain, source, intensity, mentions FROM pains WHERE category = ? AND seq >= ? "
+                "ORDER BY seq LIMIT ?", (category, start, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _entry(row[1:])
+            start = rows[-1][0] + 1
+
+    # -- writing ---------------------------------------------------------
+
+    def add_many(self, entries) -> int:
+        """Insert {"category", "pain", "source"?, "intensity"?, "mentions"?} dicts in one transaction.
+
+        Pain points already in their category are skipped. Returns how many
+        were added.
+        """
+
+        conn = self._connect()
+        added = 0
+        with conn:
+            # Take the write lock up front so concurrent importers can't hand out the same seq
+            conn.execute("BEGIN IMMEDIATE")
+            counts = {}
+            for entry in entries:
+                category, pain = entry["category"], entry["pain"]
+                if category not in counts:
+                    row = conn.execute("SELECT count FROM categories WHERE category = ?", (category,)).fetchone()
+                    counts[category] = row[0] if row else 0
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO pains (category, seq, pain, source, intensity, mentions, digest) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (category, counts[category], pain, entry.get("source"), entry.get("intensity"),
+                     entry.get("mentions", 1), pain_digest(pain)))
+                if cursor.rowcount:
+                    counts[category] += 1
+                    added += 1
+            conn.executemany(
+                "INSERT INTO categories (category, count) VALUES (?, ?) "
+                "ON CONFLICT(category) DO UPDATE SET count = excluded.count", counts.items())
+        self._counts = None
+        return added
+
+    def import_jsonl(self, path, batch_size: int = 5000) -> int:
+        """Stream a JSON-lines file into the corpus, batch_size entries per transaction."""
+
+        added = 0
+        batch = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("category") and entry.get("pain"):
+                    batch.append(entry)
+                if len(batch) >= batch_size:
+                    added += self.add_many(batch)
+                    batch = []
+        if batch:
+            added += self.add_many(batch)
+        return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONE SPARK pain-point corpus")
+    parser.add_argument("corpus", help="Corpus SQLite file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="Import a JSON-lines file of pain points")
+    import_cmd.add_argument("jsonl")
+    commands.add_parser("stats", help="Pain points per category")
+    sample_cmd = commands.add_parser("sample", help="Print random pain points of a category")
+    sample_cmd.add_argument("category")
+    sample_cmd.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    corpus = PainCorpus(args.corpus)
+    if args.command == "import":
+        print(f"📥 Added {corpus.import_jsonl(args.jsonl)} pain points to {corpus.path}")
+    elif args.command == "stats":
+        counts = corpus.counts()
+        for category, count in sorted(counts.items(), key=lambda item: -item[1]):
+            print(f"{count:>10}  {category}")
+        print(f"{sum(counts.values()):>10}  total in {len(counts)} categories")
+    else:
+        for entry in corpus.sample(args.category, args.k):
+            print(f"• {entry['pain']}  ({entry['source'] or 'unknown source'})")
@@ -0,0 +1,164 @@
+"""
+ONE SPARK - Near-Duplicate Concept Index
+========================================
+Catch repeat concepts before they are saved or paid for.
+
+Random category and pain-point picks keep landing in the same places,
+producing several "CloudCore"-style pillows for sleep products. This
+index has two checks:
+
+- Before generating: each (category, pain subset) region counts how many
+  sparks it has produced. Once a region reaches `region_limit`, it is
+  saturated and the run should pick another one. steer_pains() picks the
+  category's least-covered pain points, so runs spread across the space.
+- Before accepting: find_duplicate() compares a new concept with the
+  ones already indexed. It matches on the exact normalized name or on
+  MinHash similarity of name + tagline + description. LSH banding keeps
+  this cheap, since only concepts that share a band bucket are compared.
+
+Usage:
+    index = ConceptIndex(threshold=0.6, region_limit=3)
+    index.add_records(existing_records)             # spark JSON records
+    pains = index.steer_pains(category, get_pain_points(category), k=4)
+    if not index.is_saturated(category, pains):
+        index.claim(category, pains)
+        ...  # generate
+        match = index.find_duplicate(concept)       # None or (name, similarity)
+        if match is None:
+            index.add(concept)
+"""
+
+import re
+import random
+import hashlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Mersenne prime for the universal hash family h(x) = (a*x + b) mod p.
+# Values stay below 2**62, so the products fit in int64.
+_PRIME = (1 << 31) - 1
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_name(name: str) -> str:
+    return "".join(_WORD.findall(name.lower()))
+
+
+def concept_shingles(concept: dict) -> set:
+    """Word unigrams and bigrams of the concept's name, tagline and description."""
+
+    text = " ".join(str(concept.get(key, "")) for key in ("name", "tagline", "description"))
+    words = _WORD.findall(text.lower())
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def _region(category: str, pains) -> tuple:
+    return category, frozenset(pains)
+
+
+class ConceptIndex:
+    """MinHash/LSH similarity index over concepts, plus pain-region coverage counts."""
+
+    def __init__(self, threshold: float = 0.6, region_limit: int = None,
+                 num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.region_limit = region_limit
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+        self.names = {}                 # normalized name -> display name
+        self.signatures = []            # one MinHash signature per indexed concept
+        self.labels = []                # concept name for each signature
+        self._buckets = defaultdict(list)
+        self.regions = Counter()        # (category, frozenset(pains)) -> sparks claimed
+        self.coverage = defaultdict(Counter)  # category -> pain point -> sparks claimed
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    # -- similarity ------------------------------------------------------
+
+    def signature(self, concept: dict) -> np.ndarray:
+        shingles = concept_shingles(concept)
+        if not shingles:
+            return np.full(len(self._a), _PRIME, dtype=np.int64)
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") % _PRIME
+             for s in shingles),
+            dtype=np.int64, count=len(shingles))
+        # (num_perm, n_shingles) matrix of permuted hashes, minimum per permutation
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find_duplicate(self, concept: dict):
+        """(matching concept name, estimated similarity) or None if the concept is new."""
+
+        existing = self.names.get(normalize_name(concept.get("name", "")))
+        if existing is not None:
+            return existing, 1.0
+        signature = self.signature(concept)
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best = None
+        for i in candidates:
+            similarity = float(np.mean(self.signatures[i] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self.labels[i], similarity)
+        return best
+
+    def add(self, concept: dict):
+        """Index an accepted concept."""
+
+        name = concept.get("name", "")
+        self.names.setdefault(normalize_name(name), name)
+        signature = self.signature(concept)
+        i = len(self.signatures)
+        self.signatures.append(signature)
+        self.labels.append(name)
+        for key in self._band_keys(signature):
+            self._buckets[key].append(i)
+
+    # -- coverage --------------------------------------------------------
+
+    def claim(self, category: str, pains):
+        """Count one spark against a (category, pains) region and its pain points."""
+
+        self.regions[_region(category, pains)] += 1
+        self.coverage[category].update(pains)
+
+    def is_saturated(self, category: str, pains) -> bool:
+        if self.region_limit is None:
+            return False
+        return self.regions[_region(category, pains)] >= self.region_limit
+
+    def steer_pains(self, category: str, pain_points: list, k: int = 4, rng=random) -> list:
+        """The k least-covered pain points of a category (random among ties)."""
+
+        covered = self.coverage[category]
+        ranked = sorted(pain_points, key=lambda pain: (covered[pain], rng.random()))
+        return ranked[:min(k, len(ranked))]
+
+    def add_records(self, records) -> int:
+        """Seed the index from saved spark records. Demo placeholders are skipped."""
+
+        added = 0
+        for record in records:
+            if record.get("outcome") == "demo" or "concept" not in record:
+                continue
+            self.claim(record.get("category", ""), record.get("pain_points", ()))
+            self.add(record["concept"])
+            added += 1
+        return added
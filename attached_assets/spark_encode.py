@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Card Encoder
+========================
+Turns a rendered card image into bytes on disk: PNG, WebP, JPEG or AVIF,
+with a speed/size preset per format. The same pass can also write
+downscaled thumbnails.
+
+Presets:
+- "fast": cheapest encode, bigger files
+- "balanced": the default
+- "small": slowest encode, smallest files. PNG is quantized to a
+  256-color palette, which suits the flat colors of a card.
+
+With target_bytes, lossy formats search for the highest quality that
+fits; PNG steps down its palette size instead. Every encode is done in
+memory, then written once. If even the lowest setting doesn't fit, the
+smallest attempt is written and result["over_target"] is set.
+
+A CardEncoder holds only settings, so it pickles cheaply into render
+worker processes, and Pillow is imported only when something is encoded. Each save() returns a dict of what it wrote:
+{"path", "format", "bytes", "seconds", "write_seconds", "quality",
+"over_target", "thumbnails"}; seconds includes write_seconds.
+
+Usage:
+    encoder = CardEncoder("webp", "balanced", target_bytes=150_000, thumbnails=(540, 270))
+    result = encoder.save(img, "card.webp")
+
+    python spark_encode.py cards/*.png --format webp --preset small --target-kb 150
+    python spark_encode.py cards/*.png --compare        # every format x preset, measured
+"""
+
+import io
+import os
+import time
+import argparse
+from pathlib import Path
+
+FORMATS = ("png", "webp", "jpeg", "avif")
+
+SUFFIXES = {"png": ".png", "webp": ".webp", "jpeg": ".jpg", "avif": ".avif"}
+
+# Pillow save() options per format and preset. "colors" is not a save()
+# option: PNG is quantized to that many palette entries first.
+PRESETS = {
+    "png": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "small": {"colors": 256, "optimize": True},
+    },
+    "webp": {
+        "fast": {"quality": 80, "method": 0},
+        "balanced": {"quality": 85, "method": 4},
+        "small": {"quality": 75, "method": 6},
+    },
+    "jpeg": {
+        # Full-resolution chroma (subsampling 0) keeps colored text crisp
+        "fast": {"quality": 85, "subsampling": 0},
+        "balanced": {"quality": 88, "subsampling": 0, "optimize": True},
+        "small": {"quality": 78, "subsampling": 2, "optimize": True, "progressive": True},
+    },
+    "avif": {
+        "fast": {"quality": 70, "speed": 10},
+        # Below speed 6 encodes take tens of seconds per card for little gain
+        "balanced": {"quality": 70, "speed": 8},
+        "small": {"quality": 60, "speed": 6},
+    },
+}
+
+PRESET_NAMES = ("fast", "balanced", "small")
+
+# Lowest quality (lossy) and palette size (PNG) a byte target may push down to
+MIN_QUALITY = 30
+MIN_COLORS = 16
+
+
+def check_format(fmt: str):
+    """Raise ValueError if fmt is unknown or this Pillow build can't write it."""
+
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if fmt in ("webp", "avif"):
+        from PIL import features
+
+        if not features.check(fmt):
+            raise ValueError(f"this Pillow build has no {fmt} support")
+
+
+def _quantize(img: "Image.Image", colors: int) -> "Image.Image":
+    from PIL import Image
+
+    return img.quantize(colors, method=Image.Quantize.FASTOCTREE)
+
+
+def encode_bytes(img: "Image.Image", fmt: str, options: dict) -> bytes:
+    """Encode img in memory with Pillow save() options (plus PNG "colors")."""
+
+    options = dict(options)
+    colors = options.pop("colors", None)
+    if colors:
+        img = _quantize(img, colors)
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def thumbnail_path(path, width: int) -> Path:
+    """card.webp -> card_540w.webp"""
+
+    path = Path(path)
+    return path.with_name(f"{path.stem}_{width}w{path.suffix}")
+
+
+class CardEncoder:
+    """Encoding settings for card images: format, preset, byte target, thumbnail widths."""
+
+    def __init__(self, fmt: str = "png", preset: str = "balanced", target_bytes: int = None,
+                 thumbnails: tuple = ()):
+        check_format(fmt)
+        if preset not in PRESET_NAMES:
+            raise ValueError(f"preset must be one of {', '.join(PRESET_NAMES)}")
+        self.format = fmt
+        self.preset = preset
+        self.target_bytes = target_bytes
+        self.thumbnails = tuple(sorted(set(thumbnails), reverse=True))
+
+    @property
+    def suffix(self) -> str:
+        return SUFFIXES[self.format]
+
+    @property
+    def options(self) -> dict:
+        return PRESETS[self.format][self.preset]
+
+    def __repr__(self) -> str:
+        target = f", target {self.target_bytes // 1024} KB" if self.target_bytes else ""
+        return f"CardEncoder({self.format}/{self.preset}{target})"
+
+    def encode(self, img: "Image.Image", target_bytes: int = None) -> tuple:
+        """(data, quality or palette size, over_target) for img."""
+
+        options = self.options
+        if self.format == "png" and options.get("colors") is None:
+            # Only a palette makes RGB cards much smaller; keep the preset's compression
+            options = dict(options, colors=256 if target_bytes else None)
+        knob = "colors" if self.format == "png" else "quality"
+        data = encode_bytes(img, self.format, options)
+        if not target_bytes or len(data) <= target_bytes:
+            return data, options.get(knob), False
+        if knob == "colors":
+            colors = options["colors"]
+            while colors > MIN_COLORS:
+                colors //= 2
+                data = encode_bytes(img, self.format, dict(options, colors=colors))
+                if len(data) <= target_bytes:
+                    return data, colors, False
+            return data, colors, True
+        # Highest quality in [MIN_QUALITY, preset quality) that fits
+        low, high = MIN_QUALITY, options["quality"] - 1
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            attempt = encode_bytes(img, self.format, dict(options, quality=quality))
+            if len(attempt) <= target_bytes:
+                best, low = (attempt, quality), quality + 1
+            else:
+                data, high = attempt, quality - 1
+        if best is not None:
+            return best[0], best[1], False
+        # Nothing fit: the search's last attempt was at MIN_QUALITY
+        return data, MIN_QUALITY, True
+
+    def save(self, img: "Image.Image", path) -> dict:
+        """Encode img (and its thumbnails) to path. Returns what was written and how long it took."""
+
+        from PIL import Image
+
+        start = time.perf_counter()
+        path = Path(path)
+        data, quality, over_target = self.encode(img, self.target_bytes)
+        written = time.perf_counter()
+        path.write_bytes(data)
+        write_seconds = time.perf_counter() - written
+        thumbnails = {}
+        for width in self.thumbnails:
+            if width >= img.width:
+                continue
+            height = round(img.height * width / img.width)
+            # reducing_gap downsamples in integer steps first, much faster than a full Lanczos pass
+            thumb = img.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+            # Thumbnails share the card's byte budget proportionally to their area
+            budget = self.target_bytes and int(self.target_bytes * (width / img.width) ** 2)
+            thumb_data, _, _ = self.encode(thumb, budget)
+            thumb_file = thumbnail_path(path, width)
+            written = time.perf_counter()
+            thumb_file.write_bytes(thumb_data)
+            write_seconds += time.perf_counter() - written
+            thumbnails[str(width)] = {"path": str(thumb_file), "bytes": len(thumb_data)}
+        return {
+            "path": str(path),
+            "format": self.format,
+            "bytes": len(data),
+            "seconds": time.perf_counter() - start,
+            "write_seconds": write_seconds,
+            "quality": quality,
+            "over_target": over_target,
+            "thumbnails": thumbnails,
+        }
+
+
+def encode_summary(results: list) -> str:
+    """One line of per-card encode numbers: count, mean size, median and p95 time."""
+
+    import statistics
+
+    results = [result for result in results if result]
+    if not results:
+        return "no cards encoded"
+    ms = sorted(result["seconds"] * 1000 for result in results)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    kb = statistics.mean(result["bytes"] for result in results) / 1024
+    over = sum(result["over_target"] for result in results)
+    return (f"{len(results)} cards • {kb:.0f} KB mean • {statistics.median(ms):.0f} ms median, {p95:.0f} ms p95"
+            + (f" • {over} over target" if over else ""))
+
+
+def _reencode(encoder: CardEncoder, source: str, output_dir: str) -> dict:
+    from PIL import Image
+
+    with Image.open(source) as img:
+        img = img.convert("RGB")
+    target = Path(output_dir or Path(source).parent) / (Path(source).stem + encoder.suffix)
+    if target == Path(source):
+        target = target.with_name(f"{target.stem}_{encoder.preset}{target.suffix}")
+    return encoder.save(img, target)
+
+
+def encode_files(encoder: CardEncoder, sources: list, output_dir: str = None, workers: int = None) -> list:
+    """Re-encode existing card images in a process pool. Returns one result dict per source."""
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(sources) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_reencode, [encoder] * len(sources), sources,
+                                 [output_dir] * len(sources), chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Re-encode card images and measure encode time and size")
+    parser.add_argument("cards", nargs="+", help="Card images to encode")
+    parser.add_argument("--format", choices=FORMATS, default="webp")
+    parser.add_argument("--preset", choices=PRESET_NAMES, default="balanced")
+    parser.add_argument("--target-kb", type=float, default=None, help="Byte budget per card, in KB")
+    parser.add_argument("--thumbnails", type=int, nargs="*", default=[], metavar="WIDTH",
+                        help="Also write thumbnails this many pixels wide")
+    parser.add_argument("--output-dir", default=None, help="Where to write (default: next to each card)")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes (default: all cores)")
+    parser.add_argument("--compare", action="store_true",
+                        help="Encode with every available format and preset into a scratch dir and print a table")
+    args = parser.parse_args()
+
+    target_bytes = int(args.target_kb * 1024) if args.target_kb else None
+    if args.compare:
+        with tempfile.TemporaryDirectory() as scratch:
+            for fmt in FORMATS:
+                try:
+                    check_format(fmt)
+                except ValueError as e:
+                    print(f"{fmt:>5}  skipped: {e}")
+                    continue
+                for preset in PRESET_NAMES:
+                    encoder = CardEncoder(fmt, preset, target_bytes, args.thumbnails)
+                    results = encode_files(encoder, args.cards, f"{scratch}/{fmt}-{preset}", args.workers)
+                    print(f"{fmt:>5} {preset:<9} {encode_summary(results)}")
+    else:
+        encoder = CardEncoder(args.format, args.preset, target_bytes, args.thumbnails)
+        results = encode_files(encoder, args.cards, args.output_dir, args.workers)
+        for result in results:
+            print(f"{result['bytes'] / 1024:>8.0f} KB {result['seconds'] * 1000:>7.0f} ms  {result['path']}")
+        print(f"🗜️  {encoder}: {encode_summary(results)}")
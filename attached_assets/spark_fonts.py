@@ -0,0 +1,127 @@
+"""
+ONE SPARK - Font Registry
+=========================
+Process-wide cache of TrueType fonts for the card renderers.
+
+Each (path, size) pair is parsed once per process and reused for every card
+afterwards. Font files are looked up by name along a search path, which can
+be set with the ONE_SPARK_FONT_PATH environment variable (directories
+separated by os.pathsep) or by calling configure().
+
+Usage:
+    from spark_fonts import get_font, font_report
+
+    font_title = get_font("DejaVuSans-Bold.ttf", 72)
+    print(font_report())
+"""
+
+import os
+from pathlib import Path
+
+DEFAULT_FONT_DIRS = [
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/dejavu",
+    "/usr/share/fonts/TTF",
+    "/Library/Fonts",
+    "C:/Windows/Fonts",
+]
+
+
+class FontRegistry:
+    """Resolve font files along a search path and cache loaded fonts."""
+
+    def __init__(self, search_path: list = None):
+        self.search_path = []
+        self._paths = {}
+        self._fonts = {}
+        self.configure(search_path)
+
+    def configure(self, search_path: list = None):
+        """Replace the search path and drop everything cached so far."""
+
+        if search_path is None:
+            env_path = os.environ.get("ONE_SPARK_FONT_PATH", "")
+            search_path = [p for p in env_path.split(os.pathsep) if p] + DEFAULT_FONT_DIRS
+        self.search_path = [str(p) for p in search_path]
+        self._paths.clear()
+        self._fonts.clear()
+
+    def resolve(self, filename: str):
+        """Return the full path of a font file, or None if it can't be found."""
+
+        if filename not in self._paths:
+            resolved = None
+            if os.path.isabs(filename):
+                resolved = filename if os.path.isfile(filename) else None
+            else:
+                for directory in self.search_path:
+                    candidate = Path(directory) / filename
+                    if candidate.is_file():
+                        resolved = str(candidate)
+                        break
+            self._paths[filename] = resolved
+        return self._paths[filename]
+
+    def get(self, filename: str, size: int):
+        """Load a font once per (path, size) and return the cached instance.
+
+        Falls back to Pillow's built-in bitmap font when the file can't be
+        found or parsed; font_report() shows when that happened.
+        """
+
+        path = self.resolve(filename)
+        key = (path or filename, size)
+        if key not in self._fonts:
+            from PIL import ImageFont
+
+            font = None
+            if path is not None:
+                try:
+                    font = ImageFont.truetype(path, size)
+                except OSError:
+                    self._paths[filename] = path = None
+            if font is None:
+                font = ImageFont.load_default()
+            self._fonts[key] = font
+        return self._fonts[key]
+
+    def warm(self, specs):
+        """Preload an iterable of (filename, size) pairs."""
+
+        for filename, size in specs:
+            self.get(filename, size)
+
+    def report(self) -> dict:
+        """Map each requested font file to its resolved path, or None if it fell back."""
+
+        return dict(self._paths)
+
+
+# Shared by every renderer in the process
+registry = FontRegistry()
+
+
+def configure(search_path: list = None):
+    registry.configure(search_path)
+
+
+def get_font(filename: str, size: int):
+    return registry.get(filename, size)
+
+
+def warm_fonts(specs):
+    registry.warm(specs)
+
+
+def font_report() -> str:
+    """Human-readable summary of which fonts were actually resolved."""
+
+    lines = []
+    for filename, path in sorted(registry.report().items()):
+        if path is None:
+            lines.append(f"   ✗ {filename} → Pillow default font (not found on search path)")
+        else:
+            lines.append(f"   ✓ {filename} → {path}")
+    if not lines:
+        lines.append("   (no fonts loaded yet)")
+    return "\n".join(lines)
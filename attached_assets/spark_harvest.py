@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Pain-Point Harvester
+================================
+Crawls the web for real complaints and streams them into a PainCorpus.
+
+For every category, each SEARCH_TEMPLATES query is expanded into a
+search-results URL. The harvester follows the first few result links and
+keeps sentences that read like complaints ("broke after a week", "I wish
+it had..."). Those go into the pain-point corpus in batched
+transactions while the crawl is still running.
+
+- Pooled HTTP: keep-alive connections are reused per host. A global
+  limit and a per-host limit cap how many requests are in flight.
+- Conditional requests: pages are cached on disk along with their
+  ETag/Last-Modified, so a re-crawl sends If-None-Match /
+  If-Modified-Since. A 304 reuses the cached page.
+
+Only the standard library is used for HTTP. Blocking requests run on a
+thread pool sized to the global limit.
+
+Usage:
+    corpus = PainCorpus("pains.sqlite")
+    harvester = Harvester("https://html.duckduckgo.com/html/?q={query}", corpus)
+    stats = asyncio.run(harvester.harvest(CATEGORIES, SEARCH_TEMPLATES))
+
+    python one_spark_pro.py --harvest "https://html.duckduckgo.com/html/?q={query}" --pain-corpus pains.sqlite
+
+A local fixture site (search page + complaint pages with validators):
+    python spark_harvest.py --port 8766
+    python one_spark_pro.py --harvest "http://127.0.0.1:8766/search?q={query}" --pain-corpus pains.sqlite
+"""
+
+import re
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+import http.client
+from html import escape
+from pathlib import Path
+from contextlib import contextmanager
+from collections import Counter, defaultdict
+from html.parser import HTMLParser
+from email.utils import formatdate
+from urllib.parse import urljoin, urlsplit, quote_plus, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from spark_cache import ResponseCache
+
+DEFAULT_PAGE_CACHE_DIR = Path.home() / ".cache" / "one_spark" / "pages"
+DEFAULT_PAGE_CACHE_BYTES = 512 * 1024 ** 2  # 512 MB
+
+USER_AGENT = "OneSparkHarvester/1.0 (+pain-point research)"
+
+# Bodies beyond this are truncated (and the connection is not reused)
+MAX_PAGE_BYTES = 2 * 1024 ** 2
+
+MAX_REDIRECTS = 3
+
+_REDIRECTS = {301, 302, 303, 307, 308}
+
+COMPLAINT_PATTERN = re.compile(
+    r"\b(hate|annoy\w*|frustrat\w*|broke|breaks|broken|stopped working|useless|waste|wish"
+    r"|can't|cannot|doesn't|won't|never|overpriced|flimsy|cheap\w*|problem\w*|issue\w*"
+    r"|fail\w*|leak\w*|painful|impossible|too (?:expensive|small|big|loud|heavy|hard|complicated))\b",
+    re.IGNORECASE)
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+
+class _PageParser(HTMLParser):
+    """Visible text (block elements become line breaks) and <a href> links."""
+
+    _SKIP = {"script", "style", "noscript", "template", "svg", "head"}
+    _BLOCK = {"p", "div", "li", "br", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "section", "article", "td", "dd", "dt"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self.links = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCK:
+            self.chunks.append("\n")
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self._BLOCK:
+            self.chunks.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.chunks.append(data)
+
+
+def parse_page(url: str, html: str) -> tuple:
+    """(visible text, absolute http(s) links to other pages) of an HTML page."""
+
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+    links = []
+    for href in parser.links:
+        link = urljoin(url, href).split("#", 1)[0]
+        if urlsplit(link).scheme in ("http", "https") and link != url and link not in links:
+            links.append(link)
+    return "".join(parser.chunks), links
+
+
+def complaint_sentences(text: str, min_length: int = 25, max_length: int = 220) -> list:
+    """Sentences of a page that read like a consumer complaint."""
+
+    sentences = []
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = " ".join(sentence.split())
+        if (min_length <= len(sentence) <= max_length and len(sentence.split()) >= 5
+                and COMPLAINT_PATTERN.search(sentence)):
+            sentences.append(sentence)
+    return sentences
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class PageCache(ResponseCache):
+    """On-disk pages with their validators, in the response cache's LRU layout.
+
+    Entries never expire by age: freshness is checked by revalidating with
+    the origin server instead.
+    """
+
+    def __init__(self, directory=DEFAULT_PAGE_CACHE_DIR, max_bytes: int = DEFAULT_PAGE_CACHE_BYTES):
+        super().__init__(directory, ttl=None, max_bytes=max_bytes)
+
+    def get_page(self, url: str):
+        """{"url", "etag", "last_modified", "content_type", "text"} or None."""
+
+        entry = self._read(self._path(hashlib.sha256(url.encode("utf-8")).hexdigest()))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put_page(self, url: str, etag: str, last_modified: str, content_type: str, text: str):
+        self._write(self._path(hashlib.sha256(url.encode("utf-8")).hexdigest()), {
+            "url": url,
+            "created_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": content_type,
+            "text": text,
+        })
+
+
+class ConnectionPool:
+    """Keep-alive http.client connections, reused per (scheme, host). Thread-safe."""
+
+    def __init__(self, timeout: float = 15.0):
+        self.timeout = timeout
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _checkout(self, scheme: str, netloc: str):
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if idle:
+                return idle.pop(), True
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout), False
+
+    def _checkin(self, scheme: str, netloc: str, conn):
+        with self._lock:
+            self._idle[(scheme, netloc)].append(conn)
+
+    def get(self, url: str, headers: dict) -> tuple:
+        """GET a URL. Returns (status, lower-cased headers, body bytes)."""
+
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._checkout(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read(MAX_PAGE_BYTES + 1)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    continue  # the server dropped an idle keep-alive connection; retry on a fresh one
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            response_headers = {name.lower(): value for name, value in response.getheaders()}
+            if len(body) > MAX_PAGE_BYTES or response.will_close:
+                conn.close()
+                body = body[:MAX_PAGE_BYTES]
+            else:
+                self._checkin(parts.scheme, parts.netloc, conn)
+            return response.status, response_headers, body
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for conn in connections:
+                    conn.close()
+            self._idle.clear()
+
+
+# ============================================================================
+# HARVESTER
+# ============================================================================
+
+class Harvester:
+    """Crawl search results per (category, template) and stream complaints into a corpus."""
+
+    def __init__(self, search_url: str, corpus, cache: PageCache = None, concurrency: int = 16,
+                 per_host: int = 4, max_links: int = 5, timeout: float = 15.0, batch_size: int = 200):
+        if "{query}" not in search_url:
+            raise ValueError("search_url needs a {query} placeholder")
+        self.search_url = search_url
+        self.corpus = corpus
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.max_links = max_links
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(timeout)
+        self.stats = Counter()
+
+    async def fetch(self, url: str):
+        """(text, links) of a page, or None if it couldn't be fetched as HTML/text."""
+
+        loop = asyncio.get_running_loop()
+        for _ in range(MAX_REDIRECTS + 1):
+            cached = self.cache.get_page(url) if self.cache is not None else None
+            headers = {"User-Agent": USER_AGENT, "Accept": "text/html,text/plain;q=0.9",
+                       "Accept-Encoding": "identity"}
+            if cached is not None:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+            async with self._limit, self._host_limits[urlsplit(url).netloc]:
+                try:
+                    status, response_headers, body = await loop.run_in_executor(
+                        self._executor, self.pool.get, url, headers)
+                except (OSError, http.client.HTTPException) as e:
+                    self.stats["errors"] += 1
+                    print(f"⚠️  {url}: {e}")
+                    return None
+
+            if status == 304 and cached is not None:
+                self.stats["revalidated"] += 1
+                content_type, text = cached["content_type"], cached["text"]
+                break
+            if status in _REDIRECTS and response_headers.get("location"):
+                url = urljoin(url, response_headers["location"])
+                continue
+            if status != 200:
+                self.stats["errors"] += 1
+                return None
+
+            content_type = response_headers.get("content-type", "")
+            if not content_type.startswith(("text/html", "text/plain")):
+                self.stats["skipped"] += 1
+                return None
+            charset = re.search(r"charset=([\w-]+)", content_type)
+            try:
+                text = body.decode(charset.group(1) if charset else "utf-8", "replace")
+            except LookupError:
+                text = body.decode("utf-8", "replace")
+            self.stats["fetched"] += 1
+            self.stats["bytes"] += len(body)
+            etag, last_modified = response_headers.get("etag"), response_headers.get("last-modified")
+            if self.cache is not None and (etag or last_modified):
+                self.cache.put_page(url, etag, last_modified, content_type, text)
+            break
+        else:
+            self.stats["errors"] += 1
+            return None
+
+        if content_type.startswith("text/plain"):
+            return text, []
+        return await loop.run_in_executor(self._executor, parse_page, url, text)
+
+    async def harvest(self, categories, templates) -> Counter:
+        """Crawl every (category, template) query. Returns the run's stats."""
+
+        loop = asyncio.get_running_loop()
+        self._limit = asyncio.Semaphore(self.concurrency)
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        writer_executor = ThreadPoolExecutor(max_workers=1)  # one corpus connection, one writer
+        entries = asyncio.Queue(maxsize=self.batch_size * 4)
+        seen = set()
+
+        async def crawl(category: str, template: str):
+            query = template.format(category=category)
+            results = await self.fetch(self.search_url.format(query=quote_plus(query)))
+            if results is None:
+                return
+            links = [link for link in results[1] if link not in seen][:self.max_links]
+            seen.update(links)
+            pages = await asyncio.gather(*(self.fetch(link) for link in links))
+            for link, page in zip(links, pages):
+                if page is None:
+                    continue
+                for sentence in complaint_sentences(page[0]):
+                    self.stats["sentences"] += 1
+                    await entries.put({"category": category, "pain": sentence,
+                                       "source": urlsplit(link).netloc})
+
+        async def write():
+            batch = []
+            while True:
+                entry = await entries.get()
+                if entry is not None:
+                    batch.append(entry)
+                if batch and (entry is None or len(batch) >= self.batch_size):
+                    self.stats["added"] += await loop.run_in_executor(writer_executor, self.corpus.add_many, batch)
+                    batch = []
+                if entry is None:
+                    return
+
+        writer = asyncio.ensure_future(write())
+        try:
+            await asyncio.gather(*(crawl(category, template)
+                                   for category in categories for template in templates))
+        finally:
+            await entries.put(None)
+            await writer
+            self._executor.shutdown()
+            writer_executor.shutdown()
+            self.pool.close()
+        return self.stats
+
+
+# ============================================================================
+# FIXTURE SITE
+# ============================================================================
+
+_QUERY_NOISE = {"problems", "reddit", "complaints", "amazon", "reviews", "frustrating", "issues",
+                "why", "do", "suck", "wish", "it", "had"}
+
+_FIXTURE_COMPLAINTS = [
+    "I hate how my {topic} broke after two weeks of normal use.",
+    "Every {topic} I have tried is overpriced for what you get.",
+    "The cheap plastic on most {topic} feels flimsy and cracks in the cold.",
+    "I wish {topic} came with replacement parts instead of being thrown away.",
+    "Cleaning {topic} is so frustrating that I stopped using them.",
+    "The app for my {topic} never connects on the first try.",
+    "Instructions for {topic} are useless and the pictures don't match the parts.",
+    "My {topic} started to leak after the first month.",
+]
+
+_FIXTURE_FILLER = [
+    "We tested a dozen models over the summer.",
+    "Prices below were checked last week.",
+    "Thanks for reading and see you next time.",
+]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Search page at /search?q=..., complaint pages at /page/<n>?q=...
+
+    Page numbers in the server's broken_pages answer 500. Bumping its
+    revision changes every page (and so its ETag and Last-Modified).
+    """
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1  # send headers and body in one write (avoids delayed-ACK stalls on keep-alive)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.in_flight():
+            self._get()
+
+    def _get(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query).get("q", [""])[0]
+        topic = " ".join(word for word in query.split() if word.lower() not in _QUERY_NOISE) or "gadgets"
+        if parts.path == "/search":
+            items = "".join(f'<li><a href="/page/{i}?q={quote_plus(query)}">Result {i} for {escape(query)}</a></li>'
+                            for i in range(self.server.links_per_query))
+            body = f"<html><body><h1>Results</h1><ul>{items}</ul><a href=\"#top\">top</a></body></html>"
+        elif parts.path.startswith("/page/"):
+            n = int(parts.path.rsplit("/", 1)[-1] or 0)
+            if n in self.server.broken_pages:
+                self.server.count("broken")
+                self._send(500, b"internal error", {"Content-Type": "text/plain"})
+                return
+            picked = [_FIXTURE_COMPLAINTS[(n + i) % len(_FIXTURE_COMPLAINTS)] for i in range(3)]
+            paragraphs = "".join(f"<p>{escape(s.format(topic=topic))} {escape(_FIXTURE_FILLER[i])}</p>"
+                                 for i, s in enumerate(picked))
+            body = (f"<html><head><title>{escape(topic)}</title><script>var broken = 'never';</script></head>"
+                    f"<body><h1>What people say about {escape(topic)}</h1>{paragraphs}"
+                    f"<p>Revision {self.server.revision}.</p></body></html>")
+        else:
+            self._send(404, b"not found", {"Content-Type": "text/plain"})
+            return
+
+        payload = body.encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(payload).hexdigest()[:16] if self.server.etags else None
+        validators = {"Last-Modified": self.server.last_modified}
+        if etag:
+            validators["ETag"] = etag
+        self.server.count(parts.path.split("/")[1])
+        if (etag and self.headers.get("If-None-Match") == etag) or (
+                "If-None-Match" not in self.headers
+                and self.headers.get("If-Modified-Since") == self.server.last_modified):
+            self.server.count("not_modified")
+            self._send(304, b"", validators)
+            return
+        self._send(200, payload, dict(validators, **{"Content-Type": "text/html; charset=utf-8"}))
+
+    def _send(self, status: int, payload: bytes, headers: dict):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(payload)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, links_per_query: int = 3, delay: float = 0.0, broken_pages=(),
+                 etags: bool = True):
+        super().__init__(address, FixtureHandler)
+        self.links_per_query = links_per_query
+        self.delay = delay
+        self.broken_pages = set(broken_pages)
+        self.etags = etags  # False: Last-Modified is the only validator
+        self.revision = 0
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.requests = Counter()
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    @contextmanager
+    def in_flight(self):
+        """Track concurrent requests (peak), holding each one for delay seconds."""
+
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def bump_revision(self):
+        """Change every page, as if the site had been edited a second later."""
+
+        self.revision += 1
+        self.last_modified = formatdate(time.time() + self.revision, usegmt=True)
+
+    def handle_error(self, request, client_address):
+        pass  # clients hanging up mid-response are expected
+
+    @property
+    def search_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/search?q={{query}}"
+
+
+def start_fixture_server(host: str = "127.0.0.1", port: int = 0, **kwargs) -> FixtureServer:
+    """Start the fixture site on a background thread. port=0 picks a free port."""
+
+    server = FixtureServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fixture site for the pain-point harvester")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--links", type=int, default=3, help="Result links per search page")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds each response takes")
+    parser.add_argument("--broken", type=int, nargs="*", default=[], metavar="N", help="Page numbers that answer 500")
+    args = parser.parse_args()
+
+    server = FixtureServer((args.host, args.port), links_per_query=args.links, delay=args.delay,
+                           broken_pages=args.broken)
+    print(f"🧪 Fixture site listening; search URL: {server.search_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
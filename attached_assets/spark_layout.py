@@ -0,0 +1,207 @@
+"""
+ONE SPARK - Card Layout Engine
+==============================
+Lays text out by rendered pixel width instead of character count. The
+whole card is computed before anything is drawn.
+
+TextMeasurer measures with the actual loaded font. Word and glyph widths
+are cached per font, so a batch soon measures almost everything from
+the cache. A line's width is the sum of its word widths plus its spaces.
+
+Layout functions append drawing ops to a CardLayout:
+- text, a rectangle or a line
+- positions in pixels, colors as hex strings
+- fonts as (file, size) specs
+
+Text that doesn't fit its box is shrunk step by step down to a minimum
+size, then truncated with an ellipsis where truncation is allowed.
+Anything that still doesn't fit is recorded in layout.overflow, and
+renderers refuse to produce such a card (CardOverflowError).
+draw_layout() replays the ops onto a Pillow image.
+
+Usage:
+    layout = CardLayout(1080, 1920)
+    spec, text = layout.fit_line("ProductName", ("DejaVuSans-Bold.ttf", 72), 960, min_size=40, field="name")
+    layout.text((60, 195), text, spec, "#ffffff")
+    if layout.overflow:
+        raise CardOverflowError(layout.overflow)
+    draw_layout(ImageDraw.Draw(img), layout)
+"""
+
+from spark_fonts import get_font
+
+ELLIPSIS = "…"
+
+
+class CardOverflowError(ValueError):
+    """A card's content doesn't fit even at the minimum text sizes."""
+
+    def __init__(self, problems: list):
+        super().__init__(list(problems))
+        self.problems = list(problems)
+
+    def __str__(self) -> str:
+        return "; ".join(self.problems)
+
+
+class TextMeasurer:
+    """Rendered text widths, memoized per font for words and single glyphs."""
+
+    def __init__(self):
+        self._words = {}    # font -> {word: width}
+        self._glyphs = {}   # font -> {char: width}
+
+    def word_width(self, spec: tuple, word: str) -> float:
+        font = get_font(*spec)
+        widths = self._words.get(font)
+        if widths is None:
+            widths = self._words[font] = {}
+        width = widths.get(word)
+        if width is None:
+            width = widths[word] = font.getlength(word)
+        return width
+
+    def glyph_width(self, spec: tuple, char: str) -> float:
+        font = get_font(*spec)
+        widths = self._glyphs.get(font)
+        if widths is None:
+            widths = self._glyphs[font] = {}
+        width = widths.get(char)
+        if width is None:
+            width = widths[char] = font.getlength(char)
+        return width
+
+    def line_width(self, spec: tuple, text: str) -> float:
+        words = text.split(" ")
+        return sum(self.word_width(spec, word) for word in words) + self.glyph_width(spec, " ") * (len(words) - 1)
+
+    def truncate(self, spec: tuple, text: str, max_width: float) -> str:
+        """The longest prefix of text that fits max_width with an ellipsis appended."""
+
+        budget = max_width - self.glyph_width(spec, ELLIPSIS)
+        width = 0.0
+        for i, char in enumerate(text):
+            width += self.glyph_width(spec, char)
+            if width > budget:
+                return text[:i].rstrip() + ELLIPSIS
+        return text
+
+    def wrap(self, spec: tuple, text: str, max_width: float) -> list:
+        """Greedy word wrap by pixel width. Words wider than a line are split by glyph."""
+
+        space = self.glyph_width(spec, " ")
+        lines, line, width = [], [], 0.0
+        for word in text.split():
+            word_width = self.word_width(spec, word)
+            if word_width > max_width:
+                if line:
+                    lines.append(" ".join(line))
+                    line, width = [], 0.0
+                pieces = self._split_word(spec, word, max_width)
+                lines.extend(pieces[:-1])
+                word = pieces[-1]
+                word_width = self.word_width(spec, word)
+            needed = word_width if not line else width + space + word_width
+            if line and needed > max_width:
+                lines.append(" ".join(line))
+                line, width = [word], word_width
+            else:
+                line.append(word)
+                width = needed
+        if line:
+            lines.append(" ".join(line))
+        return lines
+
+    def _split_word(self, spec: tuple, word: str, max_width: float) -> list:
+        pieces, start, width = [], 0, 0.0
+        for i, char in enumerate(word):
+            char_width = self.glyph_width(spec, char)
+            if width + char_width > max_width and i > start:
+                pieces.append(word[start:i])
+                start, width = i, 0.0
+            width += char_width
+        pieces.append(word[start:])
+        return pieces
+
+
+# One cache per process, shared by every card it renders
+measurer = TextMeasurer()
+
+
+class CardLayout:
+    """Drawing ops for one card, plus what had to be truncated or didn't fit."""
+
+    def __init__(self, width: int, height: int, measurer: TextMeasurer = measurer):
+        self.width = width
+        self.height = height
+        self.measurer = measurer
+        self.ops = []
+        self.truncated = []
+        self.overflow = []
+
+    def text(self, xy: tuple, text: str, spec: tuple, fill: str):
+        self.ops.append(("text", xy, text, spec, fill))
+
+    def rect(self, box: list, fill: str = None, outline: str = None, width: int = 1):
+        self.ops.append(("rect", box, fill, outline, width))
+
+    def line(self, points: list, fill: str, width: int = 1):
+        self.ops.append(("line", points, fill, width))
+
+    def fit_line(self, text: str, spec: tuple, max_width: float, min_size: int = None,
+                 field: str = "text", truncate: bool = True, step: int = 2) -> tuple:
+        """Shrink (down to min_size), then truncate, a single line. Returns (spec, text)."""
+
+        filename, size = spec
+        min_size = min_size or size
+        while self.measurer.line_width((filename, size), text) > max_width and size - step >= min_size:
+            size -= step
+        spec = (filename, size)
+        if self.measurer.line_width(spec, text) <= max_width:
+            return spec, text
+        if truncate:
+            self.truncated.append(field)
+            return spec, self.measurer.truncate(spec, text, max_width)
+        self.overflow.append(f"{field} is wider than {max_width:.0f}px even at {size}px")
+        return spec, text
+
+    def fit_block(self, text: str, spec: tuple, max_width: float, max_lines: int = None,
+                  min_size: int = None, field: str = "text", step: int = 2) -> tuple:
+        """Wrap text, shrinking until it fits max_lines. Returns (spec, lines).
+
+        The last line is truncated if the text still needs more lines at min_size.
+        """
+
+        filename, size = spec
+        min_size = min_size or size
+        while True:
+            lines = self.measurer.wrap((filename, size), text, max_width)
+            if max_lines is None or len(lines) <= max_lines or size - step < min_size:
+                break
+            size -= step
+        spec = (filename, size)
+        if max_lines is not None and len(lines) > max_lines:
+            self.truncated.append(field)
+            rest = " ".join(lines[max_lines - 1:])
+            lines = lines[:max_lines - 1] + [self.measurer.truncate(spec, rest, max_width)]
+        return spec, lines
+
+    def check_bottom(self, bottom: float, limit: float, what: str = "content"):
+        if bottom > limit:
+            self.overflow.append(f"{what} ends at y={bottom:.0f}, past the limit of {limit:.0f}")
+
+
+def draw_layout(draw, layout: CardLayout):
+    """Replay a layout's ops onto a Pillow ImageDraw."""
+
+    for op in layout.ops:
+        kind = op[0]
+        if kind == "text":
+            _, xy, text, spec, fill = op
+            draw.text(xy, text, font=get_font(*spec), fill=fill)
+        elif kind == "rect":
+            _, box, fill, outline, width = op
+            draw.rectangle(box, fill=fill, outline=outline, width=width)
+        elif kind == "line":
+            _, points, fill, width = op
+            draw.line(points, fill=fill, width=width)
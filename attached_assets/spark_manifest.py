@@ -0,0 +1,98 @@
+"""
+ONE SPARK - Render Manifest
+===========================
+Remembers what every card in an output directory was rendered from, so
+a re-render only redoes the cards whose inputs changed, Make-style.
+
+The manifest is <dir>/.spark_manifest.json. It maps each spark record's
+file name to the key of the card last rendered from it:
+
+    {"concept": <hash of concept + category>,
+     "style":   <hash of theme colors, fonts and font sizes>,
+     "renderer": <renderer version>, "size": [w, h], "output": <format/preset>}
+
+and to the record's mtime and size when it was hashed. A record that
+hasn't been touched since is not even opened again, so a no-op rebuild
+is one stat() per record and per card.
+
+Usage:
+    manifest = RenderManifest(output_dir)
+    key = {"concept": content_hash(record["concept"]), ...}
+    if manifest.is_current(json_path, card_path, key): skip
+    manifest.record(json_path, card_path, key); manifest.save()
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+MANIFEST_NAME = ".spark_manifest.json"
+
+
+def content_hash(value) -> str:
+    """Stable short hash of any JSON-serializable value."""
+
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def _stamp(path: Path) -> list:
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class RenderManifest:
+    """Card render keys for one output directory, saved atomically as JSON."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_NAME
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+
+    def cached_hash(self, json_path: Path):
+        """The concept hash stored for a record file, if the file hasn't changed since."""
+
+        entry = self.entries.get(json_path.name)
+        if entry is None:
+            return None
+        try:
+            if _stamp(json_path) != entry["stamp"]:
+                return None
+        except OSError:
+            return None
+        return entry["key"]["concept"]
+
+    def is_current(self, json_path: Path, card_path: Path, key: dict) -> bool:
+        """True if card_path was rendered from exactly this key and is still there.
+
+        A record that overflowed under this key (card None) stays current:
+        rendering it again would overflow again.
+        """
+
+        entry = self.entries.get(json_path.name)
+        if entry is None or entry["key"] != key:
+            return False
+        return entry["card"] is None or (entry["card"] == card_path.name and card_path.exists())
+
+    def record(self, json_path: Path, card_path, key: dict):
+        """Note that json_path was rendered to card_path (None: overflowed) under key."""
+
+        self.entries[json_path.name] = {"key": key, "card": card_path and Path(card_path).name,
+                                        "stamp": _stamp(json_path)}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.entries, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
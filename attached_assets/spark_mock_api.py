@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Mock Claude API
+===========================
+A tiny local stand-in for the Anthropic Messages API, for exercising the
+spark pipeline without an API key or network access.
+
+It answers POST /v1/messages with a well-formed concept JSON for the
+category named in the prompt. Latency, occasional stalls and 429/5xx
+errors can be injected to test retries and hedging, either at random
+(error_rate, stall_rate) or for the next N requests (fail_next,
+stall_next). Error messages carry the request number.
+
+Requests with "stream": true get a server-sent event stream, cut into
+small text deltas. With --garbage-rate, some answers start with chatty
+prose instead of JSON, to exercise early aborts.
+
+It also fakes the Message Batches endpoints (create, retrieve, results).
+A batch reports "in_progress" for --batch-delay seconds and then "ended".
+
+Usage:
+    python spark_mock_api.py --port 8765 --latency 0.5 --error-rate 0.1
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=test python one_spark_pro.py
+
+Or in-process:
+    server = start_mock_server(latency=0.2)
+    ...  # base_url = server.base_url
+    server.shutdown()
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_concept(category: str, seed: str) -> dict:
+    """Deterministic placeholder concept for a category."""
+
+    digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()
+    word = category.split()[0].capitalize() if category else "Mock"
+    return {
+        "name": f"{word}{digest[:4].upper()}",
+        "tagline": f"The {category} upgrade nobody asked for",
+        "pain_solved": f"Everything about {category}",
+        "description": f"A mock product for {category}. It exists so the pipeline can run offline. Reference {digest[:12]}.",
+        "features": ["Offline", "Deterministic", "Free", "Fast"],
+        "price_point": f"${int(digest[:2], 16) + 10}",
+        "vibe": "Test fixture meets product launch",
+    }
+
+
+def _prompt_text(request: dict) -> str:
+    parts = []
+    for message in request.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+    return "\n".join(parts)
+
+
+def _cached_prefix_text(request: dict) -> str:
+    """Text of the system blocks up to the last cache_control breakpoint."""
+
+    system = request.get("system")
+    if not isinstance(system, list):
+        return ""
+    cached = ""
+    text = ""
+    for block in system:
+        text += block.get("text", "")
+        if block.get("cache_control"):
+            cached = text
+    return cached
+
+
+def message_response(request: dict, prompt_cache: set = None) -> dict:
+    """Build a Messages API response body for a request body.
+
+    With a prompt_cache set, a cache_control prefix counts as a cache write
+    the first time it is seen and as a cache read afterwards.
+    """
+
+    prompt = _prompt_text(request)
+    match = re.search(r'for the "([^"]+)" category', prompt)
+    category = match.group(1) if match else "mock"
+    text = json.dumps(fake_concept(category, prompt), indent=2)
+
+    prefix = _cached_prefix_text(request)
+    prefix_tokens = len(prefix) // 4
+    cache_write = cache_read = 0
+    if prefix and prompt_cache is not None:
+        if prefix in prompt_cache:
+            cache_read = prefix_tokens
+        else:
+            prompt_cache.add(prefix)
+            cache_write = prefix_tokens
+    uncached_prefix = prefix_tokens if not (cache_read or cache_write) else 0
+    return {
+        "id": "msg_mock_" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:24],
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "mock"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": max(1, len(prompt) // 4) + uncached_prefix,
+            "output_tokens": max(1, len(text) // 4),
+            "cache_creation_input_tokens": cache_write,
+            "cache_read_input_tokens": cache_read,
+        },
+    }
+
+
+class MockState:
+    """Behaviour knobs and counters shared by all request handlers."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 stall_rate: float = 0.0, stall_seconds: float = 5.0, batch_delay: float = 0.0,
+                 garbage_rate: float = 0.0, chunk_size: int = 16, seed: int = None,
+                 retry_after: float = 0.0, fail_next: int = 0, stall_next: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.batch_delay = batch_delay
+        self.garbage_rate = garbage_rate
+        self.chunk_size = chunk_size
+        self.retry_after = retry_after
+        self.fail_next = fail_next    # the next N message requests fail with a 429
+        self.stall_next = stall_next  # the next N message requests stall for stall_seconds
+        self.batches = {}
+        self.prompt_cache = set()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.random.random()
+
+    def take(self, counter: str) -> bool:
+        """Use up one of the fail_next / stall_next requests, if any are left."""
+
+        with self.lock:
+            if getattr(self, counter) <= 0:
+                return False
+            setattr(self, counter, getattr(self, counter) - 1)
+            return True
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    routes = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, error_type: str, message: str, headers: dict = None):
+        self._send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _dispatch(self, method: str):
+        state = self.server.state
+        with state.lock:
+            state.requests += 1
+            self.number = state.requests
+        for (route_method, pattern), handler in self.routes.items():
+            match = re.fullmatch(pattern, self.path.split("?")[0])
+            if route_method == method and match:
+                return handler(self, *match.groups())
+        self._send_error(404, "not_found_error", f"No route for {method} {self.path}")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def handle_messages(self):
+        state = self.server.state
+        request = self._read_json()
+
+        delay = state.latency + state.jitter * state.roll()
+        if state.take("stall_next") or (state.stall_rate and state.roll() < state.stall_rate):
+            delay += state.stall_seconds
+        time.sleep(delay)
+
+        forced = state.take("fail_next")
+        if forced or (state.error_rate and state.roll() < state.error_rate):
+            with state.lock:
+                state.errors += 1
+            if forced or state.roll() < 0.5:
+                return self._send_error(429, "rate_limit_error", f"Mock rate limit (request {self.number})",
+                                        {"retry-after": str(state.retry_after)})
+            return self._send_error(529, "overloaded_error", f"Mock overload (request {self.number})")
+
+        with state.lock:
+            body = message_response(request, state.prompt_cache)
+        if state.garbage_rate and state.roll() < state.garbage_rate:
+            body["content"][0]["text"] = "Sure! Here's a concept I think you'll love:\n\n" + body["content"][0]["text"]
+        if request.get("stream"):
+            return self._send_stream(body)
+        self._send_json(200, body)
+
+    def _send_stream(self, body: dict):
+        """Replay a finished message body as a Messages API event stream."""
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name: str, data: dict):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        text = body["content"][0]["text"]
+        start = dict(body, content=[], stop_reason=None, usage=dict(body["usage"], output_tokens=1))
+        event("message_start", {"type": "message_start", "message": start})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+        size = max(1, self.server.state.chunk_size)
+        for i in range(0, len(text), size):
+            event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": text[i:i + size]}})
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": body["usage"]["output_tokens"]}})
+        event("message_stop", {"type": "message_stop"})
+
+    def _batch_body(self, batch_id: str) -> dict:
+        batch = self.server.state.batches[batch_id]
+        ended = time.time() - batch["created"] >= self.server.state.batch_delay
+        count = len(batch["requests"])
+        created_at = datetime.fromtimestamp(batch["created"], timezone.utc)
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": created_at.isoformat(),
+            "expires_at": (created_at + timedelta(days=1)).isoformat(),
+            "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.server.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def handle_batch_create(self):
+        state = self.server.state
+        request = self._read_json()
+        with state.lock:
+            batch_id = f"msgbatch_mock_{len(state.batches) + 1:06d}"
+            state.batches[batch_id] = {"created": time.time(), "requests": request.get("requests", [])}
+        self._send_json(200, self._batch_body(batch_id))
+
+    def handle_batch_retrieve(self, batch_id: str):
+        if batch_id not in self.server.state.batches:
+            return self._send_error(404, "not_found_error", f"No batch {batch_id}")
+        self._send_json(200, self._batch_body(batch_id))
+
+    def handle_batch_results(self, batch_id: str):
+        if batch_id not in self.server.state.batches:
+            return self._send_error(404, "not_found_error", f"No batch {batch_id}")
+        lines = []
+        for entry in self.server.state.batches[batch_id]["requests"]:
+            with self.server.state.lock:
+                message = message_response(entry.get("params", {}), self.server.state.prompt_cache)
+            result = {"type": "succeeded", "message": message}
+            lines.append(json.dumps({"custom_id": entry["custom_id"], "result": result}))
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+MockHandler.routes[("POST", r"/v1/messages")] = MockHandler.handle_messages
+MockHandler.routes[("POST", r"/v1/messages/batches")] = MockHandler.handle_batch_create
+MockHandler.routes[("GET", r"/v1/messages/batches/([^/]+)")] = MockHandler.handle_batch_retrieve
+MockHandler.routes[("GET", r"/v1/messages/batches/([^/]+)/results")] = MockHandler.handle_batch_results
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state: MockState):
+        super().__init__(address, MockHandler)
+        self.state = state
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on hedged or timed-out requests all the time
+        pass
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **state_kwargs) -> MockServer:
+    """Start a mock server on a background thread. port=0 picks a free port."""
+
+    server = MockServer((host, port), MockState(**state_kwargs))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Claude Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Base seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 429/529 responses")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of responses that stall")
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="Fraction of answers that are not pure JSON")
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="Seconds before a message batch ends")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="retry-after seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = MockServer((args.host, args.port), MockState(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, batch_delay=args.batch_delay,
+        garbage_rate=args.garbage_rate, retry_after=args.retry_after,
+    ))
+    print(f"🧪 Mock Claude API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Distributed Work Queue
+==================================
+A run plan shared by several machines: a coordinator writes one item per
+spark (category + pain points) into a SQLite queue in a shared directory,
+and workers on any node claim items under time-limited leases.
+
+- Planning happens once, up front, so nodes never pick the same category
+  and pain subset twice.
+- A claimed item carries a lease token. Only the holder of the current
+  token can complete or release it, so a worker that stalled past its
+  lease can't overwrite the item's retry.
+- A lease that runs out (the worker crashed or hung) makes the item
+  claimable again. Each claim counts as an attempt; after max_attempts
+  the item is failed instead.
+- Workers write their sparks under results/<job_id>/<worker>/, so file
+  names never clash between nodes. The coordinator merges the completed
+  items into one output set and marks them merged, so a merge can be re-run.
+
+Layout of a queue directory:
+    queue.sqlite                      jobs and items
+    results/<job_id>/<worker>/        each worker's spark records and cards
+
+The database uses SQLite's default rollback journal rather than WAL,
+which needs shared memory and doesn't work over network filesystems.
+Leases are wall-clock deadlines, so node clocks should be kept in sync
+(NTP); keep leases much longer than any clock skew.
+
+Usage:
+    queue = WorkQueue("/shared/spark_queue")
+    job_id = queue.create_job([{"category": ..., "pain_points": [...]}, ...], max_attempts=3)
+    item = queue.claim(job_id, "node-a-1234", lease_seconds=300)
+    queue.complete(job_id, item, {"record": "results/.../spark_x.json"})   # or release(job_id, item, error)
+
+    python spark_queue.py /shared/spark_queue status [--job JOB_ID]
+"""
+
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id       TEXT PRIMARY KEY,
+    created_at   REAL NOT NULL,
+    max_attempts INTEGER NOT NULL,
+    settings     TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id      TEXT NOT NULL,
+    item_id     INTEGER NOT NULL,
+    category    TEXT NOT NULL,
+    pain_points TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    worker      TEXT,
+    token       TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    merged      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (job_id, status, item_id);
+"""
+
+STATUSES = ("pending", "leased", "done", "failed")
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _safe(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+class WorkQueue:
+    """Jobs of spark items in a shared SQLite file, claimed by workers under leases."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / "queue.sqlite"
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn) in one IMMEDIATE transaction, so claims never race."""
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def results_dir(self, job_id: str, worker: str) -> Path:
+        path = self.directory / "results" / job_id / _safe(worker)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    # -- coordinator -------------------------------------------------------
+
+    def create_job(self, items: list, max_attempts: int = DEFAULT_MAX_ATTEMPTS, settings: dict = None) -> str:
+        """Queue one item per {"category", "pain_points"} dict. Returns the new job id."""
+
+        def create(conn):
+            job_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            suffix = 2
+            while conn.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone():
+                job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix}"
+                suffix += 1
+            conn.execute("INSERT INTO jobs (job_id, created_at, max_attempts, settings) VALUES (?, ?, ?, ?)",
+                         (job_id, time.time(), max_attempts, json.dumps(settings or {})))
+            conn.executemany("INSERT INTO items (job_id, item_id, category, pain_points) VALUES (?, ?, ?, ?)",
+                             ((job_id, i, item["category"], json.dumps(item["pain_points"]))
+                              for i, item in enumerate(items)))
+            return job_id
+
+        return self._write(create)
+
+    def settings(self, job_id: str) -> dict:
+        row = self._connect().execute("SELECT settings FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no job {job_id!r} in {self.db_path}")
+        return json.loads(row[0])
+
+    def open_job(self):
+        """The newest job that still has unfinished items, or None."""
+
+        row = self._connect().execute(
+            "SELECT jobs.job_id FROM jobs WHERE EXISTS (SELECT 1 FROM items WHERE items.job_id = jobs.job_id "
+            "AND status IN ('pending', 'leased')) ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def reap(self, job_id: str) -> int:
+        """Fail items whose lease ran out on their last allowed attempt. Returns how many."""
+
+        def reap(conn):
+            return conn.execute(
+                "UPDATE items SET status = 'failed', token = NULL, "
+                "error = COALESCE(error, 'lease expired on the last attempt') "
+                "WHERE job_id = ? AND status = 'leased' AND lease_until < ? "
+                "AND attempts >= (SELECT max_attempts FROM jobs WHERE job_id = ?)",
+                (job_id, time.time(), job_id)).rowcount
+
+        return self._write(reap)
+
+    def progress(self, job_id: str) -> dict:
+        """Item counts by status; "expired" counts leased items whose lease has run out."""
+
+        conn = self._connect()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(conn.execute("SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status",
+                                   (job_id,)).fetchall())
+        counts["expired"] = conn.execute(
+            "SELECT COUNT(*) FROM items WHERE job_id = ? AND status = 'leased' AND lease_until < ?",
+            (job_id, time.time())).fetchone()[0]
+        counts["retried"] = conn.execute(
+            "SELECT COUNT(*) FROM items WHERE job_id = ? AND attempts > 1", (job_id,)).fetchone()[0]
+        return counts
+
+    def unmerged(self, job_id: str) -> list:
+        """[(item_id, result dict)] for completed items not merged yet, in plan order."""
+
+        rows = self._connect().execute(
+            "SELECT item_id, result FROM items WHERE job_id = ? AND status = 'done' AND merged = 0 "
+            "ORDER BY item_id", (job_id,)).fetchall()
+        return [(item_id, json.loads(result)) for item_id, result in rows]
+
+    def mark_merged(self, job_id: str, item_ids: list):
+        self._write(lambda conn: conn.executemany(
+            "UPDATE items SET merged = 1 WHERE job_id = ? AND item_id = ?",
+            ((job_id, item_id) for item_id in item_ids)))
+
+    def failures(self, job_id: str) -> list:
+        """[(item_id, category, attempts, error)] for failed items."""
+
+        return self._connect().execute(
+            "SELECT item_id, category, attempts, error FROM items WHERE job_id = ? AND status = 'failed' "
+            "ORDER BY item_id", (job_id,)).fetchall()
+
+    # -- workers -----------------------------------------------------------
+
+    def claim(self, job_id: str, worker: str, lease_seconds: float = 300.0):
+        """Lease the next pending (or abandoned) item. Returns it as a dict, or None.
+
+        The dict holds item_id, category, pain_points, attempt and the
+        lease token that complete() and release() need.
+        """
+
+        def claim(conn):
+            now = time.time()
+            max_attempts = conn.execute("SELECT max_attempts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if max_attempts is None:
+                raise KeyError(f"no job {job_id!r} in {self.db_path}")
+            row = conn.execute(
+                "SELECT item_id, category, pain_points, attempts, status FROM items "
+                "WHERE job_id = ? AND attempts < ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_until < ?)) "
+                "ORDER BY item_id LIMIT 1", (job_id, max_attempts[0], now)).fetchone()
+            if row is None:
+                return None
+            item_id, category, pain_points, attempts, status = row
+            token = uuid.uuid4().hex
+            conn.execute("UPDATE items SET status = 'leased', worker = ?, token = ?, lease_until = ?, "
+                         "attempts = attempts + 1 WHERE job_id = ? AND item_id = ?",
+                         (worker, token, now + lease_seconds, job_id, item_id))
+            return {"item_id": item_id, "category": category, "pain_points": json.loads(pain_points),
+                    "attempt": attempts + 1, "token": token, "reclaimed": status == "leased"}
+
+        return self._write(claim)
+
+    def extend(self, job_id: str, item: dict, lease_seconds: float) -> bool:
+        """Push an item's lease out again. False if the lease has been lost."""
+
+        return self._write(lambda conn: conn.execute(
+            "UPDATE items SET lease_until = ? WHERE job_id = ? AND item_id = ? AND token = ? AND status = 'leased'",
+            (time.time() + lease_seconds, job_id, item["item_id"], item["token"])).rowcount == 1)
+
+    def complete(self, job_id: str, item: dict, result: dict) -> bool:
+        """Record an item's result. False if the lease was lost and the result discarded."""
+
+        return self._write(lambda conn: conn.execute(
+            "UPDATE items SET status = 'done', result = ?, token = NULL, lease_until = NULL, error = NULL "
+            "WHERE job_id = ? AND item_id = ? AND token = ? AND status = 'leased'",
+            (json.dumps(result), job_id, item["item_id"], item["token"])).rowcount == 1)
+
+    def release(self, job_id: str, item: dict, error: str) -> bool:
+        """Give an item back after a failed attempt: pending again, or failed on its last attempt."""
+
+        return self._write(lambda conn: conn.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= (SELECT max_attempts FROM jobs WHERE job_id = ?) "
+            "THEN 'failed' ELSE 'pending' END, error = ?, token = NULL, lease_until = NULL "
+            "WHERE job_id = ? AND item_id = ? AND token = ? AND status = 'leased'",
+            (job_id, error, job_id, item["item_id"], item["token"])).rowcount == 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a distributed spark work queue")
+    parser.add_argument("directory", help="Shared queue directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    status_cmd = commands.add_parser("status", help="Show a job's progress and failed items")
+    status_cmd.add_argument("--job", default=None, help="Job id (default: the newest unfinished job)")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.directory)
+    job_id = args.job or queue.open_job()
+    if job_id is None:
+        print("📭 No unfinished jobs")
+    else:
+        counts = queue.progress(job_id)
+        print(f"📮 Job {job_id}: " + ", ".join(f"{counts[status]} {status}" for status in STATUSES)
+              + f" ({counts['expired']} leases expired, {counts['retried']} items retried)")
+        for item_id, category, attempts, error in queue.failures(job_id):
+            print(f"   ⚠️  item {item_id} ({category}) failed after {attempts} attempts: {error}")
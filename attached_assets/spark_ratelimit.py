@@ -0,0 +1,188 @@
+"""
+ONE SPARK - Shared Rate Limiter
+===============================
+Token buckets in SQLite, shared by every thread and process on the host.
+
+Use one limiter file for all workers. They then share the same requests-
+per-minute, input-tokens-per-minute and output-tokens-per-minute budget.
+Workers wait for budget instead of firing requests that come back as
+429s. Each bucket refills continuously at limit/60 per second and holds
+at most one minute's worth.
+
+Output tokens are unknown until the response arrives, so acquire()
+reserves max_tokens up front. settle() then returns the unused part once
+the real usage is known. A 429 from the API calls pause(), which stops
+every worker on the host until retry-after has passed.
+
+A limiter only sets the buckets it was given limits for. Buckets other
+workers configured stay in force, so a worker started without limits
+still waits its turn. To drop a limit, delete the limiter file.
+
+Usage:
+    limiter = RateLimiter("~/.cache/one_spark/ratelimit.sqlite", rpm=50, input_tpm=40000, output_tpm=8000)
+    reservation = limiter.acquire(input_tokens=900, output_tokens=1024)
+    ...  # call the API
+    limiter.settle(reservation, input_tokens=870, output_tokens=310)
+"""
+
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_LIMITER_PATH = Path.home() / ".cache" / "one_spark" / "ratelimit.sqlite"
+
+# Never sleep longer than this between attempts, so pauses and config
+# changes from other processes are picked up promptly
+MAX_WAIT_STEP = 5.0
+
+
+def estimate_input_tokens(request: dict) -> int:
+    """Rough input token count of messages.create parameters (~4 chars per token)."""
+
+    chars = 0
+    system = request.get("system", "")
+    if isinstance(system, str):
+        chars += len(system)
+    else:
+        chars += sum(len(block.get("text", "")) for block in system)
+    for message in request.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(block.get("text", "")) for block in content if isinstance(block, dict))
+    return max(1, chars // 4)
+
+
+class RateLimiter:
+    """Cross-process token buckets for requests, input tokens and output tokens."""
+
+    def __init__(self, path=DEFAULT_LIMITER_PATH, rpm: float = None,
+                 input_tpm: float = None, output_tpm: float = None):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.limits = {"requests": rpm, "input_tokens": input_tpm, "output_tokens": output_tpm}
+        self.waited = 0.0
+        self._local = threading.local()
+        self._configure()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _configure(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY, tokens REAL, capacity REAL, rate REAL, updated REAL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS pauses (
+                id INTEGER PRIMARY KEY CHECK (id = 1), until REAL)""")
+            now = time.time()
+            for name, limit in self.limits.items():
+                if limit is None:
+                    continue  # other workers on the host may still be limiting it
+                # Keep the current fill level if the bucket exists; adopt the new limit
+                conn.execute("""INSERT INTO buckets (name, tokens, capacity, rate, updated)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        tokens = MIN(tokens, excluded.capacity),
+                        capacity = excluded.capacity, rate = excluded.rate""",
+                             (name, float(limit), float(limit), limit / 60.0, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def try_acquire(self, requests: int = 1, input_tokens: int = 0, output_tokens: int = 0) -> float:
+        """Take the amounts if every bucket has them. Returns 0, or seconds to wait."""
+
+        wanted = {"requests": requests, "input_tokens": input_tokens, "output_tokens": output_tokens}
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT until FROM pauses WHERE id = 1").fetchone()
+            if row and row[0] > now:
+                conn.execute("COMMIT")
+                return row[0] - now
+
+            buckets = conn.execute("SELECT name, tokens, capacity, rate, updated FROM buckets").fetchall()
+            wait = 0.0
+            levels = {}
+            for name, tokens, capacity, rate, updated in buckets:
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                # A single call bigger than the whole bucket only waits for a full bucket
+                need = min(wanted.get(name, 0), capacity)
+                if tokens < need:
+                    wait = max(wait, (need - tokens) / rate)
+                levels[name] = tokens
+            if wait == 0.0:
+                for name, tokens in levels.items():
+                    conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?",
+                                 (tokens - wanted.get(name, 0), now, name))
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, requests: int = 1, input_tokens: int = 0, output_tokens: int = 0) -> dict:
+        """Block until the amounts are available, then take them."""
+
+        while True:
+            wait = self.try_acquire(requests, input_tokens, output_tokens)
+            if wait == 0.0:
+                return {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            wait = min(wait, MAX_WAIT_STEP)
+            self.waited += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, requests: int = 1, input_tokens: int = 0, output_tokens: int = 0) -> dict:
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking.
+
+        The SQLite transaction runs in a worker thread, so a write lock held
+        by another process never stalls the event loop.
+        """
+
+        import asyncio
+
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, requests, input_tokens, output_tokens)
+            if wait == 0.0:
+                return {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            wait = min(wait, MAX_WAIT_STEP)
+            self.waited += wait
+            await asyncio.sleep(wait)
+
+    def settle(self, reservation: dict, input_tokens: int = None, output_tokens: int = None):
+        """Correct a reservation with actual usage, returning or taking the difference."""
+
+        deltas = {}
+        if input_tokens is not None:
+            deltas["input_tokens"] = reservation["input_tokens"] - input_tokens
+        if output_tokens is not None:
+            deltas["output_tokens"] = reservation["output_tokens"] - output_tokens
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, delta in deltas.items():
+                conn.execute("UPDATE buckets SET tokens = MIN(capacity, tokens + ?) WHERE name = ?",
+                             (delta, name))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def pause(self, seconds: float):
+        """Stop every worker sharing this limiter for `seconds` (e.g. after a 429)."""
+
+        conn = self._connect()
+        until = time.time() + seconds
+        conn.execute("""INSERT INTO pauses (id, until) VALUES (1, ?)
+            ON CONFLICT(id) DO UPDATE SET until = MAX(until, excluded.until)""", (until,))
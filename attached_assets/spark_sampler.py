@@ -0,0 +1,195 @@
+"""
+ONE SPARK - Spark Sampler
+=========================
+Picks categories and pain points for a run. The tables are built once,
+so no draw rebuilds a list.
+
+Two modes:
+
+- "random": independent draws. Pain points are weighted by intensity
+  through Walker/Vose alias tables. A table is built the first time a
+  category's pain points are seen, and every draw after that is O(1).
+- "coverage": draws without replacement. Categories are dealt
+  round-robin from a shuffled deck that is reshuffled when empty, and so
+  are each category's pain points. N sparks then spread evenly: the
+  category counts differ by at most one.
+
+Tables and decks are built once per category from a stable source and
+cached by category (and size). pains() takes the category's full list,
+whose order must not change between calls. ordinals() serves pain points
+that live in a corpus: it draws seqs below the category's count, weighted
+by the corpus's intensity strata or dealt from a per-category deck, and
+the caller fetches just those rows.
+
+Pass seed= for a reproducible run. All randomness goes through
+self.rng.
+
+Usage:
+    sampler = SparkSampler(CATEGORIES, mode="coverage", seed=42)
+    category = sampler.category()
+    pains = sampler.pains(category, get_pain_points(category), k=4)
+    seqs = sampler.ordinals(category, corpus.count(category), k=4,
+                            strata=lambda: corpus.seqs_by_intensity(category))
+"""
+
+import random
+from array import array
+
+MODES = ("random", "coverage")
+
+# Relative draw weight of a pain point by its "intensity" label
+INTENSITY_WEIGHTS = {"high": 4.0, "medium": 2.0, "low": 1.0}
+
+
+def pain_weight(pain) -> float:
+    """Plain strings weigh 1; dict entries weigh by their intensity label."""
+
+    if isinstance(pain, dict):
+        return INTENSITY_WEIGHTS.get(pain.get("intensity"), 1.0)
+    return 1.0
+
+
+class AliasTable:
+    """O(1) draws from a fixed discrete distribution (Vose's alias method)."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("AliasTable needs at least one weight")
+        total = float(sum(weights))
+        if total <= 0:
+            weights, total = [1.0] * n, float(n)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1 up to rounding error; prob and alias keep their defaults
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng) -> int:
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class StrataTable:
+    """O(1) weighted draws of ordinals grouped by intensity, e.g. a corpus category's seqs.
+
+    A stratum is drawn by its total weight (size x intensity weight), then
+    an ordinal uniformly within it.
+    """
+
+    def __init__(self, strata: dict):
+        self.strata = [seqs for seqs in strata.values() if len(seqs)]
+        if not self.strata:
+            raise ValueError("StrataTable needs at least one ordinal")
+        self.table = AliasTable([len(seqs) * INTENSITY_WEIGHTS.get(label, 1.0)
+                                 for label, seqs in strata.items() if len(seqs)])
+        self.size = sum(len(seqs) for seqs in self.strata)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def draw(self, rng) -> int:
+        seqs = self.strata[self.table.draw(rng)]
+        return seqs[int(rng.random() * len(seqs))]
+
+
+class SparkSampler:
+    """Category and pain-point draws for one run, weighted or coverage-balanced."""
+
+    def __init__(self, categories: list, mode: str = "random", seed: int = None,
+                 category_weights: list = None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.categories = list(categories)
+        self.mode = mode
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._category_table = AliasTable(category_weights or [1.0] * len(self.categories))
+        self._category_deck = []
+        self._tables = {}   # category -> (size, AliasTable or StrataTable)
+        self._decks = {}    # category -> (size, remaining indices)
+
+    def category(self) -> str:
+        if self.mode == "coverage":
+            if not self._category_deck:
+                self._category_deck = self.categories[:]
+                self.rng.shuffle(self._category_deck)
+            return self._category_deck.pop()
+        return self.categories[self._category_table.draw(self.rng)]
+
+    def pain(self, category: str, pain_points: list):
+        """One pain point of a category."""
+
+        return self.pains(category, pain_points, 1)[0]
+
+    def pains(self, category: str, pain_points: list, k: int = 4) -> list:
+        """k distinct pain points of a category (all of them if there are fewer).
+
+        pain_points is the category's full list, in a fixed order: its table
+        or deck is built on the first call and reused while the size holds.
+        """
+
+        k = min(k, len(pain_points))
+        if self.mode == "coverage":
+            indices = self._deal(category, len(pain_points), k)
+        else:
+            indices = self._draw_weighted(category, len(pain_points), k,
+                                          lambda: AliasTable([pain_weight(pain) for pain in pain_points]))
+        return [pain_points[i] for i in indices]
+
+    def ordinals(self, category: str, count: int, k: int = 4, strata=None) -> list:
+        """k distinct ordinals below count, for a category whose pain points live in a corpus.
+
+        strata() returns {intensity: seqs} and is called once per category,
+        only in random mode. Without it, random draws are uniform.
+        """
+
+        k = min(k, count)
+        if self.mode == "coverage":
+            return self._deal(category, count, k)
+        if strata is None:
+            return self.rng.sample(range(count), k)
+        return self._draw_weighted(category, count, k, lambda: StrataTable(strata()))
+
+    def _draw_weighted(self, category: str, size: int, k: int, build) -> list:
+        cached = self._tables.get(category)
+        if cached is None or cached[0] != size:
+            cached = (size, build())
+            self._tables[category] = cached
+        table = cached[1]
+        chosen = []
+        # Rejection keeps draws O(1) while k is small next to the list
+        for _ in range(k * 8):
+            if len(chosen) == k:
+                return chosen
+            i = table.draw(self.rng)
+            if i not in chosen:
+                chosen.append(i)
+        rest = [i for i in range(size) if i not in chosen]
+        self.rng.shuffle(rest)
+        return chosen + rest[:k - len(chosen)]
+
+    def _deal(self, category: str, size: int, k: int) -> list:
+        cached = self._decks.get(category)
+        if cached is None or cached[0] != size:
+            cached = (size, array("q"))
+            self._decks[category] = cached
+        deck = cached[1]
+        chosen = []
+        while len(chosen) < k:
+            if not deck:
+                # An array of ordinals: 8 bytes each, even for a corpus category
+                deck.extend(i for i in range(size) if i not in chosen)
+                self.rng.shuffle(deck)
+            chosen.append(deck.pop())
+        return chosen
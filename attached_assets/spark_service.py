@@ -0,0 +1,293 @@
+"""
+ONE SPARK - Spark Service
+=========================
+Serves sparks over a small local HTTP API from a warm pool, so a front
+end gets one in milliseconds instead of a cold start plus a Claude call.
+
+The pool keeps up to `size` ready sparks per category, each with its
+JSON record written and its card rendered. Background threads top up
+the category furthest below its target first, so a run on one category
+is refilled before the rest. Pooled sparks older than `ttl` seconds are
+dropped and replaced; their files stay where they were written.
+
+A request for an empty category waits for a refill already in flight,
+and otherwise generates a spark on the spot. The response's "source"
+says which path it took ("pool" or "fresh").
+
+Endpoints:
+    GET /spark                          a pooled spark from any category
+    GET /spark?category=pet+products    one from that category (404 if it isn't served)
+    GET /categories                     served categories and how many sparks each has ready
+    GET /health                         pool levels plus hit, miss, expiry and error counts
+    GET /cards/<file>                   a card image the service wrote
+
+Usage:
+    python one_spark_pro.py --serve 8780 --pool-size 3 --pool-ttl 3600 --category "pet products"
+    curl 'http://127.0.0.1:8780/spark?category=pet+products'
+
+Or in-process, with generate(category) returning a spark record:
+    pool = SparkPool(categories, generate, size=3, ttl=3600)
+    server = start_spark_server(pool, card_dir="sparks")
+    ...  # base_url = server.base_url
+    server.shutdown(); pool.stop()
+"""
+
+import re
+import json
+import time
+import random
+import threading
+from pathlib import Path
+from collections import Counter, deque
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds the refill threads pause after a failed generation
+RETRY_DELAY = 5.0
+
+CONTENT_TYPES = {
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+    ".avif": "image/avif",
+    ".svg": "image/svg+xml",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+class SparkPool:
+    """Up to `size` fresh sparks per category, topped up by background threads."""
+
+    def __init__(self, categories: list, generate, size: int = 3, ttl: float = None,
+                 workers: int = 4, retry_delay: float = RETRY_DELAY, seed: int = None):
+        self.categories = list(categories)
+        self.generate = generate
+        self.size = size
+        self.ttl = ttl
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.rng = random.Random(seed)
+        self.ready = {category: deque() for category in self.categories}  # (created, record), oldest first
+        self.filling = Counter()  # category -> refills in flight
+        self.stats = Counter()    # hits, misses, generated, expired, errors
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self._stopping = False
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._refill_loop, name=f"spark-refill-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop refilling. A generation already running finishes in the background."""
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        for sparks in self.ready.values():
+            while sparks and now - sparks[0][0] > self.ttl:
+                sparks.popleft()
+                self.stats["expired"] += 1
+
+    def _most_needed(self):
+        """The category furthest below its target, or None if every pool is full or filling."""
+
+        deficits = {category: self.size - len(self.ready[category]) - self.filling[category]
+                    for category in self.categories}
+        neediest = max(deficits.values())
+        if neediest <= 0:
+            return None
+        return self.rng.choice([category for category, deficit in deficits.items() if deficit == neediest])
+
+    def _wait_seconds(self, now: float):
+        """How long a refill thread may sleep before something could need doing (None: until notified)."""
+
+        deadlines = [self._paused_until] if self._paused_until > now else []
+        if self.ttl is not None:
+            deadlines += [sparks[0][0] + self.ttl for sparks in self.ready.values() if sparks]
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    def _refill_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    now = time.monotonic()
+                    self._expire(now)
+                    category = self._most_needed() if now >= self._paused_until else None
+                    if category is not None:
+                        break
+                    self._cond.wait(self._wait_seconds(now))
+                self.filling[category] += 1
+            try:
+                record = self.generate(category)
+            except Exception as e:
+                print(f"⚠️  Refill failed ({category}): {e}")
+                with self._cond:
+                    self.filling[category] -= 1
+                    self.stats["errors"] += 1
+                    self._paused_until = time.monotonic() + self.retry_delay
+                    self._cond.notify_all()  # requests waiting on this refill generate their own
+                continue
+            with self._cond:
+                self.filling[category] -= 1
+                self.stats["generated"] += 1
+                self.ready[category].append((time.monotonic(), record))
+                self._cond.notify_all()
+
+    def take(self, category: str = None) -> tuple:
+        """(record, source) for one spark, from the pool if it has one ready.
+
+        With nothing ready but a matching refill in flight, waits for that
+        refill rather than starting a second generation. Raises KeyError for
+        a category the pool doesn't serve; errors from an on-the-spot
+        generation propagate.
+        """
+
+        if category is not None and category not in self.ready:
+            raise KeyError(category)
+        with self._cond:
+            while True:
+                self._expire(time.monotonic())
+                if category is None:
+                    stocked = [c for c in self.categories if self.ready[c]]
+                    in_flight = sum(self.filling.values())
+                else:
+                    stocked = [category] if self.ready[category] else []
+                    in_flight = self.filling[category]
+                if stocked:
+                    _, record = self.ready[self.rng.choice(stocked)].popleft()
+                    self.stats["hits"] += 1
+                    self._cond.notify_all()  # wake a refill thread
+                    return record, "pool"
+                if not in_flight or self._stopping:
+                    break
+                self._cond.wait()
+            self.stats["misses"] += 1
+            category = category or self.rng.choice(self.categories)
+        record = self.generate(category)
+        with self._cond:
+            self.stats["generated"] += 1
+        return record, "fresh"
+
+    def levels(self) -> dict:
+        with self._cond:
+            self._expire(time.monotonic())
+            return {category: len(self.ready[category]) for category in self.categories}
+
+    def status(self) -> dict:
+        levels = self.levels()
+        with self._cond:
+            return {
+                "ready": sum(levels.values()),
+                "capacity": self.size * len(self.categories),
+                "filling": sum(self.filling.values()),
+                "ttl": self.ttl,
+                "stats": dict(self.stats),
+                "levels": levels,
+            }
+
+
+class SparkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    routes = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, body: dict):
+        self._send_body(status, json.dumps(body).encode("utf-8"), "application/json")
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {"error": message})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        for pattern, handler in self.routes.items():
+            match = re.fullmatch(pattern, url.path)
+            if match:
+                query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                return handler(self, query, *match.groups())
+        self._send_error(404, f"No route for GET {url.path}")
+
+    def handle_spark(self, query: dict):
+        server = self.server
+        category = query.get("category")
+        started = time.perf_counter()
+        try:
+            record, source = server.pool.take(category)
+        except KeyError:
+            return self._send_error(404, f"Category {category!r} is not served")
+        except Exception as e:
+            return self._send_error(503, f"Spark generation failed: {e}")
+        self._send_json(200, {
+            "source": source,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "card_url": server.card_url(record.get("card_path")),
+            "spark": record,
+        })
+
+    def handle_categories(self, query: dict):
+        self._send_json(200, self.server.pool.levels())
+
+    def handle_health(self, query: dict):
+        self._send_json(200, self.server.pool.status())
+
+    def handle_card(self, query: dict, name: str):
+        card_dir = self.server.card_dir
+        path = card_dir / name if card_dir is not None else None
+        if path is None or path.suffix not in CONTENT_TYPES or not path.is_file():
+            return self._send_error(404, f"No card {name!r}")
+        self._send_body(200, path.read_bytes(), CONTENT_TYPES[path.suffix])
+
+
+SparkHandler.routes[r"/spark"] = SparkHandler.handle_spark
+SparkHandler.routes[r"/categories"] = SparkHandler.handle_categories
+SparkHandler.routes[r"/health"] = SparkHandler.handle_health
+SparkHandler.routes[r"/cards/([^/]+)"] = SparkHandler.handle_card
+
+
+class SparkServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, pool: SparkPool, card_dir=None):
+        super().__init__(address, SparkHandler)
+        self.pool = pool
+        self.card_dir = Path(card_dir).resolve() if card_dir is not None else None
+
+    def card_url(self, card_path):
+        """/cards/<name> for a card the service can serve, else None."""
+
+        if not card_path or self.card_dir is None:
+            return None
+        card_path = Path(card_path).resolve()
+        return f"/cards/{card_path.name}" if card_path.parent == self.card_dir else None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_spark_server(pool: SparkPool, host: str = "127.0.0.1", port: int = 0, card_dir=None) -> SparkServer:
+    """Start the pool's refill threads and an HTTP server on a background thread. port=0 picks a free port."""
+
+    pool.start()
+    server = SparkServer((host, port), pool, card_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+ONE SPARK - Spark Store
+=======================
+Indexed SQLite storage for sparks, replacing a flat directory of
+spark_<name>_<timestamp>.json/.png pairs.
+
+Layout of a store directory:
+    sparks.sqlite              one row per spark, indexed by category, name,
+                               created_at and model; the full record as JSON
+    blobs/ab/<sha256>.png      card images, content-addressed (identical
+                               cards are stored once)
+    tmp/                       render scratch space, moved into blobs/ on add
+
+Usage:
+    store = SparkStore("~/sparks_store")
+    store.add(record, card_file="card.png")
+    store.add_many([(record, card_file), ...])        # one transaction
+    store.query(category="sleep products", since=datetime.now() - timedelta(days=7))
+
+    python spark_store.py ~/sparks_store import ~/sparks
+    python spark_store.py ~/sparks_store query --category "pet products" --days 7
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import sqlite3
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sparks (
+    id          INTEGER PRIMARY KEY,
+    created_at  REAL NOT NULL,
+    category    TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    model       TEXT,
+    outcome     TEXT,
+    card_sha256 TEXT,
+    record      TEXT NOT NULL,
+    source      TEXT
+);
+CREATE INDEX IF NOT EXISTS sparks_category_time ON sparks (category, created_at);
+CREATE INDEX IF NOT EXISTS sparks_time ON sparks (created_at);
+CREATE INDEX IF NOT EXISTS sparks_name ON sparks (name);
+CREATE INDEX IF NOT EXISTS sparks_model_time ON sparks (model, created_at);
+"""
+
+# Imported sparks remember where they came from, so importing again skips them.
+# Created after the migration below, since stores made before it lack the column.
+SOURCE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS sparks_source ON sparks (source)"
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _timestamp(record: dict) -> float:
+    try:
+        return datetime.fromisoformat(record["generated_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return datetime.now().timestamp()
+
+
+class SparkStore:
+    """SQLite index of spark records plus a content-addressed card blob directory."""
+
+    def __init__(self, root):
+        self.root = Path(root).expanduser()
+        self.blob_dir = self.root / "blobs"
+        self.tmp_dir = self.root / "tmp"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "sparks.sqlite"
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if "source" not in {row[1] for row in conn.execute("PRAGMA table_info(sparks)")}:
+            conn.execute("ALTER TABLE sparks ADD COLUMN source TEXT")
+        conn.execute(SOURCE_INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # -- blobs -----------------------------------------------------------
+
+    def blob_path(self, sha256: str, suffix: str = ".png") -> Path:
+        return self.blob_dir / sha256[:2] / f"{sha256}{suffix}"
+
+    def tmp_card_path(self, suffix: str = ".png") -> str:
+        """A fresh scratch path to render a card into before add()."""
+
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def put_card(self, card_file, move: bool = False) -> str:
+        """Store a card image by content hash. Returns its sha256."""
+
+        card_file = Path(card_file)
+        sha256 = file_sha256(card_file)
+        target = self.blob_path(sha256, card_file.suffix or ".png")
+        if target.exists():
+            if move:
+                card_file.unlink()
+            return sha256
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if move:
+            os.replace(card_file, target)
+        else:
+            tmp = self.tmp_card_path(card_file.suffix)
+            shutil.copyfile(card_file, tmp)
+            os.replace(tmp, target)
+        return sha256
+
+    # -- records ---------------------------------------------------------
+
+    def _row(self, record: dict, card_file, move: bool) -> tuple:
+        # The record's card_path is updated in place to point at its blob
+        sha256 = None
+        if card_file is not None:
+            sha256 = self.put_card(card_file, move=move)
+            record["card_path"] = str(self.blob_path(sha256, Path(card_file).suffix or ".png"))
+            # Thumbnails written alongside the card are stored as blobs too
+            for width, thumb_file in (record.get("thumbnails") or {}).items():
+                if thumb_file and Path(thumb_file).exists():
+                    thumb_sha = self.put_card(thumb_file, move=move)
+                    record["thumbnails"][width] = str(self.blob_path(thumb_sha, Path(thumb_file).suffix))
+        concept = record.get("concept", {})
+        return (_timestamp(record), record.get("category", ""), concept.get("name", ""),
+                record.get("model"), record.get("outcome"), sha256, json.dumps(record))
+
+    def add(self, record: dict, card_file=None, move: bool = True) -> int:
+        """Insert one spark. The card file (if any) is moved into the blob store."""
+
+        return self.add_many([(record, card_file)], move=move)[0]
+
+    def add_many(self, items, move: bool = True, sources: list = None) -> list:
+        """Insert (record, card_file) pairs in a single transaction. Returns row ids.
+
+        Each record's card_path is rewritten to its blob path. With sources
+        (one key per item, e.g. where it was imported from), an item whose
+        key is already stored is skipped and gets None instead of an id.
+        """
+
+        rows = [self._row(record, card_file, move) for record, card_file in items]
+        sources = sources or [None] * len(rows)
+        conn = self._connect()
+        ids = []
+        with conn:
+            for row, source in zip(rows, sources):
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO sparks "
+                    "(created_at, category, name, model, outcome, card_sha256, record, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row + (source,))
+                ids.append(cursor.lastrowid if cursor.rowcount else None)
+        return ids
+
+    def has_source(self, source: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM sparks WHERE source = ?", (source,)).fetchone() is not None
+
+    @staticmethod
+    def _where(category=None, name=None, model=None, since=None, until=None) -> tuple:
+        clauses, params = [], []
+        for column, value in (("category", category), ("name", name), ("model", model)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until.timestamp())
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, category: str = None, name: str = None, model: str = None,
+              since: datetime = None, until: datetime = None, limit: int = None) -> list:
+        """Records matching all given filters, newest first."""
+
+        where, params = self._where(category, name, model, since, until)
+        sql = f"SELECT id, record FROM sparks{where} ORDER BY created_at DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        results = []
+        for row_id, record in self._connect().execute(sql, params):
+            record = json.loads(record)
+            record["id"] = row_id
+            results.append(record)
+        return results
+
+    def count(self, category: str = None, name: str = None, model: str = None,
+              since: datetime = None, until: datetime = None) -> int:
+        where, params = self._where(category, name, model, since, until)
+        return self._connect().execute(f"SELECT COUNT(*) FROM sparks{where}", params).fetchone()[0]
+
+    def category_counts(self, since: datetime = None) -> dict:
+        sql = "SELECT category, COUNT(*) FROM sparks"
+        params = []
+        if since is not None:
+            sql += " WHERE created_at >= ?"
+            params.append(since.timestamp())
+        sql += " GROUP BY category"
+        return dict(self._connect().execute(sql, params).fetchall())
+
+    def import_directory(self, directory, batch_size: int = 500) -> int:
+        """Bulk-import loose spark_*.json (+ card image) files. Cards are copied, not moved.
+
+        Each spark is keyed on its JSON file's path and generated_at, so
+        importing a directory again only adds sparks that are new. Returns
+        how many were added.
+        """
+
+        imported = 0
+        items, sources = [], []
+
+        def flush():
+            ids = self.add_many(items, move=False, sources=sources)
+            items.clear()
+            sources.clear()
+            return sum(spark_id is not None for spark_id in ids)
+
+        for json_path in sorted(Path(directory).glob("spark_*.json")):
+            try:
+                with open(json_path) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            source = f"{json_path.resolve()}@{record.get('generated_at')}"
+            if source in sources or self.has_source(source):
+                continue
+            # The card sits next to its JSON, in whatever format it was encoded
+            card_file = json_path.with_suffix(Path(record.get("card_path") or ".png").suffix or ".png")
+            items.append((record, card_file if card_file.exists() else None))
+            sources.append(source)
+            if len(items) >= batch_size:
+                imported += flush()
+        if items:
+            imported += flush()
+        return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONE SPARK spark store")
+    parser.add_argument("store", help="Store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="Import loose spark_*.json/.png files")
+    import_cmd.add_argument("directory")
+    query_cmd = commands.add_parser("query", help="List stored sparks")
+    query_cmd.add_argument("--category")
+    query_cmd.add_argument("--name")
+    query_cmd.add_argument("--model")
+    query_cmd.add_argument("--days", type=float, help="Only sparks from the last N days")
+    query_cmd.add_argument("--limit", type=int, default=50)
+    query_cmd.add_argument("--json", action="store_true", help="Print full records as JSON lines")
+    args = parser.parse_args()
+
+    store = SparkStore(args.store)
+    if args.command == "import":
+        print(f"📥 Imported {store.import_directory(args.directory)} sparks into {store.root}")
+    else:
+        since = datetime.now() - timedelta(days=args.days) if args.days else None
+        for record in store.query(category=args.category, name=args.name, model=args.model,
+                                  since=since, limit=args.limit):
+            if args.json:
+                print(json.dumps(record))
+            else:
+                print(f"{record['generated_at'][:19]}  {record['category']:<28} "
+                      f"{record['concept'].get('name', '')}")
@@ -0,0 +1,207 @@
+"""
+ONE SPARK - Streaming Concept Parser
+====================================
+Incremental parser for the concept JSON while Claude is still writing it.
+
+Feed it text deltas as they arrive. Each top-level field is decoded and
+checked against CONCEPT_SCHEMA as soon as its value is complete, and is
+handed to an optional callback, so a UI can start laying out the card
+early. Anything off-schema raises OffSchemaError right away: prose
+instead of JSON, an unknown key, or a value of the wrong type. The
+caller can then drop the stream and retry instead of waiting for the
+full completion.
+
+Usage:
+    parser = ConceptStreamParser(on_field=lambda key, value: print(key, value))
+    for delta in stream.text_stream:
+        parser.feed(delta)
+    concept = parser.close()
+"""
+
+import json
+
+# Top-level concept keys and the type each value must have
+CONCEPT_SCHEMA = {
+    "name": str,
+    "tagline": str,
+    "pain_solved": str,
+    "description": str,
+    "features": list,
+    "price_point": str,
+    "vibe": str,
+}
+
+_WHITESPACE = " \t\r\n"
+
+
+class OffSchemaError(ValueError):
+    """The streamed output is not (or is no longer) a valid concept."""
+
+
+class ConceptStreamParser:
+    """Incrementally validates a streamed concept JSON object."""
+
+    def __init__(self, on_field=None, schema: dict = CONCEPT_SCHEMA):
+        self.on_field = on_field
+        self.schema = schema
+        self.fields = {}
+        self.buffer = ""
+        self.pos = 0
+        self.started = False    # seen the opening brace
+        self.finished = False   # seen the closing brace
+        self.expect = "key"     # key | colon | value | comma
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.token_start = None
+        self.key = None
+
+    def feed(self, text: str):
+        """Consume the next chunk of streamed text."""
+
+        self.buffer += text
+        while self.pos < len(self.buffer):
+            if not self.started:
+                if not self._skip_preamble():
+                    return
+                continue
+            if self.finished:
+                self._check_trailer()
+                return
+            self._step(self.buffer[self.pos])
+            self.pos += 1
+
+    def close(self) -> dict:
+        """Finish the stream and return the validated concept."""
+
+        if not self.finished:
+            raise OffSchemaError("Concept JSON ended before the closing brace")
+        self._check_trailer(final=True)
+        missing = [key for key in self.schema if key not in self.fields]
+        if missing:
+            raise OffSchemaError(f"Concept is missing {', '.join(missing)}")
+        return dict(self.fields)
+
+    # -- internals -------------------------------------------------------
+
+    def _skip_preamble(self) -> bool:
+        """Skip whitespace and a ```json fence. Returns False until more text is needed."""
+
+        rest = self.buffer[self.pos:]
+        stripped = rest.lstrip(_WHITESPACE)
+        self.pos += len(rest) - len(stripped)
+        if not stripped:
+            return False
+        if stripped.startswith("`"):
+            fence, newline, _ = stripped.partition("\n")
+            if fence.strip() not in ("```", "```json"):
+                if not newline and "```json".startswith(fence):
+                    return False  # fence still arriving
+                raise OffSchemaError(f"Unexpected code fence {fence[:20]!r}")
+            if not newline:
+                return False
+            self.pos += len(fence) + 1
+            return True
+        if stripped[0] != "{":
+            raise OffSchemaError(f"Expected a JSON object, got {stripped[:20]!r}")
+        self.started = True
+        self.depth = 1
+        self.pos += 1
+        return True
+
+    def _check_trailer(self, final: bool = False):
+        """Allow only whitespace and a single closing fence after the object."""
+
+        trailer = self.buffer[self.pos:].strip(_WHITESPACE)
+        allowed = trailer in ("", "```") if final else "```".startswith(trailer)
+        if not allowed:
+            raise OffSchemaError(f"Unexpected text after the concept: {trailer[:20]!r}")
+
+    def _step(self, char: str):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                if self.depth == 1:
+                    self._end_token(self.pos + 1)
+            return
+
+        if self.expect == "key":
+            if char in _WHITESPACE:
+                return
+            if char == '"':
+                self.in_string = True
+                self.token_start = self.pos
+            elif char == "}" and not self.fields:
+                self.finished = True
+            else:
+                raise OffSchemaError(f"Expected a key, got {char!r}")
+        elif self.expect == "colon":
+            if char in _WHITESPACE:
+                return
+            if char != ":":
+                raise OffSchemaError(f"Expected ':' after {self.key!r}, got {char!r}")
+            self.expect = "value"
+        elif self.expect == "value":
+            if self.token_start is None:
+                if char in _WHITESPACE:
+                    return
+                self.token_start = self.pos
+                if char == '"':
+                    self.in_string = True
+                elif char in "{[":
+                    self.depth += 1
+                return
+            if self.depth > 1:
+                if char == '"':
+                    self.in_string = True
+                elif char in "{[":
+                    self.depth += 1
+                elif char in "}]":
+                    self.depth -= 1
+                    if self.depth == 1:
+                        self._end_token(self.pos + 1)
+                return
+            # Bare scalar (number / true / false / null) ends at a delimiter
+            if char in _WHITESPACE + ",}":
+                self._end_token(self.pos)
+                self._step(char)
+        elif self.expect == "comma":
+            if char in _WHITESPACE:
+                return
+            if char == ",":
+                self.expect = "key"
+            elif char == "}":
+                self.finished = True
+            else:
+                raise OffSchemaError(f"Expected ',' or '}}' after {self.key!r}, got {char!r}")
+
+    def _end_token(self, end: int):
+        raw = self.buffer[self.token_start:end]
+        self.token_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            raise OffSchemaError(f"Invalid JSON token {raw[:30]!r}: {e}")
+
+        if self.expect == "key":
+            if value not in self.schema:
+                raise OffSchemaError(f"Unknown concept key {value!r}")
+            if value in self.fields:
+                raise OffSchemaError(f"Duplicate concept key {value!r}")
+            self.key = value
+            self.expect = "colon"
+            return
+
+        expected = self.schema[self.key]
+        if not isinstance(value, expected):
+            raise OffSchemaError(f"{self.key!r} should be {expected.__name__}, got {type(value).__name__}")
+        if expected is list and not all(isinstance(item, str) for item in value):
+            raise OffSchemaError(f"{self.key!r} should be a list of strings")
+        self.fields[self.key] = value
+        self.expect = "comma"
+        if self.on_field is not None:
+            self.on_field(self.key, value)
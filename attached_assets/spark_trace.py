@@ -0,0 +1,274 @@
+"""
+ONE SPARK - Tracing and Metrics
+===============================
+Times each stage of a spark as a span: category pick, pain sampling, the
+Claude call, JSON cleanup, render, image encode and file writes. Spans
+nest through a context variable, so they parent correctly across asyncio
+tasks too. Each one carries attributes such as category, model and
+token counts.
+
+Outputs:
+- a JSON-lines trace, one finished span per line:
+  {"trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "attrs"}
+- a Prometheus text-format metrics file with a latency histogram per
+  stage (spark_stage_seconds) and counters such as spark_api_errors_total
+  and spark_demo_fallbacks_total
+
+The tracer does nothing until configure() turns it on; a disabled span is
+one shared no-op object.
+
+Stages that run in worker processes (render, encode) are timed there and
+recorded afterwards with tracer.record().
+
+Usage:
+    configure(trace_path="trace.jsonl", metrics_path="metrics.prom")
+    with tracer.span("claude", category=category, model=MODEL) as span:
+        concept, usage = generate(...)
+        span.set(**usage)
+    tracer.count("spark_api_errors_total")
+    tracer.close()                      # flush the trace, write the metrics file
+"""
+
+import os
+import json
+import time
+import random
+import tempfile
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+
+# Seconds; the same buckets for every stage
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    "spark_stage_seconds": ("histogram", "Duration of each spark pipeline stage"),
+    "spark_api_errors_total": ("counter", "Claude API calls that failed after retries"),
+    "spark_demo_fallbacks_total": ("counter", "Sparks that fell back to the demo concept"),
+    "spark_sparks_total": ("counter", "Sparks finished, by outcome"),
+    "spark_overflows_total": ("counter", "Cards not rendered because their text didn't fit"),
+}
+
+_current = contextvars.ContextVar("spark_span", default=None)
+
+
+def _new_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    """One timed stage. Use through Tracer.span(), Tracer.start() or Tracer.record()."""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start", "_t0", "attrs")
+
+    def __init__(self, tracer, name: str, parent, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id()
+        self.span_id = _new_id()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, duration: float = None):
+        self.tracer._finish(self, time.perf_counter() - self._t0 if duration is None else duration)
+
+
+class _NullSpan:
+    """What a disabled tracer hands out: accepts everything, records nothing."""
+
+    trace_id = span_id = parent_id = None
+
+    def set(self, **attrs):
+        pass
+
+    def end(self, duration: float = None):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """Counters and latency histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described and name in METRIC_HELP:
+                kind, text = METRIC_HELP[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        with self._lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name)
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f"{name}_bucket{_labels(labels, le=repr(bound))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram[-2]:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram[-1]}")
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name)
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics file atomically, so a scraper never reads half of it."""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Tracer:
+    """Stage spans for a run, exported as JSON lines and stage-latency metrics."""
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics = Metrics()
+        self.trace_path = None
+        self.metrics_path = None
+        self._trace_file = None
+        self._lock = threading.Lock()
+
+    def configure(self, trace_path=None, metrics_path=None):
+        """Turn tracing on. Spans are appended to trace_path; metrics go to metrics_path on close()."""
+
+        self.close()
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.enabled = bool(trace_path or metrics_path)
+        if self.trace_path is not None:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            self._trace_file = open(self.trace_path, "a", buffering=1024 * 1024)
+
+    def start(self, name: str, parent=None, **attrs):
+        """Open a span that the caller ends; its parent is the current span unless given."""
+
+        if not self.enabled:
+            return NULL_SPAN
+        parent = parent if parent is not None else _current.get()
+        return Span(self, name, parent if parent is not NULL_SPAN else None, attrs)
+
+    @contextmanager
+    def span(self, name: str, parent=None, **attrs):
+        """Time the block as a span, the current span inside it. Exceptions are noted, then re-raised."""
+
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        span = self.start(name, parent, **attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    @contextmanager
+    def use(self, span):
+        """Make an already started span the current one for the block, without ending it."""
+
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+
+    def record(self, name: str, seconds: float, parent=None, end: float = None, **attrs):
+        """Add a finished span timed elsewhere (e.g. in a worker process).
+
+        It ends at `end` (a time.time() value), or now. Returns its start,
+        so back-to-back stages can be recorded from the last one backwards.
+        """
+
+        if not self.enabled or seconds is None:
+            return end
+        span = self.start(name, parent, **attrs)
+        span.start = (span.start if end is None else end) - seconds
+        span.end(seconds)
+        return span.start
+
+    def count(self, name: str, value: float = 1, **labels):
+        if self.enabled:
+            self.metrics.inc(name, value, **labels)
+
+    def _finish(self, span: Span, duration: float):
+        self.metrics.observe("spark_stage_seconds", duration, stage=span.name)
+        if self._trace_file is None:
+            return
+        line = json.dumps({
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": round(span.start, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "attrs": span.attrs,
+        }, default=str)
+        with self._lock:
+            self._trace_file.write(line + "\n")
+
+    def close(self):
+        """Flush the trace and write the metrics file. Safe to call more than once."""
+
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+        if self.metrics_path is not None:
+            self.metrics.write(self.metrics_path)
+
+
+# One tracer per process
+tracer = Tracer()
+
+
+def configure(trace_path=None, metrics_path=None):
+    tracer.configure(trace_path, metrics_path)
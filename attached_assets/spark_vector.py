@@ -0,0 +1,150 @@
+"""
+ONE SPARK - Vector Card Output
+==============================
+Writes a card as SVG, or as a self-contained HTML page wrapping that SVG,
+from the same CardLayout the Pillow renderers draw. Nothing is
+rasterized, so a card costs only its layout pass plus string building,
+and the browser (or a later --render-only run) rasterizes on demand.
+
+Text is placed where Pillow would draw it: Pillow positions the top of
+the ascender and SVG positions the baseline, so the font's ascent is
+added. Each line carries its measured width as textLength. A viewer that
+substitutes another font then squeezes or stretches the line to that
+width, instead of letting it run past its box.
+
+Fonts are referenced by family name. Pass embed_fonts=True to inline
+the font files as base64 @font-face rules. The result renders identically
+anywhere, at the cost of a much larger file.
+
+Usage:
+    svg = layout_svg(layout, background=("#0f0f23", "#1a1a3e"))
+    write_vector_card(layout, "card.html", background="#1a1a2e")
+"""
+
+import time
+import base64
+import functools
+from pathlib import Path
+from html import escape
+
+from spark_fonts import get_font, registry
+
+VECTOR_FORMATS = ("svg", "html")
+
+# CSS font stacks for the font files the card renderers use
+FONT_FAMILIES = {
+    "DejaVuSans": "'DejaVu Sans', Verdana, sans-serif",
+}
+
+
+def _font_css(filename: str) -> tuple:
+    """(font-family, font-weight) for a font file like DejaVuSans-Bold.ttf."""
+
+    stem = Path(filename).stem
+    family, _, style = stem.partition("-")
+    weight = "bold" if "Bold" in style else "normal"
+    return FONT_FAMILIES.get(family, f"'{family}', sans-serif"), weight
+
+
+@functools.lru_cache(maxsize=None)
+def _ascent(spec: tuple) -> int:
+    return get_font(*spec).getmetrics()[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _font_face(filename: str) -> str:
+    path = registry.resolve(filename)
+    if path is None:
+        return ""
+    family, weight = _font_css(filename)
+    data = base64.b64encode(Path(path).read_bytes()).decode("ascii")
+    return (f"@font-face {{ font-family: {family.split(',')[0]}; font-weight: {weight}; "
+            f"src: url(data:font/ttf;base64,{data}) format('truetype'); }}")
+
+
+def _attrs(**attrs) -> str:
+    return " ".join(f'{name.replace("_", "-")}="{value}"' for name, value in attrs.items() if value is not None)
+
+
+def _element(op: tuple, measurer) -> str:
+    kind = op[0]
+    if kind == "text":
+        _, (x, y), text, spec, fill = op
+        family, weight = _font_css(spec[0])
+        width = measurer.line_width(spec, text)
+        return (f'<text {_attrs(x=x, y=y + _ascent(spec), fill=fill, font_size=spec[1], font_weight=weight)} '
+                f'font-family="{family}" textLength="{width:.1f}" lengthAdjust="spacingAndGlyphs">'
+                f'{escape(text)}</text>')
+    if kind == "rect":
+        _, (x0, y0, x1, y1), fill, outline, width = op
+        # Pillow rectangles include their end pixel; SVG strokes straddle the edge
+        return f'<rect {_attrs(x=x0, y=y0, width=x1 - x0 + 1, height=y1 - y0 + 1, fill=fill or "none", stroke=outline, stroke_width=width if outline else None)}/>'
+    if kind == "line":
+        _, points, fill, width = op
+        coords = " ".join(f"{x},{y}" for x, y in points)
+        return f'<polyline points="{coords}" {_attrs(stroke=fill, stroke_width=width)} fill="none"/>'
+    raise ValueError(f"unknown layout op {kind!r}")
+
+
+def layout_svg(layout, background=None, embed_fonts: bool = False) -> str:
+    """An SVG document for a layout.
+
+    background is a fill color, or a (top, bottom) pair for a vertical
+    gradient like the Pillow card template's.
+    """
+
+    width, height = layout.width, layout.height
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}">']
+    if embed_fonts:
+        faces = {op[3][0] for op in layout.ops if op[0] == "text"}
+        parts.append(f"<style>{''.join(_font_face(face) for face in sorted(faces))}</style>")
+    if isinstance(background, (tuple, list)):
+        top, bottom = background
+        parts.append(f'<defs><linearGradient id="bg" x1="0" y1="0" x2="0" y2="1">'
+                     f'<stop offset="0" stop-color="{top}"/><stop offset="1" stop-color="{bottom}"/>'
+                     f'</linearGradient></defs><rect width="100%" height="100%" fill="url(#bg)"/>')
+    elif background:
+        parts.append(f'<rect width="100%" height="100%" fill="{background}"/>')
+    parts.extend(_element(op, layout.measurer) for op in layout.ops)
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def layout_html(layout, background=None, embed_fonts: bool = False, title: str = "One Spark") -> str:
+    """A self-contained HTML page showing the layout's SVG, scaled to the window."""
+
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f'<title>{escape(title)}</title>'
+            f'<style>body {{ margin: 0; background: #000; }} svg {{ display: block; width: 100%; height: auto; '
+            f'max-width: {layout.width}px; margin: 0 auto; }}</style></head><body>\n'
+            f'{layout_svg(layout, background, embed_fonts)}\n</body></html>\n')
+
+
+def write_vector_card(layout, output_path, background=None, embed_fonts: bool = False,
+                      title: str = "One Spark") -> dict:
+    """Write a layout as .svg or .html (by suffix). Returns a report shaped like CardEncoder.save()'s."""
+
+    start = time.perf_counter()
+    output_path = Path(output_path)
+    fmt = output_path.suffix.lstrip(".").lower()
+    if fmt == "svg":
+        document = layout_svg(layout, background, embed_fonts)
+    elif fmt == "html":
+        document = layout_html(layout, background, embed_fonts, title)
+    else:
+        raise ValueError(f"vector cards are written as {' or '.join('.' + f for f in VECTOR_FORMATS)}")
+    data = document.encode("utf-8")
+    written = time.perf_counter()
+    output_path.write_bytes(data)
+    return {
+        "path": str(output_path),
+        "format": fmt,
+        "bytes": len(data),
+        "seconds": time.perf_counter() - start,
+        "write_seconds": time.perf_counter() - written,
+        "quality": None,
+        "over_target": False,
+        "thumbnails": {},
+    }
@@ -0,0 +1,69 @@
+"""Shared fixtures: the spark modules live one directory up, next to the scripts."""
+
+import os
+import sys
+import signal
+import subprocess
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from spark_mock_api import start_mock_server  # noqa: E402
+
+
+@pytest.fixture
+def pro(monkeypatch):
+    """The One Spark Pro script as a module, with no response cache."""
+
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    import one_spark_pro_1764697514875 as module
+
+    monkeypatch.setattr(module, "response_cache", None)
+    return module
+
+
+@pytest.fixture
+def mock_api():
+    """Factory for in-process mock Claude APIs, shut down after the test."""
+
+    servers = []
+
+    def start(**state_kwargs):
+        server = start_mock_server(**state_kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def processes(tmp_path):
+    """Factory running Python scripts in their own process groups, all killed after the test.
+
+    Output goes to <tmp_path>/<script stem>.log. Killed scripts can leave
+    children (e.g. card renderers) behind; the group kill reaps them.
+    """
+
+    started = []
+
+    def start(script: Path, *args) -> subprocess.Popen:
+        env = {"ANTHROPIC_API_KEY": "test", "PATH": os.environ.get("PATH", "/usr/bin:/bin")}
+        with open(tmp_path / f"{script.stem}.log", "a") as log:
+            process = subprocess.Popen([sys.executable, str(script), *map(str, args)], env=env, cwd=tmp_path,
+                                       stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        started.append(process)
+        return process
+
+    yield start
+    for process in started:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
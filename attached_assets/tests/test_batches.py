@@ -0,0 +1,116 @@
+"""Message Batches runs killed mid-collection and resumed against the mock API."""
+
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from conftest import ROOT
+
+COUNT = 12
+CHUNK = 5
+
+# Runs one (possibly resumed) batch collection, SIGKILLing itself at a hook
+DRIVER = """
+import os, sys, signal
+sys.path.insert(0, {root!r})
+import one_spark_pro_1764697514875 as pro
+from spark_batches import BatchJobStore
+from spark_client import ClientManager
+from spark_store import SparkStore
+
+base_url, output_dir, store_dir, log_path, job_id, kill = sys.argv[1:]
+pro.client_manager = ClientManager(base_url=base_url, backoff_base=0.01)
+pro.BATCH_COLLECT_CHUNK = {chunk}
+store = SparkStore(store_dir) if store_dir != "-" else None
+
+
+def killing(owner, name, after):
+    original = getattr(owner, name)
+    calls = [0]
+
+    def wrapper(*args, **kwargs):
+        result = original(*args, **kwargs)
+        calls[0] += 1
+        if calls[0] == after:
+            os.kill(os.getpid(), signal.SIGKILL)
+        return result
+    setattr(owner, name, wrapper)
+
+
+trace_card = pro.trace_card
+def logged_trace_card(report):
+    with open(log_path, "a") as f:
+        f.write("rendered\\n")
+    trace_card(report)
+pro.trace_card = logged_trace_card
+
+if kill != "-":
+    hook, after = kill.split(":")
+    owner = {{"index": store, "write": pro, "checkpoint": BatchJobStore}}[hook]
+    name = {{"index": "add_many", "write": "write_spark_record", "checkpoint": "save"}}[hook]
+    killing(owner, name, int(after))
+
+pro.run_spark_message_batch(None if job_id != "-" else {count}, output_dir, job_id=None if job_id == "-" else job_id,
+                            poll_interval=0.05, render_workers=1, spark_store=store)
+"""
+
+
+def run_batch(processes, tmp_path, server, store_dir, job_id="-", kill="-") -> int:
+    driver = tmp_path / "driver.py"
+    driver.write_text(DRIVER.format(root=str(ROOT), chunk=CHUNK, count=COUNT))
+    process = processes(driver, server.base_url, tmp_path / "out", store_dir or "-", tmp_path / "renders.log",
+                        job_id, kill)
+    return process.wait(timeout=120)
+
+
+def job_file(tmp_path) -> dict:
+    (path,) = (tmp_path / "out" / ".spark_batches").glob("*.json")
+    return json.loads(path.read_text())
+
+
+def renders(tmp_path) -> int:
+    return (tmp_path / "renders.log").read_text().count("rendered")
+
+
+@pytest.mark.parametrize("kill", [
+    "index:2",       # second chunk rendered and indexed, not yet checkpointed
+    "checkpoint:3",  # first chunk checkpointed (saves: plan, submit, chunk)
+])
+def test_store_resume_indexes_each_result_once(mock_api, processes, tmp_path, kill):
+    server = mock_api()
+    store_dir = str(tmp_path / "store")
+
+    assert run_batch(processes, tmp_path, server, store_dir, kill=kill) == -9
+    job = job_file(tmp_path)
+    checkpointed = list(job["collected"])
+    assert job["status"] != "collected"
+
+    assert run_batch(processes, tmp_path, server, store_dir, job_id=job["job_id"]) == 0
+
+    assert len(server.state.batches) == 1  # the resume didn't submit again
+    job = job_file(tmp_path)
+    assert job["status"] == "collected"
+    assert job["collected"][:len(checkpointed)] == checkpointed
+    assert sorted(job["collected"]) == sorted(job["plan"])
+    with sqlite3.connect(Path(store_dir) / "sparks.sqlite") as conn:
+        sources = [row[0] for row in conn.execute("SELECT source FROM sparks")]
+    assert sorted(sources) == sorted(f"batch:{job['job_id']}/{custom_id}" for custom_id in job["plan"])
+    assert renders(tmp_path) == len(job["plan"])
+
+
+def test_loose_files_resume_writes_each_result_once(mock_api, processes, tmp_path):
+    server = mock_api()
+
+    # One chunk collected, two more records written but not yet rendered
+    assert run_batch(processes, tmp_path, server, None, kill=f"write:{CHUNK + 2}") == -9
+    job_id = job_file(tmp_path)["job_id"]
+    assert run_batch(processes, tmp_path, server, None, job_id=job_id) == 0
+
+    assert len(server.state.batches) == 1
+    job = job_file(tmp_path)
+    records = [json.loads(path.read_text()) for path in (tmp_path / "out").glob("spark_*.json")]
+    assert sorted(record["batch"]["custom_id"] for record in records) == sorted(job["plan"])
+    assert all(Path(record["card_path"]).exists() for record in records)
+    assert renders(tmp_path) == len(job["plan"])
@@ -0,0 +1,191 @@
+"""ClientManager against the mock API: retries, hedging and error surfacing."""
+
+import time
+import asyncio
+import sqlite3
+
+import anthropic
+import pytest
+
+from spark_client import ClientManager
+from spark_ratelimit import RateLimiter
+from spark_stream import OffSchemaError
+
+REQUEST = {
+    "model": "mock",
+    "max_tokens": 1024,
+    "messages": [{"role": "user", "content": 'Generate ONE novel product concept for the "pet products" category.'}],
+}
+
+
+def manager_for(server, **kwargs) -> ClientManager:
+    kwargs.setdefault("backoff_base", 0.001)
+    return ClientManager(base_url=server.base_url, timeout=10, **kwargs)
+
+
+def frozen_limiter(path) -> RateLimiter:
+    """A limiter whose buckets never refill, so every token taken or given back shows."""
+
+    limiter = RateLimiter(path, output_tpm=100_000)
+    with sqlite3.connect(limiter.path) as conn:
+        conn.execute("UPDATE buckets SET rate = 0")
+    return limiter
+
+
+def output_bucket(limiter: RateLimiter) -> float:
+    with sqlite3.connect(limiter.path) as conn:
+        return conn.execute("SELECT tokens FROM buckets WHERE name = 'output_tokens'").fetchone()[0]
+
+
+def test_retries_wait_for_retry_after(mock_api):
+    server = mock_api(fail_next=2, retry_after=0.4)
+    manager = manager_for(server, max_retries=3)
+
+    started = time.perf_counter()
+    message = manager.create(**REQUEST)
+
+    assert message.content[0].text
+    assert manager.retries == 2
+    assert server.state.requests == 3
+    # Backoff alone would be milliseconds; retry-after holds each retry back
+    assert time.perf_counter() - started >= 0.8
+    manager.close()
+
+
+def test_429_pauses_the_shared_limiter(mock_api, tmp_path):
+    server = mock_api(fail_next=1, retry_after=0.3)
+    limiter = RateLimiter(tmp_path / "limits.sqlite", output_tpm=100_000)
+    manager = manager_for(server, rate_limiter=limiter)
+
+    manager.create(**REQUEST)
+
+    with sqlite3.connect(limiter.path) as conn:
+        until = conn.execute("SELECT until FROM pauses").fetchone()[0]
+    assert until > 0
+    manager.close()
+
+
+def test_failing_call_surfaces_the_last_error(mock_api):
+    server = mock_api(fail_next=10)
+    manager = manager_for(server, max_retries=2)
+
+    with pytest.raises(anthropic.RateLimitError) as raised:
+        manager.create(**REQUEST)
+
+    assert "request 3" in str(raised.value)
+    assert server.state.requests == 3
+    manager.close()
+
+
+def test_async_failing_call_surfaces_the_last_error(mock_api):
+    server = mock_api(fail_next=10)
+    manager = manager_for(server, max_retries=2)
+
+    async def run():
+        try:
+            await manager.acreate(**REQUEST)
+        finally:
+            await manager.aclose()
+
+    with pytest.raises(anthropic.RateLimitError) as raised:
+        asyncio.run(run())
+    assert "request 3" in str(raised.value)
+
+
+def test_failed_calls_give_back_their_reservation(mock_api, tmp_path):
+    server = mock_api(fail_next=10)
+    limiter = frozen_limiter(tmp_path / "limits.sqlite")
+    manager = manager_for(server, max_retries=1, rate_limiter=limiter)
+
+    with pytest.raises(anthropic.RateLimitError):
+        manager.create(**REQUEST)
+
+    assert output_bucket(limiter) == 100_000
+    manager.close()
+
+
+def warm_up(manager: ClientManager, calls: int) -> int:
+    """Fill the latency window (before hedging is on). Returns the output tokens used."""
+
+    return sum(manager.create(**REQUEST).usage.output_tokens for _ in range(calls))
+
+
+def test_hedge_fires_past_the_latency_percentile(mock_api):
+    server = mock_api(latency=0.02, stall_seconds=3.0)
+    manager = manager_for(server, hedge_min_samples=5)
+    warm_up(manager, 6)
+    manager.hedge_percentile = 90
+
+    server.state.stall_next = 1
+    started = time.perf_counter()
+    message = manager.create(**REQUEST)
+
+    assert message.content[0].text
+    assert manager.hedges == 1
+    assert time.perf_counter() - started < 1.5  # the hedge answered, not the stalled primary
+    manager.close()
+
+
+def test_no_hedge_before_enough_samples(mock_api):
+    server = mock_api(latency=0.02)
+    manager = manager_for(server, hedge_percentile=90, hedge_min_samples=50)
+    warm_up(manager, 6)
+
+    assert manager.hedge_delay() is None
+    assert manager.hedges == 0
+    manager.close()
+
+
+def test_async_hedge_cancels_the_loser(mock_api, tmp_path):
+    server = mock_api(latency=0.02, stall_seconds=3.0)
+    limiter = frozen_limiter(tmp_path / "limits.sqlite")
+    manager = manager_for(server, hedge_min_samples=5, rate_limiter=limiter)
+    used = warm_up(manager, 6)
+    manager.hedge_percentile = 90
+
+    async def run():
+        server.state.stall_next = 1
+        started = time.perf_counter()
+        try:
+            message = await manager.acreate(**REQUEST)
+        finally:
+            await manager.aclose()
+        return message, time.perf_counter() - started
+
+    message, seconds = asyncio.run(run())
+    assert seconds < 1.5
+    assert manager.hedges == 1
+    # The cancelled loser gave its whole output reservation back
+    assert output_bucket(limiter) == 100_000 - used - message.usage.output_tokens
+    manager.close()
+
+
+def test_garbage_stream_aborts_and_settles(mock_api, pro, monkeypatch, tmp_path):
+    server = mock_api(garbage_rate=1.0)
+    limiter = frozen_limiter(tmp_path / "limits.sqlite")
+    monkeypatch.setattr(pro, "client_manager", manager_for(server, rate_limiter=limiter))
+
+    with pytest.raises(OffSchemaError):
+        pro.stream_concept_with_usage("pet products", ["Too loud"], schema_retries=2)
+
+    assert server.state.requests == 3
+    # Each aborted stream is charged only for the few tokens it got
+    assert output_bucket(limiter) > 100_000 - 3 * 16
+
+
+def test_async_garbage_stream_aborts_and_settles(mock_api, pro, monkeypatch, tmp_path):
+    server = mock_api(garbage_rate=1.0)
+    limiter = frozen_limiter(tmp_path / "limits.sqlite")
+    manager = manager_for(server, rate_limiter=limiter)
+    monkeypatch.setattr(pro, "client_manager", manager)
+
+    async def run():
+        try:
+            await pro.stream_concept_with_usage_async("pet products", ["Too loud"], schema_retries=1)
+        finally:
+            await manager.aclose()
+
+    with pytest.raises(OffSchemaError):
+        asyncio.run(run())
+    assert server.state.requests == 2
+    assert output_bucket(limiter) > 100_000 - 2 * 16
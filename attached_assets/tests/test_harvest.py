@@ -0,0 +1,121 @@
+"""Harvester and PageCache against the local fixture site."""
+
+import asyncio
+
+import pytest
+
+from spark_corpus import PainCorpus
+from spark_harvest import Harvester, PageCache, start_fixture_server
+
+CATEGORIES = ["kitchen gadgets", "pet products"]
+TEMPLATES = ["{category} problems", "{category} complaints"]
+QUERIES = len(CATEGORIES) * len(TEMPLATES)
+
+
+@pytest.fixture
+def fixture_site():
+    """Factory for fixture sites, shut down after the test."""
+
+    servers = []
+
+    def start(**kwargs):
+        server = start_fixture_server(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def harvest(server, corpus, cache=None, **kwargs):
+    harvester = Harvester(server.search_url, corpus, cache=cache, **kwargs)
+    return asyncio.run(harvester.harvest(CATEGORIES, TEMPLATES))
+
+
+def test_harvest_fills_the_corpus(fixture_site, tmp_path):
+    server = fixture_site(links_per_query=3)
+    corpus = PainCorpus(tmp_path / "pains.sqlite")
+
+    stats = harvest(server, corpus)
+
+    assert server.requests["search"] == QUERIES
+    assert server.requests["page"] == QUERIES * 3
+    assert stats["errors"] == 0
+    assert stats["added"] > 0
+    assert set(corpus.counts()) == set(CATEGORIES)
+
+
+@pytest.mark.parametrize("etags", [True, False], ids=["etag", "last-modified"])
+def test_recrawl_revalidates_with_304(fixture_site, tmp_path, etags):
+    server = fixture_site(etags=etags)
+    corpus = PainCorpus(tmp_path / "pains.sqlite")
+    cache = PageCache(tmp_path / "pages")
+
+    first = harvest(server, corpus, cache)
+    fetched = server.requests["search"] + server.requests["page"]
+    assert first["fetched"] == fetched
+    assert server.requests["not_modified"] == 0
+
+    second = harvest(server, corpus, cache)
+
+    assert second["fetched"] == 0
+    assert second["revalidated"] == fetched
+    assert server.requests["not_modified"] == fetched
+    # Revalidated pages are parsed from the cache: same sentences, none new
+    assert second["sentences"] == first["sentences"]
+    assert second["added"] == 0
+
+
+def test_changed_pages_are_fetched_again(fixture_site, tmp_path):
+    server = fixture_site()
+    corpus = PainCorpus(tmp_path / "pains.sqlite")
+    cache = PageCache(tmp_path / "pages")
+    first = harvest(server, corpus, cache)
+
+    server.bump_revision()
+    second = harvest(server, corpus, cache)
+
+    # Search pages didn't change; complaint pages did
+    assert second["revalidated"] == QUERIES
+    assert second["fetched"] == first["fetched"] - QUERIES
+    third = harvest(server, corpus, cache)
+    assert third["fetched"] == 0  # the cache holds the new versions
+
+
+def test_error_pages_are_counted_and_skipped(fixture_site, tmp_path):
+    server = fixture_site(links_per_query=3, broken_pages={1})
+    corpus = PainCorpus(tmp_path / "pains.sqlite")
+    cache = PageCache(tmp_path / "pages")
+
+    stats = harvest(server, corpus, cache)
+
+    assert server.requests["broken"] > 0
+    assert stats["errors"] == server.requests["broken"]
+    assert stats["added"] > 0  # the other pages still count
+
+    # Error pages aren't cached: a re-crawl asks for them again without validators
+    again = harvest(server, corpus, cache)
+    assert again["errors"] == stats["errors"]
+    assert again["fetched"] == 0
+
+
+def test_unreachable_search_host_is_an_error(tmp_path):
+    corpus = PainCorpus(tmp_path / "pains.sqlite")
+    harvester = Harvester("http://127.0.0.1:9/search?q={query}", corpus, timeout=2)
+
+    stats = asyncio.run(harvester.harvest(CATEGORIES, TEMPLATES))
+
+    assert stats["errors"] == QUERIES
+    assert stats["added"] == 0
+
+
+@pytest.mark.parametrize("concurrency, per_host, limit", [(16, 2, 2), (3, 8, 3)])
+def test_in_flight_requests_stay_within_limits(fixture_site, tmp_path, concurrency, per_host, limit):
+    server = fixture_site(links_per_query=4, delay=0.05)
+    corpus = PainCorpus(tmp_path / "pains.sqlite")
+
+    harvest(server, corpus, concurrency=concurrency, per_host=per_host)
+
+    assert server.peak == limit
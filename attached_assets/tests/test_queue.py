@@ -0,0 +1,186 @@
+"""WorkQueue leases and distributed runs with several worker processes on one queue."""
+
+import json
+import time
+import sqlite3
+
+import pytest
+
+from conftest import ROOT
+from spark_queue import WorkQueue
+from spark_store import SparkStore
+
+ITEMS = [{"category": "pet products", "pain_points": [f"pain {i}"]} for i in range(200)]
+
+# Claims and completes items until none are left, logging each claimed item id
+DRAIN = """
+import sys
+sys.path.insert(0, {root!r})
+from spark_queue import WorkQueue
+
+queue_dir, job_id, worker, log_path = sys.argv[1:]
+queue = WorkQueue(queue_dir)
+with open(log_path, "w") as log:
+    while True:
+        item = queue.claim(job_id, worker, lease_seconds=60)
+        if item is None:
+            break
+        log.write(f"{{item['item_id']}}\\n")
+        assert queue.complete(job_id, item, {{"worker": worker}})
+"""
+
+# One pro --queue --work worker against the mock API, optionally SIGKILLed after N claims
+WORKER = """
+import os, sys, signal
+sys.path.insert(0, {root!r})
+import one_spark_pro_1764697514875 as pro
+from spark_client import ClientManager
+from spark_queue import WorkQueue
+
+base_url, queue_dir, job_id, worker, lease, kill_after = sys.argv[1:]
+pro.client_manager = ClientManager(base_url=base_url, backoff_base=0.01)
+if int(kill_after):
+    claim = WorkQueue.claim
+    claims = [0]
+
+    def claim_then_die(self, *args, **kwargs):
+        item = claim(self, *args, **kwargs)
+        claims[0] += 1
+        if claims[0] == int(kill_after):
+            os.kill(os.getpid(), signal.SIGKILL)
+        return item
+    WorkQueue.claim = claim_then_die
+pro.run_queue_worker(queue_dir, job_id, worker, float(lease), poll_interval=0.1)
+"""
+
+
+def script(tmp_path, name: str, source: str):
+    path = tmp_path / f"{name}.py"
+    path.write_text(source.format(root=str(ROOT)))
+    return path
+
+
+def attempts(queue: WorkQueue, job_id: str) -> dict:
+    with sqlite3.connect(queue.db_path) as conn:
+        return dict(conn.execute("SELECT item_id, attempts FROM items WHERE job_id = ?", (job_id,)))
+
+
+def test_processes_claim_each_item_once(processes, tmp_path):
+    queue = WorkQueue(tmp_path / "queue")
+    job_id = queue.create_job(ITEMS)
+    drain = script(tmp_path, "drain", DRAIN)
+
+    workers = [processes(drain, queue.directory, job_id, f"worker-{n}", tmp_path / f"claims-{n}.log")
+               for n in range(4)]
+    assert [worker.wait(timeout=120) for worker in workers] == [0] * 4
+
+    claimed = [int(line) for n in range(4) for line in (tmp_path / f"claims-{n}.log").read_text().split()]
+    assert sorted(claimed) == list(range(len(ITEMS)))
+    assert set(attempts(queue, job_id).values()) == {1}
+    assert queue.progress(job_id)["done"] == len(ITEMS)
+
+
+def test_expired_lease_is_reclaimed_and_stale_token_cannot_complete(tmp_path):
+    queue = WorkQueue(tmp_path / "queue")
+    job_id = queue.create_job(ITEMS[:1])
+
+    stalled = queue.claim(job_id, "stalled", lease_seconds=0.05)
+    assert queue.claim(job_id, "other", lease_seconds=60) is None  # still leased
+    time.sleep(0.1)
+    assert queue.progress(job_id)["expired"] == 1
+
+    retry = queue.claim(job_id, "other", lease_seconds=60)
+    assert retry["item_id"] == stalled["item_id"]
+    assert retry["reclaimed"] and retry["attempt"] == 2
+
+    assert not queue.extend(job_id, stalled, 60)
+    assert not queue.complete(job_id, stalled, {"worker": "stalled"})
+    assert not queue.release(job_id, stalled, "too late")
+    assert queue.complete(job_id, retry, {"worker": "other"})
+    assert queue.unmerged(job_id) == [(0, {"worker": "other"})]
+
+
+def test_expired_last_attempt_is_reaped(tmp_path):
+    queue = WorkQueue(tmp_path / "queue")
+    job_id = queue.create_job(ITEMS[:2], max_attempts=1)
+
+    queue.claim(job_id, "crashed", lease_seconds=0.05)
+    time.sleep(0.1)
+
+    assert queue.reap(job_id) == 1
+    assert queue.failures(job_id) == [(0, "pet products", 1, "lease expired on the last attempt")]
+    assert queue.claim(job_id, "other", lease_seconds=60)["item_id"] == 1
+
+
+@pytest.fixture
+def queued_run(mock_api, processes, pro, monkeypatch, tmp_path):
+    """A 12-spark job worked by one worker killed holding a lease, then two healthy ones."""
+
+    server = mock_api()
+    queue = WorkQueue(tmp_path / "queue")
+    job_id = pro.plan_queue_job(queue, 12, max_attempts=3)
+    worker = script(tmp_path, "worker", WORKER)
+
+    crashed = processes(worker, server.base_url, queue.directory, job_id, "crashed", 1.0, 1)
+    assert crashed.wait(timeout=60) == -9
+    healthy = [processes(worker, server.base_url, queue.directory, job_id, f"healthy-{n}", 60, 0)
+               for n in range(2)]
+    assert [process.wait(timeout=120) for process in healthy] == [0, 0]
+
+    monkeypatch.setattr(pro, "MERGE_CHUNK", 5)
+    return queue, job_id
+
+
+def test_crashed_workers_item_is_redone(queued_run):
+    queue, job_id = queued_run
+
+    counts = queue.progress(job_id)
+    assert counts["done"] == 12 and counts["failed"] == 0
+    tries = attempts(queue, job_id)
+    assert tries.pop(0) == 2  # the crashed worker's lease expired and another worker took it
+    assert set(tries.values()) == {1}
+    assert all(result["worker"] != "crashed" for _, result in queue.unmerged(job_id))
+
+
+def interrupted_merge(pro, monkeypatch, queue, job_id, **kwargs):
+    """Merge, crashing once after the second chunk is written but before it's marked."""
+
+    mark_merged = queue.mark_merged
+    calls = []
+
+    def crash_on_second(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("coordinator crashed")
+        mark_merged(*args)
+
+    monkeypatch.setattr(queue, "mark_merged", crash_on_second)
+    with pytest.raises(RuntimeError):
+        pro.merge_queue_results(queue, job_id, **kwargs)
+    monkeypatch.setattr(queue, "mark_merged", mark_merged)
+    resumed = pro.merge_queue_results(queue, job_id, **kwargs)
+    assert pro.merge_queue_results(queue, job_id, **kwargs) == []
+    return resumed
+
+
+def test_store_merge_indexes_each_spark_once(queued_run, pro, monkeypatch, tmp_path):
+    queue, job_id = queued_run
+    store = SparkStore(tmp_path / "store")
+
+    resumed = interrupted_merge(pro, monkeypatch, queue, job_id, store=store)
+
+    assert len(resumed) == 12 - 5  # the first chunk was marked before the crash
+    with sqlite3.connect(store.db_path) as conn:
+        sources = sorted(row[0] for row in conn.execute("SELECT source FROM sparks"))
+    assert sources == sorted(pro.queue_source(job_id, item_id) for item_id in range(12))
+
+
+def test_file_merge_writes_each_spark_once(queued_run, pro, monkeypatch, tmp_path):
+    queue, job_id = queued_run
+    output_dir = tmp_path / "merged"
+
+    interrupted_merge(pro, monkeypatch, queue, job_id, output_dir=str(output_dir))
+
+    records = [json.loads(path.read_text()) for path in output_dir.glob("spark_*.json")]
+    assert sorted(record["queue"]["item_id"] for record in records) == list(range(12))
+    assert all((output_dir / record["card_path"]).exists() for record in records)